@@ -2,7 +2,18 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
 
+from .models import EmailJob
+
 
 @admin.register(get_user_model())
 class CustomUserAdmin(UserAdmin):
-    pass
\ No newline at end of file
+    pass
+
+
+@admin.register(EmailJob)
+class EmailJobAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'user', 'status', 'attempts', 'available_at', 'sent_at')
+    list_filter = ('status', 'template_name')
+    search_fields = ('user__email', 'user__username')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    autocomplete_fields = ('user',)
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+from config import images
+
+AVATAR_DIR = 'profile_images'
+AVATAR_URL = '/api/avatars/'
+# آدرس هر نسخه با ?v= یکتاست، پس محتوای پشت آن هیچ‌وقت عوض نمی‌شود
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class AvatarStorage(FileSystemStorage):
+    """
+        هر فایل با images.write_atomic نوشته می‌شود؛ خواننده‌های همزمان هیچ‌وقت
+        فایل ناقص نمی‌بینند و نسخه‌ی کوچک‌شده‌ی دوباره ساخته شده جایگزین قبلی می‌شود.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    @property
+    def base_url(self):
+        return self._value_or_setting(self._base_url, getattr(settings, 'AVATAR_URL', AVATAR_URL))
+
+    def _save(self, name, content):
+        images.write_atomic(self.path(name), content.chunks(), self.file_permissions_mode)
+        return name.replace('\\', '/')
+
+
+def get_storage():
+    return avatar_storage
+
+
+avatar_storage = AvatarStorage()
+
+
+def delete(name, variants=None):
+    """ فایل تصویر قبلی و نسخه‌های کوچک‌شده‌اش؛ variants ی ثبت شده روی ردیف عرض‌های قبلی تنظیمات را هم دارد """
+    names = {name, *(variant['name'] for variant in variants or ())}
+    for width in images.get_widths('profile_pic'):
+        for fmt in images.EXTENSIONS:
+            names.add(images.variant_name(name, width, fmt))
+    for name in names:
+        avatar_storage.delete(name)
+
+
+def versioned_url(url, version):
+    return f'{url}?v={version}' if url else url
@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import EmailJob
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 60 * 60
+
+
+def enqueue_email(user, template_name, subject, url):
+    return EmailJob.objects.create(
+        user=user,
+        template_name=template_name,
+        subject=subject,
+        url=url,
+    )
+
+
+def build_message(job):
+    uid = urlsafe_base64_encode(force_bytes(job.user.pk))
+    token = default_token_generator.make_token(user=job.user)
+
+    html_content = render_to_string(job.template_name,
+                                    {"username": job.user.username,
+                                     'url': job.url.format(uid, token)
+                                     })
+
+    msg = EmailMultiAlternatives(job.subject, "", settings.EMAIL_HOST_USER, [job.user.email])
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def claim_jobs(batch_size=BATCH_SIZE):
+    """
+        کارهای آماده را برمی‌دارد و زمان تلاش بعدی‌شان را جلو می‌برد تا
+        worker دیگری همزمان آن‌ها را ارسال نکند.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            EmailJob.objects.select_for_update(skip_locked=True)
+            .select_related('user')
+            .filter(status=EmailJob.PENDING, available_at__lte=now)[:batch_size]
+        )
+        if jobs:
+            EmailJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                available_at=now + timedelta(seconds=RETRY_MAX_DELAY)
+            )
+    return jobs
+
+
+def process_batch(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+        یک دسته را با یک اتصال SMTP ارسال می‌کند و تعداد ارسال‌های موفق و ناموفق را برمی‌گرداند.
+    """
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0, 0
+
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+        for job in jobs:
+            try:
+                msg = build_message(job)
+                msg.connection = connection
+                msg.send()
+            except Exception as e:
+                job.last_error = repr(e)
+                failed.append(job)
+            else:
+                sent.append(job)
+    except Exception as e:
+        # اتصال برقرار نشد؛ همه‌ی کارهای باقی‌مانده دوباره تلاش می‌شوند
+        done = {job.pk for job in sent + failed}
+        for job in jobs:
+            if job.pk not in done:
+                job.last_error = repr(e)
+                failed.append(job)
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    for job in sent:
+        job.status = EmailJob.SENT
+        job.attempts += 1
+        job.sent_at = now
+        job.last_error = ''
+    for job in failed:
+        job.attempts += 1
+        if job.attempts >= max_attempts:
+            job.status = EmailJob.FAILED
+        job.available_at = now + retry_delay(job.attempts)
+
+    EmailJob.objects.bulk_update(
+        sent + failed,
+        ['status', 'attempts', 'sent_at', 'available_at', 'last_error']
+    )
+    return len(sent), len(failed)
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import mail
+
+
+class Command(BaseCommand):
+    help = "ارسال ایمیل‌های صف شده در دسته‌هایی با یک اتصال SMTP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='اجرای دائمی به صورت worker')
+        parser.add_argument('--interval', type=float, default=5, help='فاصله‌ی بررسی صف در حالت loop (ثانیه)')
+        parser.add_argument('--batch-size', type=int, default=mail.BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=mail.MAX_ATTEMPTS)
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = mail.process_batch(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+            )
+            if sent or failed:
+                self.stdout.write(f"sent: {sent}, failed: {failed}")
+
+            # تا وقتی دسته‌ی پر برمی‌گردد بدون مکث ادامه می‌دهیم
+            if sent + failed >= options['batch_size']:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:05
+
+import django.db.models.deletion
+import django.utils.timezone
+import django_jalali.db.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_alter_customuser_date_joined_alter_customuser_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template_name', models.CharField(max_length=200, verbose_name='قالب')),
+                ('subject', models.CharField(max_length=200, verbose_name='موضوع')),
+                ('url', models.CharField(max_length=500, verbose_name='آدرس')),
+                ('status', models.CharField(choices=[('pending', 'در صف'), ('sent', 'ارسال شده'), ('failed', 'ناموفق')], default='pending', max_length=10, verbose_name='وضعیت')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('available_at', django_jalali.db.models.jDateTimeField(default=django.utils.timezone.now, verbose_name='زمان تلاش بعدی')),
+                ('last_error', models.TextField(blank=True, verbose_name='آخرین خطا')),
+                ('created_at', django_jalali.db.models.jDateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('sent_at', django_jalali.db.models.jDateTimeField(blank=True, null=True, verbose_name='تاریخ ارسال')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='email_jobs', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'ایمیل در صف',
+                'verbose_name_plural': 'صف ایمیل‌ها',
+                'ordering': ['available_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='accounts_emailjob_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_emailjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_pic_variants',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='نسخه‌های تصویر پروفایل'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:55
+
+import accounts.avatars
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_customuser_profile_pic_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_pic_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='نسخه‌ی تصویر پروفایل'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_pic',
+            field=models.ImageField(blank=True, default=None, null=True, storage=accounts.avatars.get_storage, upload_to=accounts.models.profile_upload_path, verbose_name='تصویر پروفایل'),
+        ),
+    ]
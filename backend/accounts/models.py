@@ -1,29 +1,32 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.utils.text import gettext_lazy as _
 from shortuuid import uuid
 from pathlib import Path
-from django.conf import settings
 
 from django_jalali.db import models as jmodels
 
-def profile_upload_path(instance, filename):
-    ext = filename.split('.')[-1]
-    filename = f"{instance.pk}.{ext}"
-    file_path = Path(settings.MEDIA_ROOT.joinpath(f"profile_images/{filename}"))
+from blog import caching
+from config import images
 
-    if file_path.parent.exists():
-        file_path.unlink()
+from . import avatars
 
-    return file_path
+def profile_upload_path(instance, filename):
+    # هر نسخه نام خودش را دارد؛ فایل قبلی تا commit ی نسخه‌ی جدید سر جایش می‌ماند
+    ext = Path(filename).suffix.lower()
+    return f"{avatars.AVATAR_DIR}/{instance.pk}.{instance.profile_pic_version}{ext}"
 
 class CustomUser(AbstractUser):
     id = models.CharField(primary_key=True, default=uuid, editable=False, unique=True)
     email = models.EmailField(unique=True, verbose_name='ایمیل')
     first_name = models.CharField(_("first name"), max_length=150, blank=False)
     last_name = models.CharField(_("last name"), max_length=150, blank=True)
-    profile_pic = models.ImageField("تصویر پروفایل", upload_to=profile_upload_path, null=True, blank=True, default=None)
+    profile_pic = models.ImageField("تصویر پروفایل", upload_to=profile_upload_path, storage=avatars.get_storage, null=True, blank=True, default=None)
+    # با هر تصویر جدید یکی زیاد می‌شود و در آدرس (?v=) می‌آید
+    profile_pic_version = models.PositiveIntegerField("نسخه‌ی تصویر پروفایل", default=0, editable=False)
+    # None یعنی نسخه‌های کوچک‌شده هنوز ساخته نشده‌اند (generate_image_variants)
+    profile_pic_variants = models.JSONField("نسخه‌های تصویر پروفایل", null=True, blank=True, editable=False)
     bio = models.TextField('بیوگرافی', null=True, blank=True, max_length=500)
     last_login = jmodels.jDateTimeField(_("last login"), blank=True, null=True)
     date_joined = jmodels.jDateTimeField(_("date joined"), default=timezone.now)
@@ -31,3 +34,94 @@ class CustomUser(AbstractUser):
     EMAIL_FIELD = 'email'
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
+
+    # فیلدهایی که به عنوان نویسنده در کش جزئیات پست‌ها و فید می‌آیند
+    AUTHOR_FIELDS = ('username', 'first_name', 'last_name', 'profile_pic', 'profile_pic_variants')
+    # مقدار AUTHOR_FIELDS در آخرین خواندن یا ذخیره؛ فیلدهای به تعویق افتاده در آن نیستند
+    _saved_author = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_author = instance._author_values()
+        return instance
+
+    def _author_values(self):
+        return {
+            name: getattr(self.__dict__[name], 'name', self.__dict__[name])
+            for name in self.AUTHOR_FIELDS
+            if name in self.__dict__
+        }
+
+    def _author_changed(self, update_fields):
+        if self._state.adding:
+            return False
+        if update_fields is not None and not set(self.AUTHOR_FIELDS) & set(update_fields):
+            return False
+        if self._saved_author is None:
+            return True
+        current = self._author_values()
+        return any(name not in self._saved_author or self._saved_author[name] != value for name, value in current.items())
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        previous_pic = previous_variants = None
+        author_changed = self._author_changed(update_fields)
+
+        if self.profile_pic and not self.profile_pic._committed:
+            if not self._state.adding:
+                previous_pic, previous_variants = CustomUser.objects.filter(pk=self.pk).values_list(
+                    'profile_pic', 'profile_pic_variants'
+                ).first() or (None, None)
+            self.profile_pic_version += 1
+            if update_fields is not None and 'profile_pic' in update_fields:
+                update_fields = kwargs['update_fields'] = {*update_fields, 'profile_pic_version'}
+
+        if images.is_stale(self.profile_pic, self.profile_pic_variants):
+            self.profile_pic_variants = None
+            if update_fields is not None and 'profile_pic' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'profile_pic_variants'}
+        super().save(*args, **kwargs)
+
+        if author_changed:
+            caching.invalidate_post_detail(*self.posts.values_list('slug', flat=True))
+            caching.invalidate_feed()
+        self._saved_author = self._author_values()
+
+        # فایل قبلی (و نسخه‌های کوچک‌شده‌اش) فقط پس از commit ی نسخه‌ی جدید حذف می‌شود
+        if previous_pic and previous_pic != self.profile_pic.name:
+            name, variants = previous_pic, previous_variants
+            transaction.on_commit(lambda: avatars.delete(name, variants))
+
+
+class EmailJob(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'در صف'),
+        (SENT, 'ارسال شده'),
+        (FAILED, 'ناموفق'),
+    )
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='email_jobs', verbose_name='کاربر')
+    template_name = models.CharField('قالب', max_length=200)
+    subject = models.CharField('موضوع', max_length=200)
+    url = models.CharField('آدرس', max_length=500)
+    status = models.CharField('وضعیت', max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField('تعداد تلاش', default=0)
+    available_at = jmodels.jDateTimeField('زمان تلاش بعدی', default=timezone.now)
+    last_error = models.TextField('آخرین خطا', blank=True)
+    created_at = jmodels.jDateTimeField('تاریخ ایجاد', auto_now_add=True)
+    sent_at = jmodels.jDateTimeField('تاریخ ارسال', null=True, blank=True)
+
+    class Meta:
+        ordering = ['available_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='accounts_emailjob_due_idx'),
+        ]
+        verbose_name = 'ایمیل در صف'
+        verbose_name_plural = 'صف ایمیل‌ها'
+
+    def __str__(self):
+        return f"{self.subject} - {self.user}"
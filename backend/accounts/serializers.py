@@ -6,44 +6,20 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from accounts.models import CustomUser
 
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
 from django.contrib.auth.tokens import default_token_generator
-from django.utils.encoding import force_bytes, force_str
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode, urlencode
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlencode
 from django.db.models import Q
-from threading import Thread
 from PIL import Image
 
-USER_MODEL: CustomUser = get_user_model()
-
-# celery will replace this later
-class SendEmail(Thread):
-    def __init__(self, user, template_name, subject, url, *args, **kwargs):
-        super(SendEmail, self).__init__(*args, **kwargs)
-        self.user = user
-        self.template_name = template_name
-        self.subject = subject
-        self.url = url
-
-    def run(self):
-
-        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
-        token = default_token_generator.make_token(user=self.user)
+from accounts import avatars
+from accounts.mail import enqueue_email
+from config.images import variant_urls
 
-        from_email = settings.EMAIL_HOST_USER
-
-        html_content = render_to_string(self.template_name,
-                                        {"username": self.user.username,
-                                         'url': self.url.format(uid, token)
-                                         })
-
-        msg = EmailMultiAlternatives(self.subject, "", from_email, [self.user.email])
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
+USER_MODEL: CustomUser = get_user_model()
 
 def send_confirmation_email(user, template_name, subject, url):
-    SendEmail(user=user, template_name=template_name, subject=subject, url=url).start()
+    enqueue_email(user=user, template_name=template_name, subject=subject, url=url)
 
 
 class UserCreationSerializer(serializers.ModelSerializer):
@@ -192,23 +168,44 @@ class ConfirmResetPasswordSerializer(serializers.Serializer):
         return self.user
 
 
-class UserInformationSerializer(serializers.ModelSerializer):
+class AvatarField(serializers.ImageField):
+    """ آدرس تصویر پروفایل با نسخه (?v=)، تا با هدر immutable کش شود """
+
+    def to_representation(self, value):
+        url = super().to_representation(value)
+        return avatars.versioned_url(url, value.instance.profile_pic_version) if value else url
+
+
+class ProfilePicMixin(serializers.Serializer):
+    profile_pic = AvatarField(required=False, allow_null=True)
+    profile_pic_variants = serializers.SerializerMethodField()
+
+    def get_profile_pic_variants(self, obj):
+        return variant_urls(
+            self.context.get('request'),
+            obj.profile_pic_variants,
+            storage=avatars.avatar_storage,
+            version=obj.profile_pic_version,
+        )
+
+
+class UserInformationSerializer(ProfilePicMixin, serializers.ModelSerializer):
     class Meta:
         model = USER_MODEL
-        fields = ('username', 'email', 'first_name', 'last_name', 'last_login', 'profile_pic', 'bio')
+        fields = ('username', 'email', 'first_name', 'last_name', 'last_login', 'profile_pic', 'profile_pic_variants', 'bio')
         extra_kwargs = {
             'email': {'read_only': True},
             'last_login': {'read_only': True},
         }
 
-class UserInformationForPostSerializer(serializers.ModelSerializer):
+class UserInformationForPostSerializer(ProfilePicMixin, serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(lookup_field='username', view_name='account-user-info')
 
     class Meta:
         model = USER_MODEL
-        fields = ('url', 'username', 'first_name', 'last_name', 'profile_pic')
+        fields = ('url', 'username', 'first_name', 'last_name', 'profile_pic', 'profile_pic_variants')
 
-class UserInformationForProfileSerializer(serializers.ModelSerializer):
+class UserInformationForProfileSerializer(ProfilePicMixin, serializers.ModelSerializer):
     posts_url = serializers.SerializerMethodField()
 
     def get_posts_url(self, obj):
@@ -220,5 +217,5 @@ class UserInformationForProfileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = USER_MODEL
-        fields = ('username', 'first_name', 'last_name', 'profile_pic', 'bio', 'posts_url')
+        fields = ('username', 'first_name', 'last_name', 'profile_pic', 'profile_pic_variants', 'bio', 'posts_url')
 
@@ -1,3 +1,412 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core import mail as outbox
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+from rest_framework.decorators import action
+from rest_framework.test import APIClient
+from rest_framework.viewsets import GenericViewSet
+
+from config import images
+from config import throttling
+from config.query_budget import QueryBudgetTestMixin
+from . import avatars
+from . import mail
+from .models import CustomUser, EmailJob
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file(name='avatar.png', size=(32, 32)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """ هر endpoint در accounts.urls باید در بودجه‌ی کوئری action خودش بماند """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='user', email='user@example.com', password='OldPass!2345', first_name='کاربر'
+        )
+        cls.inactive = CustomUser.objects.create_user(
+            username='inactive', email='inactive@example.com', password='OldPass!2345', is_active=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.client = APIClient()
+
+    def uid_and_token(self, user):
+        return urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user)
+
+    def test_get_csrf(self):
+        self.assertWithinQueryBudget('get', '/api/account/get_csrf/')
+
+    def test_signup(self):
+        response = self.assertWithinQueryBudget('post', '/api/account/signup/', {
+            'username': 'new', 'email': 'new@example.com', 'first_name': 'تازه', 'last_name': 'کاربر',
+            'password1': 'NewPass!2345', 'password2': 'NewPass!2345',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_login_logout(self):
+        response = self.assertWithinQueryBudget('post', '/api/account/login/', {
+            'email_or_username': 'user', 'password': 'OldPass!2345',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.assertWithinQueryBudget('post', '/api/account/logout/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_email_confirmation(self):
+        uid, token = self.uid_and_token(self.inactive)
+        response = self.assertWithinQueryBudget('post', '/api/account/email_confirmation/', {
+            'user_id': uid, 'token': token,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_resend_email_confirmation(self):
+        self.assertWithinQueryBudget('post', '/api/account/resend_email_confirmation/', {
+            'email': 'inactive@example.com',
+        }, format='json')
+
+    def test_reset_password(self):
+        self.assertWithinQueryBudget('post', '/api/account/send_reset_password_email_confirmation/', {
+            'email_or_username': 'user',
+        }, format='json')
+
+        uid, token = self.uid_and_token(self.user)
+        response = self.assertWithinQueryBudget('post', '/api/account/confirm_reset_password/', {
+            'user_id': uid, 'token': token, 'password1': 'NewPass!2345', 'password2': 'NewPass!2345',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_me(self):
+        self.client.force_login(self.user)
+        self.assertWithinQueryBudget('get', '/api/account/me/')
+        response = self.assertWithinQueryBudget('patch', '/api/account/me/', {
+            'bio': 'درباره‌ی من', 'profile_pic': image_file(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_info(self):
+        self.assertWithinQueryBudget('get', '/api/account/user/')
+
+    def test_avatar(self):
+        self.user.profile_pic = image_file()
+        self.user.save()
+        self.user.refresh_from_db()
+
+        url = f'/api/avatars/{self.user.profile_pic.name}'
+        response = self.assertWithinQueryBudget('get', f'{url}?v={self.user.profile_pic_version}')
+        self.assertEqual(response.status_code, 200)
+        response = self.assertWithinQueryBudget('get', url)
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class AvatarTests(TestCase):
+    """ هر نسخه‌ی تصویر پروفایل نام خودش را دارد و فایل قبلی فقط پس از commit حذف می‌شود """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='user', email='user@example.com', password='x')
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+
+    def upload(self):
+        self.user.profile_pic = image_file()
+        self.user.save()
+        return self.user.profile_pic.name
+
+    def test_versioned_name(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.upload()
+        self.assertEqual(first, f'{avatars.AVATAR_DIR}/{self.user.pk}.1.png')
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            second = self.upload()
+        self.assertEqual(second, f'{avatars.AVATAR_DIR}/{self.user.pk}.2.png')
+        # تا commit هر دو فایل هستند؛ rollback تصویر قبلی را سالم نگه می‌دارد
+        self.assertTrue(avatars.avatar_storage.exists(first))
+        self.assertTrue(avatars.avatar_storage.exists(second))
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(avatars.avatar_storage.exists(first))
+        self.assertTrue(avatars.avatar_storage.exists(second))
+
+    def test_previous_version_redirects(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.upload()
+        second = self.upload()
+
+        response = self.client.get(f'/api/avatars/{first}?v=1')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], avatars.versioned_url(avatars.avatar_storage.url(second), 2))
+        self.assertEqual(self.client.get(f'/api/avatars/{second}?v=2').status_code, 200)
+
+    def test_variants_replaced_in_place(self):
+        """ ساخت دوباره‌ی نسخه‌ها: همان نام‌ها، جایگزینی اتمیک و بدون فایل اضافه """
+        widths = [64]
+        for storage in (FileSystemStorage(location=MEDIA_ROOT), avatars.avatar_storage):
+            with self.subTest(storage=type(storage).__name__):
+                name = storage.save('variants/photo.png', image_file(size=(128, 128)))
+                first = images.generate_variants(name, widths, storage)
+                self.assertEqual(len(first), len(images.FORMATS))
+
+                with mock.patch('config.images.os.replace', wraps=images.os.replace) as replace:
+                    second = images.generate_variants(name, widths, storage)
+                self.assertEqual(second, first)
+                self.assertEqual(replace.call_count, len(first))
+                _, files = storage.listdir('variants')
+                self.assertEqual(sorted(files), sorted(['photo.png', *(v['name'].split('/')[-1] for v in first)]))
+
+                for filename in files:
+                    storage.delete(f'variants/{filename}')
+
+
+class ThrottlingTests(TestCase):
+    """ GCRA در config.throttling: burst تا limit، سپس یک درخواست در هر period/limit و Retry-After """
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        throttling.get_backend().reset_stats()
+
+    def test_gcra_burst(self):
+        # 5 درخواست در 60 ثانیه: فاصله‌ی 12 ثانیه
+        tat = None
+        for _ in range(5):
+            allowed, retry_after, tat = throttling.gcra(tat, 100, 5, 60)
+            self.assertTrue(allowed)
+        allowed, retry_after, denied_tat = throttling.gcra(tat, 100, 5, 60)
+        self.assertFalse(allowed)
+        self.assertEqual(retry_after, 12)
+        # درخواست رد شده TAT را جلو نمی‌برد
+        self.assertEqual(denied_tat, tat)
+
+        self.assertFalse(throttling.gcra(tat, 111.9, 5, 60)[0])
+        allowed, retry_after, tat = throttling.gcra(tat, 112, 5, 60)
+        self.assertTrue(allowed)
+        self.assertFalse(throttling.gcra(tat, 112, 5, 60)[0])
+        # پس از یک period بی‌کاری، burst کامل دوباره
+        results = []
+        for _ in range(6):
+            allowed, retry_after, tat = throttling.gcra(tat, 200, 5, 60)
+            results.append(allowed)
+        self.assertEqual(results, [True] * 5 + [False])
+
+    def test_local_backend(self):
+        backend = throttling.LocalBackend(max_keys=2)
+        with mock.patch('config.throttling.time.monotonic', return_value=1000.0) as monotonic:
+            results = [backend.hit('a', 3, 30, scope='login') for _ in range(4)]
+            self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+            self.assertEqual(results[-1][1], 10)
+            self.assertEqual(backend.stats(), {'login': {'allowed': 3, 'denied': 1}})
+
+            monotonic.return_value = 1010.0
+            self.assertTrue(backend.hit('a', 3, 30)[0])
+            self.assertFalse(backend.hit('a', 3, 30)[0])
+
+            # کلیدهای منقضی شده با رسیدن به max_keys دور ریخته می‌شوند
+            monotonic.return_value = 2000.0
+            backend.hit('b', 3, 30)
+            backend.hit('c', 3, 30)
+            self.assertEqual(set(backend._tats), {'b', 'c'})
+
+    def test_retry_after(self):
+        # login: 5/m
+        data = {'email': 'nobody@example.com', 'password': 'wrong'}
+        for _ in range(5):
+            self.assertEqual(self.client.post('/api/account/login/', data).status_code, 400)
+        response = self.client.post('/api/account/login/', data)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), (11, 12))
+        self.assertEqual(throttling.get_backend().stats()['login'], {'allowed': 5, 'denied': 1})
+
+    def test_check_throttle_scopes(self):
+        self.assertEqual(throttling.check_throttle_scopes(), [])
+
+        with mock.patch.object(throttling.ThrottleScopeMixin, 'registry', []):
+            class BrokenViewSet(throttling.ThrottleScopeMixin, GenericViewSet):
+                throttle_scopes = {
+                    'list': 'no-such-scope',
+                    'retrieve': {'FETCH': 'login'},
+                    'missing': 'login',
+                }
+
+                def list(self, request):
+                    pass
+
+                def retrieve(self, request, pk=None):
+                    pass
+
+                @action(detail=False)
+                def export(self, request):
+                    pass
+
+            errors = throttling.check_throttle_scopes()
+
+        self.assertEqual(sorted((error.id, error.msg.split("'")[1]) for error in errors), [
+            ('throttling.E001', 'missing'),
+            ('throttling.E002', 'FETCH'),
+            ('throttling.E003', 'no-such-scope'),
+            ('throttling.W001', 'export'),
+        ])
+        self.assertTrue(all(error.obj.endswith('BrokenViewSet') for error in errors))
+
+    def test_throttle_stats_local(self):
+        """ شمارنده‌های LocalBackend مال همان پردازه است؛ throttle_stats این را می‌گوید """
+        throttling.get_backend().hit('a', 3, 30, scope='login')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('throttle_stats', stdout=out, stderr=err)
+        self.assertEqual(out.getvalue(), 'login: allowed 1, denied 0 (0.00%)\n')
+        self.assertIn('LocalBackend', err.getvalue())
+
+
+def redis_client():
+    try:
+        import redis
+    except ImportError:
+        return None
+    client = redis.Redis.from_url(settings.REDIS_URL or 'redis://localhost:6379/0')
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        return None
+    return client
+
+
+class RedisBackendTests(SimpleTestCase):
+    """ اسکریپت Lua ی RedisBackend روی یک Redis واقعی؛ بدون Redis رد می‌شود """
+
+    def setUp(self):
+        client = redis_client()
+        if client is None:
+            self.skipTest('Redis در دسترس نیست')
+        self.backend = throttling.RedisBackend(client=client, key_prefix=f'test-throttle-{uuid4().hex}:')
+        self.addCleanup(self.backend.reset)
+
+    def test_gcra(self):
+        results = [self.backend.hit('a', 5, 60, scope='login') for _ in range(6)]
+        self.assertEqual([allowed for allowed, _ in results], [True] * 5 + [False])
+        self.assertEqual(results[0][1], 0)
+        self.assertAlmostEqual(results[-1][1], 12, delta=1)
+
+        # کلید با گذشتن TAT منقضی می‌شود
+        ttl = self.backend.client.pttl(self.backend.key_prefix + 'a')
+        self.assertTrue(0 < ttl <= 60 * 1000)
+
+        self.assertTrue(self.backend.hit('b', 5, 60)[0])
+        self.assertEqual(self.backend.stats(), {'login': {'allowed': 5, 'denied': 1}})
+
+        self.backend.reset_stats()
+        self.assertEqual(self.backend.stats(), {})
+        self.backend.reset()
+        self.assertTrue(self.backend.hit('a', 5, 60)[0])
+
+
+class EmailQueueTests(TestCase):
+    """ صف ایمیل (accounts.mail): ارسال دسته‌ای، تلاش دوباره با تاخیر نمایی و توقف پس از MAX_ATTEMPTS """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='user', email='user@example.com', password='x')
+
+    def enqueue(self):
+        return mail.enqueue_email(self.user, 'accounts/email_confirmation.html', 'تایید', 'http://front/?uid={}&token={}')
+
+    def fail_send(self):
+        return mock.patch('django.core.mail.EmailMultiAlternatives.send', side_effect=OSError('smtp down'))
+
+    def make_due(self):
+        EmailJob.objects.update(available_at=timezone.now())
+
+    def test_signup_enqueues(self):
+        response = APIClient().post('/api/account/signup/', {
+            'username': 'new', 'email': 'new@example.com', 'first_name': 'تازه', 'last_name': 'کاربر',
+            'password1': 'NewPass!2345', 'password2': 'NewPass!2345',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        # درخواست منتظر SMTP نمی‌ماند
+        self.assertEqual(len(outbox.outbox), 0)
+        job = EmailJob.objects.get(user__username='new')
+        self.assertEqual(job.status, EmailJob.PENDING)
+
+        self.assertEqual(mail.process_batch(), (1, 0))
+        self.assertEqual(outbox.outbox[0].to, ['new@example.com'])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (EmailJob.SENT, 1))
+        self.assertIsNotNone(job.sent_at)
+        self.assertEqual(mail.process_batch(), (0, 0))
+
+    def test_retry(self):
+        job = self.enqueue()
+        with self.fail_send():
+            self.assertEqual(mail.process_batch(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (EmailJob.PENDING, 1))
+        self.assertIn('smtp down', job.last_error)
+        self.assertGreater(job.available_at, timezone.now() + timedelta(seconds=mail.RETRY_BASE_DELAY - 5))
+
+        # تا زمان تلاش بعدی برداشته نمی‌شود
+        self.assertEqual(mail.process_batch(), (0, 0))
+        self.make_due()
+        self.assertEqual(mail.process_batch(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), (EmailJob.SENT, 2, ''))
+
+    def test_max_attempts(self):
+        job = self.enqueue()
+        with self.fail_send():
+            for _ in range(3):
+                self.make_due()
+                mail.process_batch(max_attempts=3)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (EmailJob.FAILED, 3))
+        self.make_due()
+        self.assertEqual(mail.process_batch(), (0, 0))
+
+    def test_connection_error(self):
+        for _ in range(3):
+            self.enqueue()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('refused'), create=True):
+            self.assertEqual(mail.process_batch(), (0, 3))
+        self.assertEqual(EmailJob.objects.filter(status=EmailJob.PENDING, attempts=1).count(), 3)
+
+    def test_retry_delay(self):
+        delays = [mail.retry_delay(attempts).total_seconds() for attempts in range(1, 10)]
+        self.assertEqual(delays[:3], [30, 60, 120])
+        self.assertEqual(delays[-1], mail.RETRY_MAX_DELAY)
+
+    def test_command(self):
+        self.enqueue()
+        output = io.StringIO()
+        call_command('send_queued_emails', stdout=output)
+        self.assertIn('sent: 1, failed: 0', output.getvalue())
@@ -8,5 +8,6 @@ router.register('account', views.AccountViewSet, basename='account')
 
 
 urlpatterns = [
-    *router.urls
+    *router.urls,
+    path('avatars/<path:path>', views.avatar, name='avatar'),
 ]
\ No newline at end of file
@@ -1,18 +1,29 @@
+import os
+from pathlib import Path
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponseRedirect
 from django.utils import timezone
+from django.utils.cache import add_never_cache_headers
+from django.views.decorators.http import require_safe
 from django.views.decorators.csrf import get_token
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated, BasePermission, SAFE_METHODS
-from rest_framework.throttling import ScopedRateThrottle, UserRateThrottle
+from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.generics import get_object_or_404
 from rest_framework.serializers import Serializer
 
 from django.contrib.auth import login, logout
 
+from . import avatars
 from . import serializers
 from .models import CustomUser
+from blog import delivery
+from config import images
+from config.query_budget import QueryBudgetMixin, query_budget
+from config.throttling import ThrottleScopeMixin
 from config.utils import format_response
 
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, extend_schema_view
@@ -22,33 +33,31 @@ class IsAnonymousUser(BasePermission):
     def has_permission(self, request, view):
         return not bool(request.user and request.user.is_authenticated)
 
-class AccountViewSet(GenericViewSet):
-    throttle_classes = [ScopedRateThrottle]
-
-    @property
-    def throttle_scope(self):
-        if self.action == 'me' and self.request.method in SAFE_METHODS:
-            return 'me_get'
-        if self.action == 'me':
-            return 'me_update'
-        if self.action == 'login':
-            return 'login'
-        if self.action == 'signup':
-            return 'signup'
-        if self.action == 'user_info':
-            return 'user_info'
-        if self.action == 'email_confirmation':
-            return 'email_confirmation'
-        if self.action == 'confirm_reset_password':
-            return 'confirm_reset_password'
-
-        if self.action in [
-            'resend_email_confirmation',
-            'send_reset_password_email_confirmation'
-        ]:
-            return 'send_email'
-
-        return None
+class AccountViewSet(ThrottleScopeMixin, QueryBudgetMixin, GenericViewSet):
+    throttle_scopes = {
+        'me': {'GET': 'me_get', 'HEAD': 'me_get', '*': 'me_update'},
+        'login': 'login',
+        'signup': 'signup',
+        'user_info': 'user_info',
+        'email_confirmation': 'email_confirmation',
+        'confirm_reset_password': 'confirm_reset_password',
+        'resend_email_confirmation': 'send_email',
+        'send_reset_password_email_confirmation': 'send_email',
+        'get_csrf': None,
+        'logout': None,
+    }
+    query_budgets = {
+        'me': {'GET': 2, '*': 5},
+        'login': 9,
+        'signup': 5,
+        'user_info': 1,
+        'email_confirmation': 2,
+        'confirm_reset_password': 2,
+        'resend_email_confirmation': 2,
+        'send_reset_password_email_confirmation': 2,
+        'get_csrf': 0,
+        'logout': 4,
+    }
 
     def get_serializer_class(self):
         action_serializers = {
@@ -338,4 +347,44 @@ class AccountViewSet(GenericViewSet):
 
         return Response(
             serializer.data
-        )
\ No newline at end of file
+        )
+
+@query_budget(1)
+@require_safe
+def avatar(request, path):
+    """
+        تصویر پروفایل (و نسخه‌های کوچک‌شده‌اش). آدرسی که نسخه‌ی فعلی (?v=) را
+        دارد با هدر immutable ارسال می‌شود؛ نسخه‌ی قدیمی به آدرس فعلی redirect می‌شود.
+    """
+    name = path
+    original = images.original_name(name)
+    if not name.startswith(f'{avatars.AVATAR_DIR}/'):
+        raise Http404
+    try:
+        file_path = avatars.avatar_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404
+    # <pk>.<version>.<ext>
+    user_pk = Path(original).name.split('.')[0]
+    current, version = CustomUser.objects.filter(pk=user_pk).values_list(
+        'profile_pic', 'profile_pic_version'
+    ).first() or (None, None)
+    if not current:
+        raise Http404
+
+    # فایل نسخه‌ی قبلی (و نسخه‌های کوچک‌شده‌اش) به تصویر فعلی redirect می‌شود
+    stale = original != current
+    if stale:
+        name = current
+    elif not os.path.isfile(file_path):
+        raise Http404
+
+    if stale or request.GET.get('v') != str(version):
+        response = HttpResponseRedirect(avatars.versioned_url(avatars.avatar_storage.url(name), version))
+        add_never_cache_headers(response)
+        return response
+
+    response = delivery.get_backend().serve(request, name, file_path)
+    if response.status_code in (200, 206, 304):
+        response['Cache-Control'] = avatars.CACHE_CONTROL
+    return response
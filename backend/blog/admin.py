@@ -1,16 +1,16 @@
 from django.contrib import admin
-from .models import Post, Media, Tag, Comment
+from .models import Post, Media, MediaBlob, Tag, Comment
 from django.utils import timezone
 import jdatetime
 
 # ================= Post =================
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'status', 'created_at', 'updated_at')
+    list_display = ('title', 'author', 'status', 'likes_count', 'created_at', 'updated_at')
     list_filter = ('status', 'tags', 'author')
     search_fields = ('title', 'content', 'author__username')
     autocomplete_fields = ('tags', 'likes', 'author')
-    readonly_fields = ('slug', 'created_at', 'updated_at', )
+    readonly_fields = ('slug', 'likes_count', 'created_at', 'updated_at', )
 
 
 # ================= Media =================
@@ -21,10 +21,16 @@ class MediaAdmin(admin.ModelAdmin):
     search_fields = ('file', 'author__username')
     autocomplete_fields = ('author',)
 
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size', 'refcount', 'created_at', 'last_acquired_at')
+    search_fields = ('sha256',)
+    readonly_fields = ('sha256', 'file', 'size', 'refcount', 'created_at', 'last_acquired_at')
+
 # ================= Tag =================
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ('name',)
+    list_display = ('name', 'posts_count')
     search_fields = ('name',)
 
 # ================= Comment =================
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from django.core import checks
+
+        from config import query_budget, throttling
+        from . import like_buffer
+        from . import signals  # noqa: F401
+
+        checks.register(throttling.check_throttle_scopes)
+        checks.register(query_budget.check_query_budgets)
+        checks.register(like_buffer.check_like_buffer)
@@ -0,0 +1,395 @@
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.utils.text import slugify
+
+from config import throttling
+from config.profiling import percentile
+from config.query_budget import count_queries
+from . import caching
+from . import like_buffer
+from . import likes
+from . import models
+from . import sanitizer
+from . import search
+from .tags import refresh_posts_count
+
+PREFIX = 'bench'
+CHUNK_SIZE = 1000
+PERCENTILES = (50, 95, 99)
+MEMORY_SAMPLES = 20
+WORDS = (
+    'جنگو', 'پایتون', 'وب', 'سرعت', 'کش', 'پایگاه', 'داده', 'کوئری', 'نمایه', 'سرور',
+    'django', 'python', 'cache', 'query', 'index', 'latency', 'throughput', 'async',
+)
+
+# نام سناریو: (متد، مسیر)؛ {slug} و {tag} در هر درخواست از داده‌های seed شده پر می‌شوند
+SCENARIOS = {
+    'posts-list': ('get', '/api/posts/'),
+    'posts-list-filtered': ('get', '/api/posts/?tags={tag}&ordering=-likes'),
+    'posts-retrieve': ('get', '/api/posts/{slug}/'),
+    'posts-me-likes': ('get', '/api/posts/me/likes/'),
+    'posts-toggle-like': ('post', '/api/posts/{slug}/toggle_like/'),
+    'tags-list': ('get', '/api/tags/?ordering=-posts_count'),
+    'comments-list': ('get', '/api/posts/{slug}/comment/'),
+    # ویوهای غیرهمگام؛ django.test.Client آن‌ها را با async_to_sync اجرا می‌کند
+    'async-posts-list': ('get', '/api/async/posts/'),
+    'async-posts-retrieve': ('get', '/api/async/posts/{slug}/'),
+    'async-tags-list': ('get', '/api/async/tags/?ordering=-posts_count'),
+    'async-comments-list': ('get', '/api/async/posts/{slug}/comment/'),
+}
+# سناریوهایی که داده می‌نویسند؛ فقط با کاربر benchmark اجرا و پس از اجرا برگردانده می‌شوند
+WRITE_SCENARIOS = {'posts-toggle-like'}
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def build_content(rng, paragraphs):
+    return ''.join(
+        f'<p>{" ".join(rng.choices(WORDS, k=rng.randint(20, 80)))}</p>'
+        for _ in range(paragraphs)
+    )
+
+
+def bench_users():
+    return get_user_model().objects.filter(username__startswith=f'{PREFIX}-')
+
+
+def flush():
+    """ داده‌های seed قبلی؛ پست‌ها، لایک‌ها و دیدگاه‌ها با کاربرها حذف می‌شوند """
+    bench_users().delete()
+    models.Tag.objects.filter(name__startswith=f'{PREFIX}-').delete()
+
+
+def seed(users, posts, tags, tags_per_post, likes_per_post, comments_per_post,
+         chunk_size=CHUNK_SIZE, random_seed=0, log=None):
+    """
+        داده‌ی ساختگی با bulk_create در تکه‌های chunk_size؛ save مدل‌ها اجرا نمی‌شود،
+        پس slug، خلاصه، likes_count، نمایه‌ی جستجو و posts_count برچسب‌ها همین‌جا
+        ساخته می‌شوند. با random_seed ثابت خروجی تکرارپذیر است.
+    """
+    rng = random.Random(random_seed)
+    log = log or (lambda message: None)
+    user_model = get_user_model()
+    # هش یک بار ساخته می‌شود؛ گذرواژه‌ی همه‌ی کاربرها bench است
+    password = make_password(PREFIX)
+
+    for chunk in chunks(range(users), chunk_size):
+        user_model.objects.bulk_create([
+            user_model(
+                username=f'{PREFIX}-{i}',
+                email=f'{PREFIX}-{i}@example.com',
+                first_name=f'کاربر {i}',
+                password=password,
+            )
+            for i in chunk
+        ])
+    user_ids = list(bench_users().values_list('pk', flat=True))
+    log(f"{len(user_ids)} کاربر")
+
+    models.Tag.objects.bulk_create(
+        [models.Tag(name=f'{PREFIX}-{i}') for i in range(tags)],
+        batch_size=chunk_size,
+    )
+    tag_ids = list(models.Tag.objects.filter(name__startswith=f'{PREFIX}-').values_list('pk', flat=True))
+    log(f"{len(tag_ids)} برچسب")
+
+    created = 0
+    for chunk in chunks(range(posts), chunk_size):
+        with transaction.atomic():
+            likers = {i: rng.sample(user_ids, min(likes_per_post, len(user_ids))) for i in chunk}
+            batch = []
+            for i in chunk:
+                title = f'{PREFIX} {i}'
+                content = build_content(rng, rng.randint(1, 8))
+                excerpt, word_count, reading_time = sanitizer.summarize(content)
+                batch.append(models.Post(
+                    title=title,
+                    slug=slugify(title, allow_unicode=True),
+                    content=content,
+                    content_hash=sanitizer.content_hash(content),
+                    excerpt=excerpt,
+                    word_count=word_count,
+                    reading_time=reading_time,
+                    author_id=rng.choice(user_ids),
+                    likes_count=len(likers[i]),
+                ))
+            batch = models.Post.objects.bulk_create(batch)
+
+            models.Post.tags.through.objects.bulk_create([
+                models.Post.tags.through(post_id=post.pk, tag_id=tag_id)
+                for post in batch
+                for tag_id in rng.sample(tag_ids, min(tags_per_post, len(tag_ids)))
+            ], batch_size=chunk_size)
+            models.Post.likes.through.objects.bulk_create([
+                models.Post.likes.through(post_id=post.pk, customuser_id=user_id)
+                for post, i in zip(batch, chunk)
+                for user_id in likers[i]
+            ], batch_size=chunk_size)
+            models.Comment.objects.bulk_create([
+                models.Comment(
+                    post_id=post.pk,
+                    author_id=rng.choice(user_ids),
+                    content=' '.join(rng.choices(WORDS, k=rng.randint(3, 30))),
+                )
+                for post in batch
+                for _ in range(comments_per_post)
+            ], batch_size=chunk_size)
+            models.PostSearchTerm.objects.bulk_create(
+                [term for post in batch for term in search.build_terms(post)],
+                batch_size=chunk_size,
+            )
+        created += len(batch)
+        log(f"{created}/{posts} پست")
+
+    refresh_posts_count(tag_ids)
+    caching.invalidate_feed()
+
+
+class Runner:
+    """
+        سناریوها را در همین پردازه با django.test.Client روی دیتابیس فعلی اجرا
+        می‌کند. محدودیت نرخ در یک LocalBackend جدا و بعد از هر درخواست صفر
+        می‌شود و silk کنار گذاشته می‌شود. بدون use_cache، کش پست‌ها (BLOG_CACHE_ALIAS) با DummyCache
+        جایگزین می‌شود تا زمان ساخت پاسخ اندازه گرفته شود، نه خواندن از کش.
+        درخواست‌ها فقط به پست‌های seed شده می‌روند؛ سناریوهای WRITE_SCENARIOS فقط با
+        کاربر benchmark اجرا می‌شوند و لایک‌های او پس از هر سناریو به حالت قبل برمی‌گردند.
+    """
+
+    def __init__(self, requests, warmup, use_cache=False, username=None, random_seed=0):
+        self.requests = requests
+        self.warmup = warmup
+        self.use_cache = use_cache
+        self.rng = random.Random(random_seed)
+
+        if username:
+            self.user = get_user_model().objects.filter(username=username).first()
+        else:
+            self.user = bench_users().order_by('pk').first()
+        if self.user is None:
+            raise ValueError("داده‌ای برای benchmark نیست؛ اول seed_benchmark_data را اجرا کنید.")
+
+        posts = models.Post.objects.filter(status=True, author__in=bench_users()).exclude(author=self.user)
+        post_ids = dict(posts.order_by('pk').values_list('slug', 'pk'))
+        self.slugs = self.rng.sample(list(post_ids), min(len(post_ids), 100))
+        self.post_ids = [post_ids[slug] for slug in self.slugs]
+        self.tags = list(models.Tag.objects.order_by('-posts_count').values_list('name', flat=True)[:20])
+
+    def path(self, template, index):
+        return template.format(
+            slug=self.slugs[index % len(self.slugs)] if self.slugs else '',
+            tag=self.tags[index % len(self.tags)] if self.tags else '',
+        )
+
+    def call(self, method, template, index):
+        response = getattr(self.client, method)(self.path(template, index))
+        throttling.get_backend().reset()
+        return response
+
+    def overrides(self):
+        overrides = {
+            # profiler ها (silk) خودشان کوئری و حافظه مصرف می‌کنند
+            'MIDDLEWARE': [name for name in settings.MIDDLEWARE if not name.startswith('silk.')],
+            'ALLOWED_HOSTS': ['testserver'],
+            'THROTTLE_BACKEND': {'BACKEND': 'config.throttling.LocalBackend'},
+            # لایک‌ها مستقیم نوشته می‌شوند تا restore_likes همه‌ی آن‌ها را ببیند
+            'LIKE_BUFFER': {**like_buffer.get_config(), 'DIR': None},
+        }
+        if not self.use_cache:
+            overrides['CACHES'] = {
+                **settings.CACHES,
+                'benchmark': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            }
+            overrides['BLOG_CACHE_ALIAS'] = 'benchmark'
+        return override_settings(**overrides)
+
+    def run_scenario(self, method, template):
+        for index in range(self.warmup):
+            self.call(method, template, index)
+
+        latencies, queries, errors = [], [], 0
+        for index in range(self.requests):
+            with count_queries() as counter:
+                start = time.perf_counter()
+                response = self.call(method, template, index)
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(counter.count)
+            if response.status_code >= 400:
+                errors += 1
+
+        # tracemalloc خودش کند است؛ حافظه در دور جدا اندازه گرفته می‌شود
+        tracemalloc.start()
+        try:
+            for index in range(min(self.requests, MEMORY_SAMPLES)):
+                self.call(method, template, index)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'requests': self.requests,
+            'errors': errors,
+            'latency_ms': {
+                **{f'p{p}': round(percentile(latencies, p), 3) for p in PERCENTILES},
+                'mean': round(sum(latencies) / len(latencies), 3),
+            },
+            'queries': {
+                'p50': percentile(queries, 50),
+                'max': max(queries),
+            },
+            'peak_memory_kib': round(peak / 1024, 1),
+        }
+
+    def liked(self):
+        return set(models.Post.likes.through.objects.filter(
+            customuser_id=self.user.pk, post_id__in=self.post_ids,
+        ).values_list('post_id', flat=True))
+
+    def restore_likes(self, liked):
+        changed = like_buffer.apply({(post_id, self.user.pk): post_id in liked for post_id in self.post_ids})
+        if changed:
+            caching.invalidate_post_detail(*(slug for _, slug, _ in changed))
+            caching.invalidate_feed()
+
+    def run(self, names):
+        writes = WRITE_SCENARIOS.intersection(names)
+        if writes and not bench_users().filter(pk=self.user.pk).exists():
+            raise ValueError(f"سناریوهای {', '.join(sorted(writes))} داده می‌نویسند و فقط با کاربر benchmark اجرا می‌شوند.")
+
+        results = {}
+        with self.overrides():
+            # middlewareها با اولین درخواست همین client و با تنظیمات بالا بارگذاری می‌شوند
+            self.client = Client()
+            self.client.force_login(self.user)
+            for name in names:
+                if name not in WRITE_SCENARIOS:
+                    results[name] = self.run_scenario(*SCENARIOS[name])
+                    continue
+                liked = self.liked()
+                try:
+                    results[name] = self.run_scenario(*SCENARIOS[name])
+                finally:
+                    self.restore_likes(liked)
+            meta = self.meta()
+        return {'meta': meta, 'scenarios': results}
+
+    def meta(self):
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'middleware': settings.MIDDLEWARE,
+            'cache': self.use_cache,
+            'warmup': self.warmup,
+            'dataset': {
+                'users': get_user_model().objects.count(),
+                'posts': models.Post.objects.count(),
+                'tags': models.Tag.objects.count(),
+                'likes': models.Post.likes.through.objects.count(),
+                'comments': models.Comment.objects.count(),
+            },
+        }
+
+
+def like_ingestion(intents, posts=10, batch_size=None, random_seed=0):
+    """
+        سرعت ثبت لایک روی چند پست پربازدید: مستقیم (blog.likes.like، یک تراکنش برای
+        هر لایک) در برابر log و flush دسته‌ای (blog.like_buffer). هر روش intents جفت
+        (پست، کاربر) لایک نشده‌ی جدا می‌گیرد و در پایان همه‌ی این لایک‌ها برداشته می‌شوند.
+    """
+    rng = random.Random(random_seed)
+    post_ids = list(models.Post.objects.filter(status=True, author__in=bench_users()).order_by('pk').values_list('pk', flat=True))
+    post_ids = rng.sample(post_ids, min(posts, len(post_ids)))
+    user_ids = list(bench_users().order_by('pk').values_list('pk', flat=True))
+    existing = set(models.Post.likes.through.objects.filter(post_id__in=post_ids).values_list('post_id', 'customuser_id'))
+    candidates = [(post_id, user_id) for post_id in post_ids for user_id in user_ids if (post_id, user_id) not in existing]
+    if len(candidates) < intents * 2:
+        raise ValueError("جفت لایک نشده‌ی کافی نیست؛ --posts را بیشتر یا --intents را کمتر کنید.")
+    pairs = rng.sample(candidates, intents * 2)
+    direct, buffered = pairs[:intents], pairs[intents:]
+
+    results = {}
+    try:
+        start = time.perf_counter()
+        for post_id, user_id in direct:
+            likes.like(post_id, user_id)
+        results['direct'] = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(LIKE_BUFFER={
+            **like_buffer.get_config(), 'DIR': directory, 'BATCH_SIZE': batch_size or like_buffer.get_config()['BATCH_SIZE'],
+        }):
+            start = time.perf_counter()
+            for post_id, user_id in buffered:
+                like_buffer.submit(post_id, user_id, 'like')
+            results['submit'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            like_buffer.flush()
+            results['flush'] = time.perf_counter() - start
+    finally:
+        like_buffer.apply({pair: False for pair in pairs})
+        cache.delete_many([like_buffer.INTENT_KEY.format(post_id=post_id, user_id=user_id) for post_id, user_id in buffered])
+
+    results['buffered'] = results['submit'] + results['flush']
+    return {
+        'intents': intents,
+        'posts': len(post_ids),
+        'seconds': {name: round(seconds, 4) for name, seconds in results.items()},
+        'per_second': {name: round(intents / seconds) for name, seconds in results.items() if seconds},
+    }
+
+
+def git_revision():
+    def rev_parse(*args):
+        return subprocess.run(
+            ['git', 'rev-parse', *args, 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+
+    try:
+        return {'branch': rev_parse('--abbrev-ref'), 'commit': rev_parse()}
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results):
+    """ [(سناریو، معیار، قبلی، فعلی، تغییر نسبی)] برای سناریوهای مشترک """
+    rows = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        for metric in ('p50', 'p95', 'p99'):
+            before, after = previous['latency_ms'][metric], current['latency_ms'][metric]
+            rows.append((name, metric, before, after, (after - before) / before if before else 0))
+    return rows
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
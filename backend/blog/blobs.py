@@ -0,0 +1,143 @@
+import hashlib
+import os
+from datetime import timedelta
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from config import images
+from . import models
+
+BLOB_DIR = 'post_media/blobs'
+GC_GRACE = timedelta(hours=1)
+
+
+class HashingMixin:
+    """
+        sha256 فایل را همزمان با دریافت تکه‌ها حساب می‌کند و روی فایل آپلود شده
+        (file.sha256) می‌گذارد تا برای پیدا کردن تکراری‌ها دوباره خوانده نشود.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # MemoryFileUploadHandler در new_file با StopFutureHandlers برمی‌گردد
+        self.digest = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.digest.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def upload_handlers(request):
+    return [HashingMemoryFileUploadHandler(request), HashingTemporaryFileUploadHandler(request)]
+
+
+def blob_upload_path(instance, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{BLOB_DIR}/{instance.sha256[:2]}/{instance.sha256}{ext}"
+
+
+def file_digest(file):
+    digest = getattr(file, 'sha256', None)
+    if digest:
+        return digest
+
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def acquire(digest):
+    """ اگر blob با این هش وجود داشته باشد، یک ارجاع به آن اضافه و آن را برمی‌گرداند """
+    updated = models.MediaBlob.objects.filter(sha256=digest).update(
+        refcount=F('refcount') + 1,
+        last_acquired_at=timezone.now(),
+    )
+    if updated:
+        return models.MediaBlob.objects.get(sha256=digest)
+    return None
+
+
+def store(file):
+    """
+        blob محتوای file را با یک ارجاع بیشتر برمی‌گرداند. فایل تکراری دوباره
+        نوشته نمی‌شود. خروجی (blob, created) است.
+    """
+    digest = file_digest(file)
+    blob = acquire(digest)
+    if blob is not None:
+        return blob, False
+
+    blob = models.MediaBlob(sha256=digest, size=file.size, refcount=1)
+    blob.file.save(os.path.basename(file.name), file, save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # آپلود همزمان همین محتوا زودتر ثبت شد
+        blob.file.delete(save=False)
+        return acquire(digest), False
+    return blob, True
+
+
+def release(blob_id):
+    models.MediaBlob.objects.filter(pk=blob_id, refcount__gt=0).update(refcount=F('refcount') - 1)
+
+
+def delete_files(blob):
+    storage = blob.file.storage
+    names = [blob.file.name]
+    for width in images.get_widths('media'):
+        for fmt in images.EXTENSIONS:
+            names.append(images.variant_name(blob.file.name, width, fmt))
+    for name in names:
+        storage.delete(name)
+
+
+def collect_garbage(grace=GC_GRACE, dry_run=False):
+    """
+        refcount را از روی ردیف‌های Media دوباره حساب می‌کند و blob های بدون
+        ارجاع (و نسخه‌های کوچک‌شده‌شان) را حذف می‌کند. blob هایی که در grace
+        اخیر ساخته یا دوباره ارجاع داده شده‌اند کنار گذاشته می‌شوند چون ممکن
+        است Media آن‌ها هنوز commit نشده باشد.
+    """
+    references = models.Media.objects.filter(
+        blob=OuterRef('pk')
+    ).order_by().values('blob').annotate(c=Count('*')).values('c')
+
+    candidates = models.MediaBlob.objects.filter(last_acquired_at__lt=timezone.now() - grace)
+    if dry_run:
+        unreferenced = list(candidates.annotate(
+            references=Coalesce(Subquery(references), 0)
+        ).filter(references=0).only('pk', 'size'))
+        return len(unreferenced), sum(blob.size for blob in unreferenced)
+
+    # شمارش و حذف در یک تراکنش؛ acquire ی همزمان last_acquired_at را جلو می‌برد
+    # و blob از candidates بیرون می‌رود
+    with transaction.atomic():
+        candidates.update(refcount=Coalesce(Subquery(references), 0))
+        unreferenced = list(candidates.filter(refcount=0).only('pk', 'file', 'size'))
+        models.MediaBlob.objects.filter(pk__in=[blob.pk for blob in unreferenced]).delete()
+
+    for blob in unreferenced:
+        delete_files(blob)
+    return len(unreferenced), sum(blob.size for blob in unreferenced)
@@ -0,0 +1,148 @@
+import hashlib
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DETAIL_KEY = 'post-detail:{version}:{slug}:{origin}'
+DETAIL_VERSION_KEY = 'post-detail-version:{slug}'
+DETAIL_TIMEOUT = 60 * 10
+
+FEED_KEY = 'post-feed:{generation}:{digest}'
+FEED_GENERATION_KEY = 'post-feed-generation'
+FEED_STATS_KEY = 'post-feed-stats:{name}'
+FEED_TIMEOUT = 60
+FEED_PAGINATION_PARAMS = ('page', 'cursor')
+
+
+def get_cache():
+    return caches[getattr(settings, 'BLOG_CACHE_ALIAS', 'default')]
+
+
+def _version(key):
+    version = get_cache().get(key)
+    if version is None:
+        version = uuid4().hex
+        # add() نسخه‌ای را که نویسنده‌ی همزمان همین الان گذاشته است بازنویسی نمی‌کند
+        if not get_cache().add(key, version, timeout=None):
+            version = get_cache().get(key, version)
+    return version
+
+
+def _bump(*keys):
+    """
+        با عوض شدن نسخه، کلیدهای قبلی دیگر خوانده نمی‌شوند و با timeout منقضی می‌شوند.
+        بعد از commit هم دوباره اجرا می‌شود تا خواندنی که پیش از commit داده‌ی
+        قدیمی را کش کرده، باقی نماند.
+    """
+    if not keys:
+        return
+
+    def bump():
+        get_cache().set_many({key: uuid4().hex for key in keys}, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _origin(request):
+    # HyperlinkedIdentityField ها به host وابسته هستند
+    return request.build_absolute_uri('/')
+
+
+def _plain(data):
+    """
+        Hyperlink (خروجی HyperlinkedIdentityField) زیرکلاس str است و شی مدل را
+        همراه دارد؛ pickle کردنش مدل را هم در کش می‌نویسد و برای فیلدهای defer
+        شده‌ی آن به ازای هر ردیف یک کوئری می‌زند.
+    """
+    if isinstance(data, dict):
+        return {key: _plain(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_plain(value) for value in data]
+    if isinstance(data, str):
+        return str(data)
+    return data
+
+
+def get_post_detail(slug, request):
+    """
+        (data, version) را برمی‌گرداند. اگر data برابر None بود، خروجی ساخته شده
+        باید با همین version در set_post_detail ذخیره شود تا اگر در این فاصله
+        پست تغییر کرد، داده‌ی کهنه زیر نسخه‌ی جدید ذخیره نشود.
+    """
+    version = _version(DETAIL_VERSION_KEY.format(slug=slug))
+    key = DETAIL_KEY.format(version=version, slug=slug, origin=_origin(request))
+    return get_cache().get(key), version
+
+
+def set_post_detail(slug, version, request, data):
+    timeout = getattr(settings, 'POST_DETAIL_CACHE_TIMEOUT', DETAIL_TIMEOUT)
+    key = DETAIL_KEY.format(version=version, slug=slug, origin=_origin(request))
+    get_cache().set(key, _plain(data), timeout=timeout)
+
+
+def invalidate_post_detail(*slugs):
+    _bump(*{DETAIL_VERSION_KEY.format(slug=slug) for slug in slugs if slug})
+
+
+def feed_query(request, filterset_class):
+    """
+        فقط پارامترهای فیلترست و صفحه‌بندی، با ترتیب ثابت؛
+        تگ‌ها هم مرتب می‌شوند چون ترتیبشان در نتیجه اثری ندارد.
+    """
+    params = []
+    for name in (*filterset_class.base_filters, *FEED_PAGINATION_PARAMS):
+        if name not in request.query_params:
+            continue
+        value = request.query_params.get(name)
+        if name == 'tags':
+            value = ','.join(sorted(set(value.split(','))))
+        params.append((name, value))
+    return urlencode(sorted(params))
+
+
+def get_feed_page(request, filterset_class):
+    """
+        مانند get_post_detail، (data, key) برمی‌گرداند تا خروجی ساخته شده
+        با همان generation ذخیره شود.
+    """
+    # لینک‌های next و previous به مسیر درخواست (همگام یا api/async/) وابسته هستند
+    query = request.build_absolute_uri(request.path) + '?' + feed_query(request, filterset_class)
+    key = FEED_KEY.format(
+        generation=_version(FEED_GENERATION_KEY),
+        digest=hashlib.md5(query.encode()).hexdigest(),
+    )
+    data = get_cache().get(key)
+    _count('hit' if data is not None else 'miss')
+    return data, key
+
+
+def set_feed_page(key, data):
+    timeout = getattr(settings, 'POST_FEED_CACHE_TIMEOUT', FEED_TIMEOUT)
+    get_cache().set(key, _plain(data), timeout=timeout)
+
+
+def invalidate_feed():
+    _bump(FEED_GENERATION_KEY)
+
+
+def _count(name):
+    key = FEED_STATS_KEY.format(name=name)
+    try:
+        get_cache().incr(key)
+    except ValueError:
+        if not get_cache().add(key, 1, timeout=None):
+            get_cache().incr(key)
+
+
+def feed_stats():
+    keys = {name: FEED_STATS_KEY.format(name=name) for name in ('hit', 'miss')}
+    values = get_cache().get_many(keys.values())
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
+
+def reset_feed_stats():
+    get_cache().delete_many([FEED_STATS_KEY.format(name=name) for name in ('hit', 'miss')])
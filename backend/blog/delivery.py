@@ -0,0 +1,145 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.module_loading import import_string
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+class BaseBackend:
+    """
+        ارسال فایل رسانه‌ی خصوصی؛ دسترسی پیش از فراخوانی serve بررسی شده است.
+        path مسیر نسبی فایل در MEDIA_ROOT و file_path مسیر کامل آن است.
+    """
+
+    def serve(self, request, path, file_path):
+        raise NotImplementedError
+
+    def content_type(self, file_path):
+        content_type, encoding = mimetypes.guess_type(str(file_path))
+        return content_type or 'application/octet-stream'
+
+
+class XAccelBackend(BaseBackend):
+    """ nginx: location مربوط به PRIVATE_MEDIA_ACCEL_PREFIX باید internal باشد. """
+
+    def serve(self, request, path, file_path):
+        prefix = getattr(settings, 'PRIVATE_MEDIA_ACCEL_PREFIX', '/private_media/')
+        response = HttpResponse(content_type=self.content_type(file_path))
+        response['X-Accel-Redirect'] = quote(f"{prefix.rstrip('/')}/{path}")
+        return response
+
+
+class XSendfileBackend(BaseBackend):
+    """ Apache (mod_xsendfile) و lighttpd """
+
+    def serve(self, request, path, file_path):
+        response = HttpResponse(content_type=self.content_type(file_path))
+        response['X-Sendfile'] = str(file_path)
+        return response
+
+
+class RangeFile:
+    """
+        فقط length بایت از offset را می‌خواند. fileno ندارد تا wsgi.file_wrapper
+        آن را با sendfile تا انتهای فایل نفرستد.
+    """
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.remaining = length
+        self.file.seek(offset)
+        self.name = file.name
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class PythonBackend(BaseBackend):
+    """
+        ارسال مستقیم با FileResponse، وقتی پراکسی جلوی برنامه نیست (تست‌ها و runserver).
+        از Range تکی، ETag و If-Modified-Since پشتیبانی می‌کند؛ پاسخ کامل فایل
+        را به wsgi.file_wrapper می‌دهد تا در صورت امکان با sendfile ارسال شود.
+    """
+
+    def serve(self, request, path, file_path):
+        stat = os.stat(file_path)
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = int(stat.st_mtime)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
+        byte_range = self.parse_range(request, stat.st_size, etag, last_modified)
+        if byte_range == 'invalid':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        file = open(file_path, 'rb')
+        if byte_range is None:
+            response = FileResponse(file, content_type=self.content_type(file_path))
+        else:
+            start, end = byte_range
+            response = FileResponse(
+                RangeFile(file, start, end - start + 1),
+                status=206,
+                content_type=self.content_type(file_path)
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+
+        response.block_size = BLOCK_SIZE
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def parse_range(self, request, size, etag, last_modified):
+        header = request.headers.get('Range')
+        if not header:
+            return None
+
+        if_range = request.headers.get('If-Range')
+        if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+            return None
+
+        match = RANGE_RE.match(header.strip())
+        if not match:
+            # چند بازه‌ای پشتیبانی نمی‌شود؛ کل فایل ارسال می‌شود
+            return None
+
+        start, end = match.groups()
+        if not start and not end:
+            return 'invalid'
+        if not start:
+            length = int(end)
+            if not length:
+                return 'invalid'
+            return max(size - length, 0), size - 1
+
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+        if start >= size or start > end:
+            return 'invalid'
+        return start, end
+
+
+def get_backend():
+    backend = getattr(settings, 'PRIVATE_MEDIA_BACKEND', 'blog.delivery.PythonBackend')
+    return import_string(backend)()
@@ -0,0 +1,185 @@
+import asyncio
+import json
+from threading import Lock
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+DEFAULTS = {
+    # حداکثر پیام‌های در صف هر مشترک؛ مشترکی که عقب بماند reset می‌گیرد و قطع می‌شود
+    'QUEUE_SIZE': 100,
+    # حداکثر اتصال هم‌زمان به یک پست در هر پردازه
+    'MAX_SUBSCRIBERS': 1000,
+    # فاصله‌ی ارسال comment خالی تا proxyها اتصال بی‌کار را نبندند (ثانیه)
+    'KEEPALIVE': 15,
+    # فاصله‌ی اتصال دوباره‌ی EventSource پس از قطع شدن (میلی‌ثانیه)
+    'RETRY': 3000,
+}
+RESET = 'reset'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'POST_EVENTS', {})}
+
+
+def format_event(event, data):
+    """ یک پیام SSE؛ JSON یک خطی است پس یک خط data کافی است """
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+class Subscription:
+    """
+        صف محدود یک اتصال SSE. put فقط در event loop ی همان اتصال اجرا می‌شود
+        (Broker با call_soon_threadsafe)، پس با get رقابتی ندارد.
+        پیام‌های دارای key (مثل تعداد لایک) ادغام می‌شوند: تا وقتی پیام قبلی همان
+        key خوانده نشده، فقط مقدارش با آخرین مقدار جایگزین می‌شود.
+    """
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.pending = {}
+        self.overflowed = False
+
+    def put(self, message, key=None):
+        if self.overflowed:
+            return
+        if key is not None:
+            pending = key in self.pending
+            self.pending[key] = message
+            if pending:
+                return
+            message = None
+        try:
+            self.queue.put_nowait((key, message))
+        except asyncio.QueueFull:
+            # مصرف‌کننده‌ی کند: به جای رشد حافظه، صف خالی و اتصال با reset بسته می‌شود؛
+            # کلاینت دوباره وصل می‌شود و وضعیت را از نو می‌خواند
+            self.overflowed = True
+            self.pending.clear()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((None, format_event(RESET, {})))
+
+    async def get(self):
+        key, message = await self.queue.get()
+        return self.pending.pop(key) if key is not None else message
+
+
+class Broker:
+    """
+        pub/sub درون‌پردازه‌ای: هر کانال (id پست) مجموعه‌ای از Subscription دارد.
+        publish از هر thread (ویوهای همگام) قابل فراخوانی است. بین پردازه‌ها
+        مشترک نیست؛ فقط اتصال‌های همان پردازه‌ی ASGI پیام را می‌گیرند.
+    """
+
+    def __init__(self, queue_size, max_subscribers):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._channels = {}
+        self._lock = Lock()
+
+    def subscribe(self, channel):
+        """ Subscription جدید، یا None اگر کانال پر باشد """
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            subscribers = self._channels.setdefault(channel, set())
+            if len(subscribers) >= self.max_subscribers:
+                return None
+            subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel, subscription):
+        with self._lock:
+            subscribers = self._channels.get(channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._channels.pop(channel, None)
+
+    def publish(self, channel, message, key=None):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message, key)
+            except RuntimeError:
+                # event loop ی اتصال بسته شده است
+                self.unsubscribe(channel, subscription)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._channels.get(channel, ()))
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        config = get_config()
+        _broker = Broker(config['QUEUE_SIZE'], config['MAX_SUBSCRIBERS'])
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'POST_EVENTS':
+        _broker = None
+
+
+def publish(post_id, event, data, coalesce=False):
+    """
+        پس از commit به مشترک‌های پست ارسال می‌شود. پیام یک بار و در thread
+        ناشر ساخته می‌شود؛ با coalesce فقط آخرین مقدار رویداد به هر مشترک می‌رسد.
+    """
+    message = format_event(event, data)
+    key = event if coalesce else None
+    transaction.on_commit(lambda: get_broker().publish(post_id, message, key))
+
+
+def publish_comment(comment, data):
+    publish(comment.post_id, 'comment', data)
+
+
+def publish_likes(post_id, likes):
+    publish(post_id, 'likes', {'likes': likes}, coalesce=True)
+
+
+class EventStream:
+    """
+        بدنه‌ی text/event-stream برای StreamingHttpResponse، تا قطع اتصال یا reset.
+        Django پس از پایان پاسخ یا قطع اتصال close را صدا می‌زند، حتی اگر ارسال
+        بدنه هنوز شروع نشده باشد؛ اشتراک همان‌جا برداشته می‌شود.
+    """
+
+    def __init__(self, broker, channel, subscription, first_events=()):
+        self.broker = broker
+        self.channel = channel
+        self.subscription = subscription
+        self.first_events = first_events
+
+    def __aiter__(self):
+        return self.events()
+
+    async def events(self):
+        config = get_config()
+        yield f"retry: {config['RETRY']}\n\n"
+        for message in self.first_events:
+            yield message
+
+        while True:
+            try:
+                message = await asyncio.wait_for(self.subscription.get(), timeout=config['KEEPALIVE'])
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield message
+            if self.subscription.overflowed and self.subscription.queue.empty():
+                return
+
+    def close(self):
+        self.broker.unsubscribe(self.channel, self.subscription)
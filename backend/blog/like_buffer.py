@@ -0,0 +1,257 @@
+import fcntl
+import json
+import os
+import time
+from collections import defaultdict
+from itertools import islice
+from pathlib import Path
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+
+from . import caching
+from . import events
+from . import likes
+from . import models
+
+DEFAULTS = {
+    # پوشه‌ی log؛ اگر تنظیم نشود لایک‌ها مستقیم در دیتابیس نوشته می‌شوند (blog.likes)
+    'DIR': None,
+    # تعداد جفت (پست، کاربر) در هر تراکنش flush
+    'BATCH_SIZE': 1000,
+    # فاصله‌ی flush_like_buffer بین دو flush (ثانیه)
+    'INTERVAL': 1.0,
+    # مدت نگه‌داری آخرین وضعیت هر کاربر در کش تا toggle بعدی پیش از flush درست باشد
+    'INTENT_TIMEOUT': 60 * 5,
+    # fsync پس از هر خط؛ بدون آن، log از کرش پردازه جان سالم به در می‌برد ولی از قطع برق نه
+    'FSYNC': False,
+}
+INTENT_KEY = 'like-intent:{post_id}:{user_id}'
+# کش‌هایی که بین پردازه‌ها مشترک نیستند
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LIKE_BUFFER', {})}
+
+
+def is_enabled():
+    return bool(get_config()['DIR'])
+
+
+def check_like_buffer(app_configs=None, **kwargs):
+    """
+        خواسته‌ی flush نشده‌ی هر کاربر در کش نگه داشته می‌شود و flush کش جزئیات
+        و فید را باطل می‌کند؛ با کش درون‌پردازه‌ای، پردازه‌ی دیگر (worker بعدی یا
+        flush_like_buffer) آن‌ها را نمی‌بیند و toggle و likes_count نادرست می‌شوند.
+    """
+    if not is_enabled():
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in LOCAL_CACHES:
+        return [checks.Error(
+            f"LIKE_BUFFER['DIR'] به کش مشترک بین پردازه‌ها نیاز دارد، ولی کش default از {backend} است.",
+            hint="REDIS_URL را تنظیم کنید یا LIKE_BUFFER['DIR'] را خالی بگذارید.",
+            id='like_buffer.E001',
+        )]
+    return []
+
+
+class LikeLog:
+    """
+        log فقط-افزودنی لایک‌ها. هر پردازه فایل likes-<pid>.jsonl خودش را دارد؛
+        flush فایل‌ها را به segment تغییر نام می‌دهد و می‌خواند. نوشتن و تغییر نام با
+        flock هماهنگ می‌شوند تا خطی که هم‌زمان با تغییر نام نوشته می‌شود گم نشود.
+        segmentها فقط پس از commit حذف می‌شوند، پس بعد از کرش دوباره اعمال می‌شوند.
+    """
+
+    def __init__(self, directory, fsync=False):
+        self.directory = Path(directory)
+        self.fsync = fsync
+        self._lock = Lock()
+
+    @property
+    def path(self):
+        return self.directory / f'likes-{os.getpid()}.jsonl'
+
+    def append(self, post_id, user_id, liked):
+        line = json.dumps({'post': post_id, 'user': user_id, 'liked': liked, 'time': time.time_ns()}) + '\n'
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            while True:
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    fcntl.flock(file, fcntl.LOCK_EX)
+                    # اگر flush بین open و flock فایل را برداشته، در فایل جدید نوشته می‌شود
+                    try:
+                        if os.fstat(file.fileno()).st_ino != os.stat(self.path).st_ino:
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    file.write(line)
+                    file.flush()
+                    if self.fsync:
+                        os.fsync(file.fileno())
+                    return
+
+    def seal(self):
+        """ فایل‌های فعال همه‌ی پردازه‌ها segment می‌شوند؛ همه‌ی segmentها را برمی‌گرداند """
+        for path in self.directory.glob('likes-*.jsonl'):
+            segment = path.with_name(f'{path.stem}.{time.time_ns()}.segment')
+            try:
+                os.rename(path, segment)
+            except FileNotFoundError:
+                continue
+            # منتظر نوشتنی که پیش از تغییر نام قفل را گرفته است
+            with open(segment, 'a') as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+        return self.segments()
+
+    def segments(self):
+        return sorted(self.directory.glob('*.segment'))
+
+    def flush_lock(self):
+        """ فقط یک flush هم‌زمان؛ قفل با بسته شدن فایل آزاد می‌شود """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        file = open(self.directory / 'flush.lock', 'w')
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return file
+
+
+_log = None
+
+
+def get_log():
+    global _log
+    if _log is None:
+        config = get_config()
+        _log = LikeLog(config['DIR'], fsync=config['FSYNC'])
+    return _log
+
+
+@receiver(setting_changed)
+def reset_log(setting, **kwargs):
+    global _log
+    if setting == 'LIKE_BUFFER':
+        _log = None
+
+
+def submit(post_id, user_id, operation):
+    """
+        به جای نوشتن در دیتابیس، خواسته‌ی کاربر در log ثبت می‌شود. تعداد برگشتی
+        خوش‌بینانه است: likes_count ذخیره شده به علاوه‌ی اثر همین کاربر؛ لایک‌های
+        flush نشده‌ی دیگران در آن نیست. (liked, likes_count, changed)
+    """
+    likes_count, stored = likes.state(post_id, user_id)
+
+    key = INTENT_KEY.format(post_id=post_id, user_id=user_id)
+    # خواسته‌ی قبلی کاربر که هنوز flush نشده
+    current = cache.get(key, stored)
+    liked = {'like': True, 'unlike': False, 'toggle': not current}[operation]
+
+    if liked != current:
+        get_log().append(post_id, user_id, liked)
+        cache.set(key, liked, timeout=get_config()['INTENT_TIMEOUT'])
+
+    return liked, max(likes_count + liked - stored, 0), liked != current
+
+
+def read_segments(paths):
+    """
+        {(post_id, user_id): liked} با آخرین خواسته‌ی هر جفت بر اساس زمان ثبت،
+        چون خواسته‌های یک کاربر ممکن است در فایل چند پردازه باشند؛ و تعداد خط‌ها
+    """
+    latest, lines = {}, 0
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                    key = (entry['post'], entry['user'])
+                    recorded, liked = int(entry['time']), bool(entry['liked'])
+                except (ValueError, KeyError, TypeError):
+                    # خط نیمه‌کاره‌ی پردازه‌ای که هنگام نوشتن متوقف شده
+                    continue
+                lines += 1
+                if key not in latest or latest[key][0] <= recorded:
+                    latest[key] = (recorded, liked)
+    return {key: liked for key, (_, liked) in latest.items()}, lines
+
+
+def apply(intents):
+    """
+        یک دسته در یک تراکنش: درج با bulk_create(ignore_conflicts)، حذف با یک DELETE
+        برای هر پست و شمارش دوباره‌ی likes_count پست‌های تغییر کرده. نتیجه فقط به
+        وضعیت نهایی بستگی دارد، پس اعمال دوباره‌ی همان دسته بی‌اثر است.
+    """
+    through = models.Post.likes.through
+    # پست یا کاربری که پس از ثبت خواسته حذف شده. بیرون از تراکنش خوانده می‌شود تا
+    # اولین دستور تراکنش نوشتن باشد و SQLite آن را پشت نوشتن‌های دیگر صف کند؛ اگر
+    # در این فاصله حذف شود، commit با خطای FK شکست می‌خورد و segmentها دوباره اعمال می‌شوند
+    post_ids = set(models.Post.objects.filter(
+        pk__in={post_id for post_id, _ in intents}
+    ).values_list('pk', flat=True))
+    user_ids = set(get_user_model().objects.filter(
+        pk__in={user_id for _, user_id in intents}
+    ).values_list('pk', flat=True))
+
+    liked, unliked = [], defaultdict(list)
+    for (post_id, user_id), like in intents.items():
+        if post_id not in post_ids or user_id not in user_ids:
+            continue
+        if like:
+            liked.append(through(post_id=post_id, customuser_id=user_id))
+        else:
+            unliked[post_id].append(user_id)
+
+    with transaction.atomic():
+        through.objects.bulk_create(liked, ignore_conflicts=True)
+        for post_id, users in unliked.items():
+            through.objects.filter(post_id=post_id, customuser_id__in=users).delete()
+
+        counts = through.objects.filter(
+            post_id=OuterRef('pk')
+        ).order_by().values('post_id').annotate(c=Count('*')).values('c')
+        changed = models.Post.objects.filter(pk__in={item.post_id for item in liked} | unliked.keys())
+        changed.update(likes_count=Coalesce(Subquery(counts), 0))
+        return list(changed.values_list('pk', 'slug', 'likes_count'))
+
+
+def flush(log=None, batch_size=None):
+    """
+        segmentهای باقی‌مانده از flush ناتمام قبلی (کرش) همراه با فایل‌های فعال
+        خوانده و اعمال می‌شوند و فقط پس از commit همه‌ی دسته‌ها حذف می‌شوند.
+        رویداد likes در Broker ی همین پردازه منتشر می‌شود؛ broker بین پردازه‌ها
+        مشترک نیست، پس وقتی flush در flush_like_buffer اجرا می‌شود، اتصال‌های SSE
+        ی سرور تعداد جدید را تا بارگذاری دوباره‌ی پست نمی‌گیرند.
+    """
+    log = log or get_log()
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    with log.flush_lock():
+        segments = log.seal()
+        intents, lines = read_segments(segments)
+
+        posts = {}
+        iterator = iter(intents.items())
+        while batch := dict(islice(iterator, batch_size)):
+            posts.update((pk, (slug, likes_count)) for pk, slug, likes_count in apply(batch))
+
+        if posts:
+            caching.invalidate_post_detail(*(slug for slug, _ in posts.values()))
+            caching.invalidate_feed()
+        for pk, (_, likes_count) in posts.items():
+            events.publish_likes(pk, likes_count)
+        for segment in segments:
+            segment.unlink()
+
+    return {'segments': len(segments), 'intents': lines, 'pairs': len(intents), 'posts': len(posts)}
@@ -0,0 +1,77 @@
+from django.db import connection, transaction
+
+from . import models
+
+
+def _sql():
+    through = models.Post.likes.through._meta
+    post_column = through.get_field('post').column
+    user_column = through.get_field('customuser').column
+    qn = connection.ops.quote_name
+    post_table = qn(models.Post._meta.db_table)
+    post_pk = qn(models.Post._meta.pk.column)
+    return {
+        'like': (
+            f'INSERT INTO {qn(through.db_table)} ({qn(post_column)}, {qn(user_column)}) '
+            f'VALUES (%s, %s) ON CONFLICT DO NOTHING'
+        ),
+        'unlike': (
+            f'DELETE FROM {qn(through.db_table)} WHERE {qn(post_column)} = %s AND {qn(user_column)} = %s'
+        ),
+        'count': (
+            f'UPDATE {post_table} SET likes_count = likes_count + %s '
+            f'WHERE {post_pk} = %s RETURNING likes_count'
+        ),
+        'state': (
+            f'SELECT likes_count, EXISTS(SELECT 1 FROM {qn(through.db_table)} '
+            f'WHERE {qn(post_column)} = %s AND {qn(user_column)} = %s) '
+            f'FROM {post_table} WHERE {post_pk} = %s'
+        ),
+    }
+
+
+def _apply(post_id, user_id, statements):
+    """
+        statements به ترتیب اجرا می‌شوند تا یکی ردیفی را تغییر دهد؛ سپس likes_count
+        در همان تراکنش با UPDATE ... RETURNING جابه‌جا و خوانده می‌شود.
+        اولین دستور تراکنش نوشتن است، پس دو درخواست هم‌زمان یک کاربر پشت سر هم
+        اجرا می‌شوند و هیچ‌کدام وضعیت کهنه نمی‌بیند. (liked, likes_count, changed)
+    """
+    sql = _sql()
+    with transaction.atomic(), connection.cursor() as cursor:
+        delta = 0
+        for statement in statements:
+            cursor.execute(sql[statement], [post_id, user_id])
+            if cursor.rowcount:
+                delta = 1 if statement == 'like' else -1
+                break
+
+        cursor.execute(sql['count'], [delta, post_id])
+        likes_count = cursor.fetchone()[0]
+
+    if delta:
+        return delta > 0, likes_count, True
+    # تغییری نبود: ردیف از قبل در وضعیت آخرین دستور بود (مثلا like روی پست لایک شده)
+    return statements[-1] == 'like', likes_count, False
+
+
+def like(post_id, user_id):
+    """ idempotent؛ لایک دوباره تغییری نمی‌دهد """
+    return _apply(post_id, user_id, ['like'])
+
+
+def unlike(post_id, user_id):
+    return _apply(post_id, user_id, ['unlike'])
+
+
+def toggle(post_id, user_id):
+    """ اگر ردیفی حذف نشد (لایک نشده بود)، درج می‌شود """
+    return _apply(post_id, user_id, ['unlike', 'like'])
+
+
+def state(post_id, user_id):
+    """ (likes_count, liked) ذخیره شده با یک کوئری؛ فقط خواندن """
+    with connection.cursor() as cursor:
+        cursor.execute(_sql()['state'], [post_id, user_id, post_id])
+        likes_count, liked = cursor.fetchone()
+    return likes_count, bool(liked)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import benchmark
+
+
+class Command(BaseCommand):
+    help = "مقایسه‌ی لایک در ثانیه: نوشتن مستقیم در برابر log و flush دسته‌ای (LIKE_BUFFER) روی داده‌ی seed شده"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intents', type=int, default=2000, help="تعداد لایک‌های هر روش")
+        parser.add_argument('--posts', type=int, default=10, help="تعداد پست‌هایی که لایک‌ها بینشان پخش می‌شوند")
+        parser.add_argument('--batch-size', type=int, default=None, help="پیش‌فرض LIKE_BUFFER['BATCH_SIZE']")
+        parser.add_argument('--output', help="ذخیره‌ی نتیجه به صورت JSON")
+
+    def handle(self, *args, **options):
+        if options['intents'] < 1:
+            raise CommandError("--intents باید حداقل ۱ باشد.")
+        try:
+            result = benchmark.like_ingestion(
+                options['intents'],
+                posts=options['posts'],
+                batch_size=options['batch_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        labels = {
+            'direct': 'مستقیم (blog.likes)',
+            'submit': 'ثبت در log',
+            'flush': 'flush دسته‌ای',
+            'buffered': 'log + flush',
+        }
+        self.stdout.write(f"{result['intents']} لایک روی {result['posts']} پست")
+        for name, label in labels.items():
+            self.stdout.write(
+                f"  {label:<22} {result['seconds'][name]:9.3f} s  {result['per_second'].get(name, 0):>9} لایک در ثانیه"
+            )
+        if result['seconds']['buffered']:
+            speedup = result['seconds']['direct'] / result['seconds']['buffered']
+            self.stdout.write(self.style.SUCCESS(f"log + flush {speedup:.1f} برابر مستقیم"))
+
+        if options['output']:
+            benchmark.save(options['output'], result)
+            self.stdout.write(self.style.SUCCESS(f"نتیجه در {options['output']} ذخیره شد."))
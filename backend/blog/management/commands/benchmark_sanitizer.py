@@ -0,0 +1,50 @@
+import timeit
+
+import bleach
+from django.core.management.base import BaseCommand
+
+from blog import sanitizer
+
+
+def build_document(blocks):
+    parts = []
+    for i in range(blocks):
+        parts.append(f'<h2 class="title">بخش {i}</h2>')
+        parts.append(f'<p>متن نمونه‌ی <b>شماره</b> {i} با <a href="https://example.com/{i}" onclick="x()">پیوند</a></p>')
+        parts.append(f'<img src="https://example.com/{i}.png" alt="تصویر {i}" style="width:100%">')
+        parts.append(f'<pre><code class="python">def f{i}(x):\n    return x &lt; {i}</code></pre>')
+        parts.append('<script>alert(1)</script>')
+    return ''.join(parts)
+
+
+class Command(BaseCommand):
+    help = "مقایسه‌ی زمان پاک‌سازی HTML روی اسناد بزرگ"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocks', type=int, nargs='+', default=[100, 1000, 5000],
+                            help='تعداد بلوک‌های h2/p/img/pre در هر سند')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+
+        for blocks in options['blocks']:
+            document = build_document(blocks)
+            cleaned, digest = sanitizer.sanitize(document)
+
+            cases = {
+                'bleach.clean': lambda: bleach.clean(
+                    document,
+                    tags=sanitizer.ALLOWED_TAGS,
+                    attributes=sanitizer.ALLOWED_ATTRIBUTES,
+                    protocols=sanitizer.ALLOWED_PROTOCOLS,
+                    strip=True
+                ),
+                'shared cleaner': lambda: sanitizer.sanitize(document),
+                'unchanged (hash hit)': lambda: sanitizer.sanitize(cleaned, digest),
+            }
+
+            self.stdout.write(f"{blocks} blocks, {len(document) / 1024:.0f} KiB")
+            for name, case in cases.items():
+                best = min(timeit.repeat(case, number=1, repeat=repeat))
+                self.stdout.write(f"  {name:<22} {best * 1000:10.2f} ms")
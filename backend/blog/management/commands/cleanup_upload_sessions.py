@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from blog import uploads
+
+
+class Command(BaseCommand):
+    help = "حذف آپلودهای تکه‌تکه‌ی رها شده و فایل‌های موقتشان"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=uploads.SESSION_MAX_AGE.total_seconds() / 3600,
+            help="نشست‌هایی که در این مدت تکه‌ای نگرفته‌اند حذف می‌شوند",
+        )
+
+    def handle(self, *args, **options):
+        removed = uploads.cleanup(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"{removed} آپلود رها شده حذف شد."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from blog import caching
+
+
+class Command(BaseCommand):
+    help = "نمایش تعداد hit و miss کش صفحات لیست پست‌ها"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='صفر کردن شمارنده‌ها بعد از نمایش')
+
+    def handle(self, *args, **options):
+        stats = caching.feed_stats()
+        total = stats['hit'] + stats['miss']
+        ratio = stats['hit'] / total if total else 0
+
+        self.stdout.write(f"hit: {stats['hit']}")
+        self.stdout.write(f"miss: {stats['miss']}")
+        self.stdout.write(f"hit ratio: {ratio:.2%}")
+
+        if options['reset']:
+            caching.reset_feed_stats()
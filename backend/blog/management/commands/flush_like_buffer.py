@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from blog import like_buffer
+
+
+class Command(BaseCommand):
+    help = "نوشتن دسته‌ای لایک‌های ثبت شده در log (LIKE_BUFFER) در دیتابیس؛ segmentهای مانده از کرش هم اعمال می‌شوند"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="اجرای پیوسته به صورت worker")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="فاصله‌ی flushها در حالت --loop (ثانیه)؛ پیش‌فرض LIKE_BUFFER['INTERVAL']")
+
+    def handle(self, *args, **options):
+        if not like_buffer.is_enabled():
+            raise CommandError("LIKE_BUFFER['DIR'] تنظیم نشده است.")
+        interval = options['interval'] or like_buffer.get_config()['INTERVAL']
+
+        remaining = len(like_buffer.get_log().segments())
+        if remaining:
+            self.stdout.write(f"{remaining} segment از اجرای قبلی باقی مانده و دوباره اعمال می‌شود.")
+
+        try:
+            while True:
+                stats = like_buffer.flush()
+                if stats['intents']:
+                    self.stdout.write(
+                        f"{stats['intents']} خواسته، {stats['pairs']} جفت، {stats['posts']} پست "
+                        f"({stats['segments']} segment)"
+                    )
+                if not options['loop']:
+                    break
+                # اتصال بی‌کار بین flushها نگه داشته نمی‌شود
+                connections.close_all()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from blog import blobs
+
+
+class Command(BaseCommand):
+    help = "حذف محتوای رسانه‌هایی که دیگر هیچ Media به آن‌ها اشاره نمی‌کند"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes',
+            type=float,
+            default=blobs.GC_GRACE.total_seconds() / 60,
+            help="blob هایی که در این مدت ساخته یا دوباره ارجاع داده شده‌اند بررسی نمی‌شوند",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="فقط گزارش، بدون حذف")
+
+    def handle(self, *args, **options):
+        removed, freed = blobs.collect_garbage(
+            grace=timedelta(minutes=options['grace_minutes']),
+            dry_run=options['dry_run'],
+        )
+        verb = "حذف می‌شود" if options['dry_run'] else "حذف شد"
+        self.stdout.write(self.style.SUCCESS(f"{removed} فایل ({freed} بایت) {verb}."))
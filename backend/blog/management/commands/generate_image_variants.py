@@ -0,0 +1,99 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog import caching
+from blog.models import Media, Post
+from config import images
+
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = "ساخت نسخه‌های کوچک‌شده (WebP/JPEG) تصاویر پروفایل و رسانه‌ها، خارج از مسیر درخواست"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="ساخت دوباره برای همه‌ی فایل‌ها، نه فقط فایل‌های جدید")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="تعداد پردازه‌ها")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="اجرای پیوسته به صورت worker")
+        parser.add_argument('--interval', type=float, default=5, help="فاصله‌ی بررسی صف در حالت --loop (ثانیه)")
+
+    def targets(self):
+        return (
+            (get_user_model(), 'profile_pic', 'profile_pic_variants', images.get_widths('profile_pic')),
+            (Media, 'file', 'variants', images.get_widths('media')),
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        executor = None
+        if workers > 1:
+            # فرزندها به دیتابیس دسترسی ندارند؛ اتصال باز نباید به آن‌ها به ارث برسد
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            while True:
+                processed = sum(
+                    self.process(executor, *target, regenerate=options['all'], batch_size=options['batch_size'])
+                    for target in self.targets()
+                )
+                if processed:
+                    self.stdout.write(f"{processed} فایل پردازش شد.")
+                if not options['loop']:
+                    break
+                options['all'] = False
+                if not processed:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def process(self, executor, model, file_field, variants_field, widths, regenerate, batch_size):
+        queryset = model.objects.exclude(**{file_field: ''}).exclude(**{f'{file_field}__isnull': True})
+        if not regenerate:
+            queryset = queryset.filter(**{f'{variants_field}__isnull': True})
+
+        storage = model._meta.get_field(file_field).storage
+        processed = 0
+        last_pk = None
+        # چند Media ی یک blob فایل مشترک دارند؛ هر فایل یک بار ساخته می‌شود
+        done = set()
+        while True:
+            batch = queryset.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            rows = list(batch.values_list('pk', file_field)[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            names = list(dict.fromkeys(name for pk, name in rows if name not in done))
+            mapper = executor.map if executor is not None else map
+            results = mapper(images.generate_variants, names, [widths] * len(names), [storage] * len(names))
+
+            for name, variants in zip(names, results):
+                # همه‌ی ردیف‌های همان فایل؛ ردیفی که در این فاصله فایلش عوض شده در صف می‌ماند
+                targets = model.objects.filter(**{file_field: name})
+                if not regenerate:
+                    targets = targets.filter(**{f'{variants_field}__isnull': True})
+                targets.update(**{variants_field: variants})
+                done.add(name)
+            processed += len(rows)
+
+            if file_field == 'profile_pic':
+                # تصویر نویسنده در کش جزئیات پست‌هایش هم هست
+                caching.invalidate_post_detail(*Post.objects.filter(
+                    author__in=[pk for pk, _ in rows]
+                ).values_list('slug', flat=True))
+
+        if processed and file_field == 'profile_pic':
+            # تصویر نویسنده در فید کش شده است
+            caching.invalidate_feed()
+        return processed
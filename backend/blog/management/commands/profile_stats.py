@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config import profiling
+
+
+class Command(BaseCommand):
+    help = "نمایش صدک‌های زمان کل، تعداد و زمان کوئری‌ها و زمان serializer هر action از نمونه‌های SampledProfilingMiddleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="پوشه‌ی فایل‌های JSONL (پیش‌فرض PROFILING['DIR'])")
+        parser.add_argument('--action', help="فقط actionهایی که با این شروع می‌شوند، مثلا PostsViewSet")
+        parser.add_argument('--sort', choices=profiling.METRICS, default='total_ms', help="مرتب‌سازی بر اساس p95 این معیار")
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or profiling.get_config()['DIR']
+        if not directory:
+            raise CommandError("PROFILING['DIR'] تنظیم نشده است؛ --dir را بدهید.")
+
+        samples = profiling.read_samples(directory)
+        if options['action']:
+            samples = (sample for sample in samples if sample['action'].startswith(options['action']))
+        summary = profiling.summarize(samples)
+
+        actions = sorted(summary, key=lambda action: summary[action][options['sort']][95], reverse=True)
+        for action in actions:
+            stats = summary[action]
+            self.stdout.write(f"{action} ({stats['count']} نمونه)")
+            for metric in profiling.METRICS:
+                values = ', '.join(f"p{p} {stats[metric][p]:g}" for p in profiling.PERCENTILES)
+                self.stdout.write(f"    {metric}: {values}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from config import query_budget
+
+
+class Command(BaseCommand):
+    help = "نمایش تعداد درخواست‌هایی از هر action که از بودجه‌ی کوئری بیشتر کوئری زده‌اند"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='صفر کردن شمارنده‌ها بعد از نمایش')
+
+    def handle(self, *args, **options):
+        violations = query_budget.violations()
+
+        for action in sorted(violations, key=violations.get, reverse=True):
+            self.stdout.write(f"{action}: {violations[action]}")
+        if not violations:
+            self.stdout.write("تخطی از بودجه‌ی کوئری ثبت نشده است.")
+
+        if options['reset']:
+            query_budget.reset_violations()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog import search
+
+
+class Command(BaseCommand):
+    help = "ساخت دوباره‌ی نمایه‌ی جستجوی پست‌ها از ابتدا"
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"{indexed} پست نمایه شد."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.tags import refresh_posts_count
+
+
+class Command(BaseCommand):
+    help = "محاسبه‌ی دوباره‌ی posts_count همه‌ی برچسب‌ها"
+
+    def handle(self, *args, **options):
+        updated = refresh_posts_count()
+        self.stdout.write(self.style.SUCCESS(f"{updated} برچسب به‌روزرسانی شد."))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, F
+from django.db.models.functions import Coalesce
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = "همگام‌سازی ستون likes_count پست‌ها با جدول لایک‌ها"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='فقط پست‌های ناهمگام را گزارش می‌دهد و چیزی ذخیره نمی‌کند',
+        )
+
+    def handle(self, *args, **options):
+        counts = Post.likes.through.objects.filter(
+            post_id=OuterRef('pk')
+        ).order_by().values('post_id').annotate(c=Count('*')).values('c')
+
+        with transaction.atomic():
+            drifted = Post.objects.annotate(
+                real_likes_count=Coalesce(Subquery(counts), 0)
+            ).exclude(likes_count=F('real_likes_count'))
+
+            if options['dry_run']:
+                for post in drifted.only('slug', 'likes_count'):
+                    self.stdout.write(
+                        f"{post.slug}: {post.likes_count} -> {post.real_likes_count}"
+                    )
+                return
+
+            updated = Post.objects.filter(
+                pk__in=drifted.values('pk')
+            ).update(likes_count=Coalesce(Subquery(counts), 0))
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} پست همگام‌سازی شد."))
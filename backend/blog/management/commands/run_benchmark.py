@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import benchmark
+
+
+class Command(BaseCommand):
+    help = "اندازه‌گیری p50/p95/p99 زمان پاسخ، تعداد کوئری‌ها و اوج حافظه‌ی endpointهای اصلی روی داده‌ی seed شده"
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*',
+                            help=f"از بین {', '.join(benchmark.SCENARIOS)}؛ پیش‌فرض همه")
+        parser.add_argument('--requests', type=int, default=200, help="تعداد درخواست‌های اندازه‌گیری شده در هر سناریو")
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--cache', action='store_true', help="استفاده از کش پست‌ها؛ پیش‌فرض بدون کش")
+        parser.add_argument('--user', help="نام کاربری درخواست‌ها؛ پیش‌فرض اولین کاربر benchmark")
+        parser.add_argument('--output', help="ذخیره‌ی نتیجه به صورت JSON")
+        parser.add_argument('--compare', help="مقایسه با نتیجه‌ی JSON قبلی (مثلا از شاخه‌ی دیگر)")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests باید حداقل ۱ باشد.")
+        unknown = set(options['scenarios']) - benchmark.SCENARIOS.keys()
+        if unknown:
+            raise CommandError(f"سناریوی ناشناخته: {', '.join(sorted(unknown))}")
+        try:
+            runner = benchmark.Runner(
+                requests=options['requests'],
+                warmup=options['warmup'],
+                use_cache=options['cache'],
+                username=options['user'],
+            )
+            results = runner.run(options['scenarios'] or list(benchmark.SCENARIOS))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for name, result in results['scenarios'].items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<22} p50 {latency['p50']:8.2f} ms  p95 {latency['p95']:8.2f} ms  "
+                f"p99 {latency['p99']:8.2f} ms  queries {result['queries']['p50']:>3} (max {result['queries']['max']})  "
+                f"peak {result['peak_memory_kib']:8.1f} KiB  errors {result['errors']}"
+            )
+
+        if options['compare']:
+            self.stdout.write('')
+            for name, metric, before, after, change in benchmark.compare(benchmark.load(options['compare']), results):
+                self.stdout.write(f"{name:<22} {metric}: {before:8.2f} -> {after:8.2f} ms ({change:+.1%})")
+
+        if options['output']:
+            benchmark.save(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"نتیجه در {options['output']} ذخیره شد."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import benchmark
+
+
+class Command(BaseCommand):
+    help = "ساخت داده‌ی حجیم ساختگی (کاربر، پست، برچسب، لایک و دیدگاه) برای run_benchmark"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--tags-per-post', type=int, default=3)
+        parser.add_argument('--likes-per-post', type=int, default=20)
+        parser.add_argument('--comments-per-post', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=benchmark.CHUNK_SIZE)
+        parser.add_argument('--seed', type=int, default=0, help="seed تولید اعداد تصادفی، برای داده‌ی تکرارپذیر")
+        parser.add_argument('--flush', action='store_true', help="حذف داده‌ی seed قبلی پیش از ساخت")
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            benchmark.flush()
+        elif benchmark.bench_users().exists():
+            raise CommandError("داده‌ی benchmark از قبل وجود دارد؛ برای ساخت دوباره --flush بدهید.")
+
+        benchmark.seed(
+            users=options['users'],
+            posts=options['posts'],
+            tags=options['tags'],
+            tags_per_post=options['tags_per_post'],
+            likes_per_post=options['likes_per_post'],
+            comments_per_post=options['comments_per_post'],
+            chunk_size=options['chunk_size'],
+            random_seed=options['seed'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS("داده‌ی benchmark ساخته شد."))
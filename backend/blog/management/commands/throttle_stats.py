@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from config import throttling
+
+
+class Command(BaseCommand):
+    help = "نمایش تعداد درخواست‌های پذیرفته و رد شده‌ی هر scope محدودیت نرخ (فقط با RedisBackend بین workerها مشترک است)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='صفر کردن شمارنده‌ها بعد از نمایش')
+
+    def handle(self, *args, **options):
+        backend = throttling.get_backend()
+        if isinstance(backend, throttling.LocalBackend):
+            # شمارنده‌های LocalBackend درون پردازه‌اند و پردازه‌ی این دستور درخواستی نگرفته است
+            self.stderr.write(self.style.WARNING(
+                "THROTTLE_BACKEND برابر LocalBackend است و فقط شمارنده‌های همین پردازه نمایش داده می‌شود؛ "
+                "برای آمار workerها REDIS_URL را تنظیم کنید."
+            ))
+        stats = backend.stats()
+
+        for scope in sorted(stats):
+            allowed, denied = stats[scope]['allowed'], stats[scope]['denied']
+            total = allowed + denied
+            ratio = denied / total if total else 0
+            self.stdout.write(f"{scope}: allowed {allowed}, denied {denied} ({ratio:.2%})")
+
+        if options['reset']:
+            backend.reset_stats()
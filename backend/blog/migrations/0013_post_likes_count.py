@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_likes_count(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    counts = Post.likes.through.objects.filter(
+        post_id=OuterRef('pk')
+    ).order_by().values('post_id').annotate(c=Count('*')).values('c')
+    Post.objects.update(likes_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_alter_comment_options_alter_post_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='تعداد لایک‌ها'),
+        ),
+        migrations.RunPython(populate_likes_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_post_likes_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-updated_at', '-id'], name='blog_post_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-updated_at', '-id'], name='blog_comment_post_updated_idx'),
+        ),
+    ]
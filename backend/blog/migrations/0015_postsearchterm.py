@@ -0,0 +1,97 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:19
+
+import django.db.models.deletion
+import re
+from collections import Counter
+from html import unescape
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+# کپی tokenize و ثابت‌های blog.search در زمان این migration؛ تغییرات بعدی آن
+# نباید نتیجه‌ی اجرای این migration را عوض کند
+TITLE_WEIGHT = 5
+CONTENT_WEIGHT = 1
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+
+CHARACTER_MAP = str.maketrans({
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    '\u200c': ' ',
+    '\u200e': ' ',
+    '\u200f': ' ',
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+TOKEN = re.compile(r'\w+')
+STOP_WORDS = frozenset({
+    'و', 'در', 'به', 'از', 'که', 'را', 'با', 'این', 'آن', 'برای', 'تا',
+    'یا', 'هم', 'اما', 'اگر', 'بر', 'هر', 'نیز', 'است', 'بود', 'شد',
+    'the', 'and', 'or', 'of', 'to', 'in', 'is', 'it', 'on', 'for', 'an',
+})
+
+
+def tokenize(text):
+    text = unescape(strip_tags(text or ''))
+    text = DIACRITICS.sub('', text.translate(CHARACTER_MAP)).lower()
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN.findall(text)
+        if len(token) >= MIN_TERM_LENGTH and token not in STOP_WORDS
+    ]
+
+
+def build_search_index(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    PostSearchTerm = apps.get_model('blog', 'PostSearchTerm')
+
+    terms = []
+    for post in Post.objects.only('title', 'content').iterator():
+        title = Counter(tokenize(post.title))
+        content = Counter(tokenize(post.content))
+        terms.extend(
+            PostSearchTerm(
+                post_id=post.pk,
+                term=term,
+                in_title=term in title,
+                in_content=term in content,
+                weight=title[term] * TITLE_WEIGHT + content[term] * CONTENT_WEIGHT,
+            )
+            for term in title.keys() | content.keys()
+        )
+    PostSearchTerm.objects.bulk_create(terms, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_post_blog_post_updated_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='واژه')),
+                ('in_title', models.BooleanField(default=False, verbose_name='در عنوان')),
+                ('in_content', models.BooleanField(default=False, verbose_name='در محتوا')),
+                ('weight', models.PositiveIntegerField(default=0, verbose_name='وزن')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='blog.post', verbose_name='پست')),
+            ],
+            options={
+                'verbose_name': 'واژه‌ی جستجو',
+                'verbose_name_plural': 'نمایه‌ی جستجو',
+                'indexes': [models.Index(fields=['term', 'post'], name='blog_search_term_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'term'), name='blog_search_term_unique')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_posts_count(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Tag = apps.get_model('blog', 'Tag')
+    published = Post.tags.through.objects.filter(
+        tag_id=OuterRef('pk'),
+        post__status=True
+    ).order_by().values('tag_id').annotate(c=Count('*')).values('c')
+    Tag.objects.update(posts_count=Coalesce(Subquery(published), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_postsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='posts_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='تعداد پست‌های منتشر شده'),
+        ),
+        migrations.RunPython(populate_posts_count, migrations.RunPython.noop),
+    ]
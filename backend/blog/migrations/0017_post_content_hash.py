@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_tag_posts_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='هش محتوای پاک‌سازی شده'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:45
+
+import math
+import re
+from html import unescape
+
+from django.db import migrations, models
+
+# کپی blog.sanitizer.summarize در زمان این migration؛ تغییرات بعدی آن نباید
+# نتیجه‌ی اجرای این migration را عوض کند
+EXCERPT_LENGTH = 300
+TAG_RE = re.compile(r'<[^>]*>')
+WORDS_PER_MINUTE = 200
+
+
+def summarize(html):
+    words = unescape(TAG_RE.sub(' ', html)).split()
+    word_count = len(words)
+
+    excerpt = ''
+    for word in words:
+        candidate = f'{excerpt} {word}' if excerpt else word
+        if len(candidate) > EXCERPT_LENGTH:
+            excerpt = (excerpt or word[:EXCERPT_LENGTH]) + '…'
+            break
+        excerpt = candidate
+
+    reading_time = math.ceil(word_count / WORDS_PER_MINUTE) if word_count else 0
+    return excerpt, word_count, reading_time
+
+
+def populate_summary(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    posts = []
+    for post in Post.objects.only('content').iterator():
+        post.excerpt, post.word_count, post.reading_time = summarize(post.content)
+        posts.append(post)
+    Post.objects.bulk_update(posts, ['excerpt', 'word_count', 'reading_time'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_post_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, verbose_name='خلاصه'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='زمان مطالعه (دقیقه)'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد کلمات'),
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
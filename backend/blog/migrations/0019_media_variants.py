@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_post_excerpt_post_reading_time_post_word_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='variants',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='نسخه‌های تصویر'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:40
+
+import django.db.models.deletion
+import django.utils.timezone
+import django_jalali.db.models
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_media_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='نام فایل')),
+                ('size', models.PositiveBigIntegerField(verbose_name='حجم (بایت)')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('offset', models.PositiveBigIntegerField(default=0, verbose_name='بایت‌های دریافت شده')),
+                ('created_at', django_jalali.db.models.jDateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('updated_at', django_jalali.db.models.jDateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='آخرین تکه')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'آپلود ناتمام',
+                'verbose_name_plural': 'آپلودهای ناتمام',
+            },
+        ),
+    ]
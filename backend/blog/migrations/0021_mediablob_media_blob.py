@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:20
+
+import blog.blobs
+import django.db.models.deletion
+import django.utils.timezone
+import django_jalali.db.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('file', models.FileField(max_length=255, upload_to=blog.blobs.blob_upload_path, verbose_name='فایل')),
+                ('size', models.PositiveBigIntegerField(verbose_name='حجم (بایت)')),
+                ('refcount', models.PositiveIntegerField(db_index=True, default=0, verbose_name='تعداد ارجاع')),
+                ('created_at', django_jalali.db.models.jDateTimeField(default=django.utils.timezone.now, verbose_name='تاریخ ایجاد')),
+            ],
+            options={
+                'verbose_name': 'محتوای رسانه',
+                'verbose_name_plural': 'محتوای رسانه‌ها',
+            },
+        ),
+        migrations.AddField(
+            model_name='media',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='media', to='blog.mediablob', verbose_name='محتوا'),
+        ),
+    ]
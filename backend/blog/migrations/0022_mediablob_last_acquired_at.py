@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:40
+
+import django.utils.timezone
+import django_jalali.db.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0021_mediablob_media_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='last_acquired_at',
+            field=django_jalali.db.models.jDateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='تاریخ آخرین ارجاع'),
+        ),
+    ]
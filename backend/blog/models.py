@@ -1,10 +1,19 @@
-from django.db import models
+from uuid import uuid4
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.text import slugify
 
-import re
 from django_jalali.db import models as jmodels
 
+from . import blobs
+from . import caching
+from . import sanitizer
+from . import search
+from .tags import adjust_posts_count, normalize_tag_name, refresh_posts_count
+from config import images
+
 CUSTOM_USER = get_user_model()
 
 
@@ -26,6 +35,27 @@ class Post(models.Model):
         null=False,
         verbose_name="محتوا"
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name="هش محتوای پاک‌سازی شده"
+    )
+    excerpt = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="خلاصه"
+    )
+    word_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="تعداد کلمات"
+    )
+    reading_time = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="زمان مطالعه (دقیقه)"
+    )
     author = models.ForeignKey(
         CUSTOM_USER,
         on_delete=models.CASCADE,
@@ -44,6 +74,12 @@ class Post(models.Model):
         blank=True,
         verbose_name="لایک‌ها"
     )
+    likes_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name="تعداد لایک‌ها"
+    )
     status = models.BooleanField(
         default=True,
         verbose_name="وضعیت انتشار"
@@ -58,11 +94,51 @@ class Post(models.Model):
     )
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        previous_slug = self.slug
         self.slug = slugify(self.title, allow_unicode=True)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.excerpt, self.word_count, self.reading_time = sanitizer.summarize(self.content)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt', 'word_count', 'reading_time'}
+
         super().save(*args, **kwargs)
 
+        if update_fields is None or {'title', 'content'} & set(update_fields):
+            search.index_post(self)
+        # posts_count فقط پست‌های منتشر شده را می‌شمارد؛ پست جدید هنوز برچسبی ندارد (m2m_changed)
+        if update_fields is None or 'status' in update_fields:
+            if not adding and self._saved_status != self.status:
+                if self._saved_status is None:
+                    refresh_posts_count(self.tags.values('pk'))
+                else:
+                    adjust_posts_count(self.tags.all(), 1 if self.status else -1)
+            self._saved_status = self.status
+
+        caching.invalidate_post_detail(previous_slug, self.slug)
+        caching.invalidate_feed()
+
+    # وضعیت انتشار آخرین بار خوانده یا ذخیره شده؛ None یعنی ناشناخته (پست جدید یا status به تعویق افتاده)
+    _saved_status = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_status = instance.__dict__.get('status')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'status' in fields:
+            self._saved_status = self.__dict__.get('status')
+
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['-updated_at', '-id'], name='blog_post_updated_id_idx'),
+        ]
         verbose_name = "پست"
         verbose_name_plural = "پست‌ها"
 
@@ -85,6 +161,23 @@ class Media(models.Model):
         related_name="media",
         verbose_name="کاربر"
     )
+    # فایل‌های یکسان یک blob مشترک دارند و file به فایل همان blob اشاره می‌کند
+    blob = models.ForeignKey(
+        'MediaBlob',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="media",
+        verbose_name="محتوا"
+    )
+    # None یعنی نسخه‌های کوچک‌شده هنوز ساخته نشده‌اند (generate_image_variants)
+    variants = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="نسخه‌های تصویر"
+    )
 
     class Meta:
         verbose_name = "رسانه"
@@ -93,6 +186,133 @@ class Media(models.Model):
     def __str__(self):
         return str(self.file)
 
+    def save(self, *args, **kwargs):
+        previous_blob_id = self.blob_id
+        update_fields = kwargs.get('update_fields')
+
+        with transaction.atomic():
+            # فایل تازه آپلود شده؛ اگر تکراری باشد دوباره نوشته نمی‌شود
+            if self.file and not self.file._committed:
+                self.blob, created = blobs.store(self.file.file)
+                self.file.name = self.blob.file.name
+                self.file._committed = True
+                if not created:
+                    self.variants = Media.objects.filter(
+                        blob=self.blob,
+                        variants__isnull=False
+                    ).values_list('variants', flat=True).first()
+                if update_fields is not None and 'file' in update_fields:
+                    update_fields = kwargs['update_fields'] = {*update_fields, 'blob', 'variants'}
+
+            if images.is_stale(self.file, self.variants):
+                self.variants = None
+                if update_fields is not None and 'file' in update_fields:
+                    kwargs['update_fields'] = {*update_fields, 'variants'}
+            super().save(*args, **kwargs)
+
+            if previous_blob_id and previous_blob_id != self.blob_id:
+                blobs.release(previous_blob_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if self.blob_id:
+                blobs.release(self.blob_id)
+        return result
+
+
+class MediaBlob(models.Model):
+    """
+        فایل ذخیره شده بر اساس sha256 محتوا. refcount تعداد ردیف‌های Media است که
+        به آن اشاره می‌کنند؛ blob های بدون ارجاع با gc_media_blobs حذف می‌شوند.
+    """
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="SHA-256"
+    )
+    file = models.FileField(
+        upload_to=blobs.blob_upload_path,
+        max_length=255,
+        verbose_name="فایل"
+    )
+    size = models.PositiveBigIntegerField(
+        verbose_name="حجم (بایت)"
+    )
+    refcount = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name="تعداد ارجاع"
+    )
+    created_at = jmodels.jDateTimeField(
+        default=timezone.now,
+        verbose_name="تاریخ ایجاد"
+    )
+    # Media ی ارجاع دهنده ممکن است هنوز commit نشده باشد؛ gc تا grace پس از آن صبر می‌کند
+    last_acquired_at = jmodels.jDateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name="تاریخ آخرین ارجاع"
+    )
+
+    class Meta:
+        verbose_name = "محتوای رسانه"
+        verbose_name_plural = "محتوای رسانه‌ها"
+
+    def __str__(self):
+        return self.sha256
+
+
+class UploadSession(models.Model):
+    """
+        آپلود تکه‌تکه‌ی رسانه؛ تکه‌ها در blog.uploads به فایل موقت اضافه می‌شوند
+        و با complete به یک Media تبدیل می‌شوند.
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False
+    )
+    author = models.ForeignKey(
+        CUSTOM_USER,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+        verbose_name="کاربر"
+    )
+    filename = models.CharField(
+        max_length=255,
+        verbose_name="نام فایل"
+    )
+    size = models.PositiveBigIntegerField(
+        verbose_name="حجم (بایت)"
+    )
+    checksum = models.CharField(
+        max_length=64,
+        verbose_name="SHA-256"
+    )
+    offset = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="بایت‌های دریافت شده"
+    )
+    created_at = jmodels.jDateTimeField(
+        auto_now_add=True,
+        verbose_name="تاریخ ایجاد"
+    )
+    # با هر تکه در uploads.append به‌روز می‌شود؛ auto_now زمان محلی ذخیره می‌کند
+    # و مقایسه‌اش با timezone.now در cleanup درست نیست
+    updated_at = jmodels.jDateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name="آخرین تکه"
+    )
+
+    class Meta:
+        verbose_name = "آپلود ناتمام"
+        verbose_name_plural = "آپلودهای ناتمام"
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
 
 class Tag(models.Model):
     name = models.CharField(
@@ -100,11 +320,15 @@ class Tag(models.Model):
         unique=True,
         verbose_name="نام برچسب"
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name="تعداد پست‌های منتشر شده"
+    )
 
     def clean_name(self):
-        self.name = self.name.lower()
-        punctuation = r"""!"#$%&'()*+,-./:;<=>?@[\]^`{|}~"""
-        self.name = re.sub(f"[{re.escape(punctuation)}]", "", self.name)
+        self.name = normalize_tag_name(self.name)
 
     class Meta:
         verbose_name = "برچسب"
@@ -143,10 +367,55 @@ class Comment(models.Model):
         verbose_name="وضعیت نمایش"
     )
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        caching.invalidate_post_detail(self.post.slug)
+
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['post', '-updated_at', '-id'], name='blog_comment_post_updated_idx'),
+        ]
         verbose_name = "دیدگاه"
         verbose_name_plural = "دیدگاه‌ها"
 
     def __str__(self):
         return f"دیدگاه {self.author} برای {self.post}"
+
+
+class PostSearchTerm(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="search_terms",
+        verbose_name="پست"
+    )
+    term = models.CharField(
+        max_length=search.MAX_TERM_LENGTH,
+        verbose_name="واژه"
+    )
+    in_title = models.BooleanField(
+        default=False,
+        verbose_name="در عنوان"
+    )
+    in_content = models.BooleanField(
+        default=False,
+        verbose_name="در محتوا"
+    )
+    weight = models.PositiveIntegerField(
+        default=0,
+        verbose_name="وزن"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'term'], name='blog_search_term_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'post'], name='blog_search_term_idx'),
+        ]
+        verbose_name = "واژه‌ی جستجو"
+        verbose_name_plural = "نمایه‌ی جستجو"
+
+    def __str__(self):
+        return f"{self.term} ({self.post_id})"
@@ -0,0 +1,217 @@
+import binascii
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import InvalidPage
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+        صفحه‌بندی بر اساس کلید (field, id) بدون COUNT و OFFSET.
+        ترتیب از order_by کوئری‌ست (یا Meta.ordering مدل) خوانده می‌شود،
+        بنابراین ordering فیلترست‌ها هم پشتیبانی می‌شود.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'cursor نامعتبر است.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        # chunk_size برای prefetch_related لازم است؛ کل صفحه در یک تکه خوانده می‌شود
+        return self.set_page([obj async for obj in queryset.aiterator(chunk_size=self.page_size + 1)])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.field, self.descending = self.get_key(queryset)
+
+        self.position = self.decode_cursor(request)
+        self.reverse = bool(self.position and self.position['r'])
+
+        descending = self.descending != self.reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+
+        if self.position:
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': self.position['v']}) |
+                Q(**{self.field: self.position['v'], f'pk__{lookup}': self.position['pk']})
+            )
+
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = self.position is not None, has_more
+
+        self.page = results
+        return results
+
+    def get_key(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        term = ordering[0] if ordering else '-pk'
+        if not isinstance(term, str):
+            raise NotFound(self.invalid_cursor_message)
+
+        field = term.lstrip('-')
+        if field in queryset.query.annotations:
+            self.model_field = queryset.query.annotations[field].output_field
+        elif field != 'pk':
+            try:
+                model_field = queryset.model._meta.get_field(field)
+            except FieldDoesNotExist:
+                raise NotFound(self.invalid_cursor_message)
+            if model_field.is_relation:
+                raise NotFound(self.invalid_cursor_message)
+            self.model_field = model_field
+        else:
+            self.model_field = queryset.model._meta.pk
+
+        return field, term.startswith('-')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            value = position['v']
+            if isinstance(self.model_field, models.DateTimeField):
+                value = parse_datetime(value)
+                if value is None:
+                    raise ValueError
+            return {'v': value, 'pk': position['pk'], 'r': bool(position.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.field)
+        if hasattr(value, 'togregorian'):
+            value = value.togregorian()
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+
+        position = {'v': value, 'pk': obj.pk, 'r': reverse}
+        encoded = urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode())
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return replace_query_param(self.base_url, self.cursor_query_param, '')
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'مقدار خالی صفحه اول را برمی‌گرداند؛ صفحات بعد از لینک next خوانده می‌شوند.',
+            'schema': {'type': 'string'},
+        }]
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+        PageNumberPagination با apaginate_queryset برای ویوهای غیرهمگام؛ تعداد با
+        acount و ردیف‌های صفحه با aiterator خوانده می‌شوند و Paginator فقط شماره‌ی
+        صفحه و مرزهای آن را حساب می‌کند.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # count یک cached_property است؛ با مقدار از پیش خوانده شده Paginator کوئری همگام نمی‌زند
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        self.page.object_list = [obj async for obj in self.page.object_list.aiterator(chunk_size=page_size)]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+
+class FeedPagination(AsyncPageNumberPagination):
+    """
+        همان PageNumberPagination؛ اگر پارامتر cursor (حتی خالی) ارسال شود
+        صفحه‌بندی به حالت KeysetPagination می‌رود.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            *self.keyset_class().get_schema_operation_parameters(view),
+        ]
@@ -0,0 +1,83 @@
+import hashlib
+import math
+import re
+from html import unescape
+from threading import local
+
+from bleach.sanitizer import Cleaner
+
+ALLOWED_TAGS = [
+    'p', 'br',
+    'b', 'strong', 'i', 'em', 'u',
+    'h1', 'h2', 'h3', 'h4',
+    'ul', 'ol', 'li',
+    'blockquote',
+    'code', 'pre',
+    'a',
+    'img',
+]
+
+ALLOWED_ATTRIBUTES = {
+    'a': ['href', 'title', 'rel'],
+    'img': ['src', 'alt', 'title'],
+    '*': ['class'],  # اختیاری (برای editor)
+}
+
+ALLOWED_PROTOCOLS = ['http', 'https', 'mailto']
+
+EXCERPT_LENGTH = 300
+TAG_RE = re.compile(r'<[^>]*>')
+WORDS_PER_MINUTE = 200
+
+# Cleaner امن برای استفاده‌ی همزمان در چند thread نیست؛ هر thread نمونه‌ی خودش را دارد
+_local = local()
+
+
+def get_cleaner():
+    cleaner = getattr(_local, 'cleaner', None)
+    if cleaner is None:
+        cleaner = _local.cleaner = Cleaner(
+            tags=ALLOWED_TAGS,
+            attributes=ALLOWED_ATTRIBUTES,
+            protocols=ALLOWED_PROTOCOLS,
+            strip=True
+        )
+    return cleaner
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def sanitize(content, sanitized_hash=None):
+    """
+        اگر content همان خروجی پاک‌سازی قبلی باشد (هش برابر با sanitized_hash)،
+        دوباره پاک‌سازی نمی‌شود. خروجی (cleaned, hash) است.
+    """
+    digest = content_hash(content)
+    if sanitized_hash and digest == sanitized_hash:
+        return content, digest
+
+    cleaned = get_cleaner().clean(content)
+    return cleaned, digest if cleaned == content else content_hash(cleaned)
+
+
+def summarize(html):
+    """
+        (excerpt, word_count, reading_time) متن ساده‌ی HTML؛ reading_time به دقیقه است.
+    """
+    # تگ‌ها با فاصله جایگزین می‌شوند تا کلمات دو بلوک کنار هم به هم نچسبند
+    words = unescape(TAG_RE.sub(' ', html)).split()
+    word_count = len(words)
+
+    excerpt = ''
+    for word in words:
+        candidate = f'{excerpt} {word}' if excerpt else word
+        if len(candidate) > EXCERPT_LENGTH:
+            # کلمه‌ی اول بلندتر از EXCERPT_LENGTH (مثلا یک URL) بریده می‌شود
+            excerpt = (excerpt or word[:EXCERPT_LENGTH]) + '…'
+            break
+        excerpt = candidate
+
+    reading_time = math.ceil(word_count / WORDS_PER_MINUTE) if word_count else 0
+    return excerpt, word_count, reading_time
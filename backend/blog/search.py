@@ -0,0 +1,133 @@
+import re
+from collections import Counter
+from html import unescape
+
+from django.db import transaction
+from django.db.models import Count, Sum, OuterRef, Subquery, IntegerField
+from django.utils.html import strip_tags
+
+from . import models
+
+TITLE_WEIGHT = 5
+CONTENT_WEIGHT = 1
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+BATCH_SIZE = 500
+
+# حروف عربی و ارقام غیر لاتین به معادل فارسی/لاتین تبدیل می‌شوند
+CHARACTER_MAP = str.maketrans({
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    '\u200c': ' ',  # نیم‌فاصله
+    '\u200e': ' ',
+    '\u200f': ' ',
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+
+# اعراب، تنوین و کشیده
+DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+TOKEN = re.compile(r'\w+')
+
+STOP_WORDS = frozenset({
+    'و', 'در', 'به', 'از', 'که', 'را', 'با', 'این', 'آن', 'برای', 'تا',
+    'یا', 'هم', 'اما', 'اگر', 'بر', 'هر', 'نیز', 'است', 'بود', 'شد',
+    'the', 'and', 'or', 'of', 'to', 'in', 'is', 'it', 'on', 'for', 'an',
+})
+
+
+def normalize(text):
+    text = unescape(strip_tags(text or ''))
+    text = DIACRITICS.sub('', text.translate(CHARACTER_MAP))
+    return text.lower()
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN.findall(normalize(text))
+        if len(token) >= MIN_TERM_LENGTH and token not in STOP_WORDS
+    ]
+
+
+def build_terms(post):
+    title = Counter(tokenize(post.title))
+    content = Counter(tokenize(post.content))
+
+    return [
+        models.PostSearchTerm(
+            post_id=post.pk,
+            term=term,
+            in_title=term in title,
+            in_content=term in content,
+            weight=title[term] * TITLE_WEIGHT + content[term] * CONTENT_WEIGHT,
+        )
+        for term in title.keys() | content.keys()
+    ]
+
+
+def index_post(post):
+    with transaction.atomic():
+        models.PostSearchTerm.objects.filter(post_id=post.pk).delete()
+        models.PostSearchTerm.objects.bulk_create(build_terms(post), batch_size=BATCH_SIZE)
+
+
+def rebuild_index(queryset=None):
+    if queryset is None:
+        queryset = models.Post.objects.all()
+
+    indexed = 0
+    with transaction.atomic():
+        models.PostSearchTerm.objects.all().delete()
+
+        batch = []
+        for post in queryset.only('title', 'content').iterator(chunk_size=BATCH_SIZE):
+            batch.extend(build_terms(post))
+            indexed += 1
+            if len(batch) >= BATCH_SIZE:
+                models.PostSearchTerm.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+                batch = []
+
+        models.PostSearchTerm.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+
+    return indexed
+
+
+def search_posts(queryset, query, field=None, rank=True):
+    """
+        پست‌هایی که همه‌ی واژه‌های query را دارند؛
+        با rank=True بر اساس وزن واژه‌ها (عنوان سنگین‌تر از محتوا) مرتب می‌شوند.
+        query ی بدون واژه‌ی قابل جستجو (فقط حروف اضافه یا تک‌حرفی) فیلتری ندارد.
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return queryset
+
+    matches = models.PostSearchTerm.objects.filter(term__in=terms)
+    if field == 'title':
+        matches = matches.filter(in_title=True)
+    elif field == 'content':
+        matches = matches.filter(in_content=True)
+
+    matches = matches.order_by().values('post_id').annotate(
+        matched=Count('term'),
+        rank=Sum('weight'),
+    ).filter(matched=len(terms))
+
+    queryset = queryset.filter(pk__in=matches.values('post_id'))
+
+    if rank:
+        queryset = queryset.annotate(
+            search_rank=Subquery(
+                matches.filter(post_id=OuterRef('pk')).values('rank'),
+                output_field=IntegerField()
+            )
+        ).order_by('-search_rank', '-updated_at')
+
+    return queryset
@@ -1,11 +1,19 @@
+import os
+import string
+
 from rest_framework import serializers
 
 from . import models
+from . import sanitizer
+from . import uploads
+from .tags import resolve_tag_ids
 from accounts.serializers import UserInformationForPostSerializer
+from config.images import variant_urls
+from django.core.exceptions import SuspiciousFileOperation
 from django.urls import reverse
 from django.utils.http import urlencode
+from django.utils.text import get_valid_filename
 
-import bleach
 
 class TagsSerializer(serializers.ModelSerializer):
     posts_count = serializers.SerializerMethodField()
@@ -15,11 +23,12 @@ class TagsSerializer(serializers.ModelSerializer):
         return obj.posts_count
 
     def get_posts_url(self, obj):
-        request = self.context.get('request')
-        path = reverse('posts-list')
+        # context بین ردیف‌های many=True مشترک است؛ reverse یک بار برای کل صفحه
+        if 'posts_list_url' not in self.context:
+            request = self.context.get('request')
+            self.context['posts_list_url'] = request.build_absolute_uri(reverse('posts-list'))
         query = urlencode({'tags': obj.name})
-        url = request.build_absolute_uri(path)
-        return url + '?' + query
+        return self.context['posts_list_url'] + '?' + query
 
 
 
@@ -44,11 +53,11 @@ class PostListSerializer(serializers.ModelSerializer):
         return obj.likes_count
 
     def get_you_liked(self, obj):
-        return getattr(obj, 'you_liked', False)
+        return getattr(obj, 'liked_by_me', False)
 
     class Meta:
         model = models.Post
-        exclude = ('id', 'content', 'tags')
+        exclude = ('id', 'content', 'content_hash', 'tags', 'likes_count')
 
 class PostRetrieveSerializer(serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(lookup_field='slug', view_name='posts-detail')
@@ -65,11 +74,11 @@ class PostRetrieveSerializer(serializers.ModelSerializer):
         return obj.likes_count
 
     def get_you_liked(self, obj):
-        return getattr(obj, 'you_liked', False)
+        return getattr(obj, 'liked_by_me', False)
 
     class Meta:
         model = models.Post
-        exclude = ('id', 'tags')
+        exclude = ('id', 'content_hash', 'tags', 'likes_count')
 
 class PostMeSerializer(serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(lookup_field='slug', view_name='posts-detail')
@@ -85,93 +94,47 @@ class PostMeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.Post
-        exclude = ('id', 'content', 'tags', 'author')
+        exclude = ('id', 'content', 'content_hash', 'tags', 'author', 'likes_count')
 
 
 class PostCreateUpdateSerializer(serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(lookup_field='slug', view_name='posts-detail')
     tags_list = serializers.ListField(child=serializers.CharField(), required=False)
 
-    ALLOWED_TAGS = [
-        'p', 'br',
-        'b', 'strong', 'i', 'em', 'u',
-        'h1', 'h2', 'h3', 'h4',
-        'ul', 'ol', 'li',
-        'blockquote',
-        'code', 'pre',
-        'a',
-        'img',
-    ]
-
-    ALLOWED_ATTRIBUTES = {
-        'a': ['href', 'title', 'rel'],
-        'img': ['src', 'alt', 'title'],
-        '*': ['class'],  # اختیاری (برای editor)
-    }
-
-    ALLOWED_PROTOCOLS = ['http', 'https', 'mailto']
+    ALLOWED_TAGS = sanitizer.ALLOWED_TAGS
+    ALLOWED_ATTRIBUTES = sanitizer.ALLOWED_ATTRIBUTES
+    ALLOWED_PROTOCOLS = sanitizer.ALLOWED_PROTOCOLS
 
     class Meta:
         model = models.Post
-        exclude = ('id', 'likes', 'author', 'tags')
+        exclude = ('id', 'likes', 'likes_count', 'content_hash', 'author', 'tags')
         extra_kwargs = {'slug': {'read_only': True}}
 
     def validate_content(self, content):
-        cleaned = bleach.clean(
-            content,
-            tags=self.ALLOWED_TAGS,
-            attributes=self.ALLOWED_ATTRIBUTES,
-            protocols=self.ALLOWED_PROTOCOLS,
-            strip=True
-        )
+        sanitized_hash = self.instance.content_hash if self.instance else None
+        cleaned, self.content_hash = sanitizer.sanitize(content, sanitized_hash)
 
         return cleaned
 
-    def update(self, instance, validated_data):
-        tags = validated_data.pop('tags', [])
-        tags = set(tags)
-
-
-        if not tags:
-            instance.tags.clear()
-            return instance
+    def validate(self, data):
+        if 'content' in data:
+            data['content_hash'] = self.content_hash
+        return data
 
-        exists_tags = models.Tag.objects.filter(name__in=tags)
-        exists_names = {t.name for t in exists_tags}
-
-        new_names = tags - exists_names
-        new_tag_objs = []
-        if new_names:
-            for name in new_names:
-                obj = models.Tag(name=name)
-                obj.clean_name()
-                new_tag_objs.append(obj)
-            new_tag_objs = models.Tag.objects.bulk_create(new_tag_objs)
-
-
-        instance.tags.set([*exists_tags, *new_tag_objs])
+    def update(self, instance, validated_data):
+        tags = validated_data.pop('tags_list', None)
+        instance = super().update(instance, validated_data)
 
+        if tags is not None:
+            instance.tags.set(resolve_tag_ids(tags))
 
         return instance
 
     def create(self, validated_data):
         tags = validated_data.pop('tags_list', [])
-        tags = set(tags)
-
-        exists_tags = models.Tag.objects.filter(name__in=tags)
-        exists_names = {t.name for t in exists_tags}
-
-        new_names = tags - exists_names
-        new_tag_objs = []
-        if new_names:
-            for name in new_names:
-                obj = models.Tag(name=name)
-                obj.clean_name()
-                new_tag_objs.append(obj)
-            new_tag_objs = models.Tag.objects.bulk_create(new_tag_objs)
 
         instance = models.Post.objects.create(**validated_data)
-        instance.tags.set([*exists_tags, *new_tag_objs])
+        instance.tags.set(resolve_tag_ids(tags))
 
         return instance
 
@@ -179,14 +142,53 @@ class PostCreateUpdateSerializer(serializers.ModelSerializer):
 
 class MediaSerializer(serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(lookup_field='pk', view_name='post_media-detail')
+    variants = serializers.SerializerMethodField()
+
+    def get_variants(self, obj):
+        return variant_urls(self.context.get('request'), obj.variants)
+
     class Meta:
         model = models.Media
-        exclude = ('author',)
+        exclude = ('author', 'blob')
         extra_kwargs = {
                 'author': {'read_only': True},
             }
 
 
+class UploadSessionSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.UploadSession
+        fields = ('id', 'url', 'filename', 'size', 'checksum', 'offset', 'created_at')
+        read_only_fields = ('id', 'offset', 'created_at')
+
+    def get_url(self, obj):
+        request = self.context.get('request')
+        path = reverse('post_media-upload', kwargs={'upload_id': obj.pk})
+        return request.build_absolute_uri(path)
+
+    def validate_filename(self, filename):
+        try:
+            return get_valid_filename(os.path.basename(filename))
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError('نام فایل معتبر نیست.')
+
+    def validate_size(self, size):
+        if not 0 < size <= uploads.max_size():
+            raise serializers.ValidationError(f'حجم فایل باید بین ۱ و {uploads.max_size()} بایت باشد.')
+        return size
+
+    def validate_checksum(self, checksum):
+        checksum = checksum.lower()
+        if len(checksum) != 64 or not set(checksum) <= set(string.hexdigits.lower()):
+            raise serializers.ValidationError('checksum باید SHA-256 به صورت hex باشد.')
+        return checksum
+
+    def create(self, validated_data):
+        return uploads.start(**validated_data)
+
+
 class CommentSerializer(serializers.ModelSerializer):
     author = UserInformationForPostSerializer(read_only=True)
     url = serializers.SerializerMethodField()
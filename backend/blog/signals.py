@@ -0,0 +1,92 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import caching
+from . import models
+from .tags import adjust_posts_count
+
+
+@receiver(pre_delete, sender=models.Post)
+def post_deleting(sender, instance, **kwargs):
+    # ردیف‌های جدول واسط برچسب‌ها پیش از post_delete پاک می‌شوند؛ پست منتشر نشده شمرده نمی‌شود
+    if instance.status:
+        adjust_posts_count(models.Tag.objects.filter(posts=instance), -1)
+
+
+@receiver(post_delete, sender=models.Post)
+def post_deleted(sender, instance, **kwargs):
+    # برای delete ی QuerySet، admin و cascade هم فرستاده می‌شود
+    caching.invalidate_post_detail(instance.slug)
+    caching.invalidate_feed()
+
+
+@receiver(post_delete, sender=models.Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    # حذف خود پست (cascade) کش جزئیاتش را باطل می‌کند؛ خواندن پست به ازای هر دیدگاه لازم نیست
+    if isinstance(origin, models.Post) or (isinstance(origin, QuerySet) and origin.model is models.Post):
+        return
+    caching.invalidate_post_detail(instance.post.slug)
+
+
+@receiver(m2m_changed, sender=models.Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    caching.invalidate_feed()
+
+    if not reverse:
+        caching.invalidate_post_detail(instance.slug)
+        return
+
+    if action == 'pre_clear':
+        posts = instance.posts.all()
+    else:
+        posts = models.Post.objects.filter(pk__in=pk_set)
+    caching.invalidate_post_detail(*posts.values_list('slug', flat=True))
+
+
+@receiver(m2m_changed, sender=models.Post.tags.through)
+def post_tags_count_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+        posts_count با F ± n به‌روز می‌شود. pk_set ی post_add فقط ردیف‌های تازه است، ولی
+        remove شناسه‌های بی‌ارتباط را هم می‌فرستد؛ کاهش در pre_remove و pre_clear و فقط
+        برای ردیف‌هایی که هنوز در جدول واسط هستند انجام می‌شود.
+    """
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    delta = 1 if action == 'post_add' else -1
+
+    if reverse:
+        if action == 'post_add':
+            posts = models.Post.objects.filter(pk__in=pk_set)
+        else:
+            posts = instance.posts.all()
+            if action == 'pre_remove':
+                posts = posts.filter(pk__in=pk_set)
+        published = posts.filter(status=True).count()
+        adjust_posts_count(models.Tag.objects.filter(pk=instance.pk), delta * published)
+        return
+
+    if not instance.status:
+        return
+    if action == 'post_add':
+        tags = models.Tag.objects.filter(pk__in=pk_set)
+    else:
+        tags = models.Tag.objects.filter(posts=instance)
+        if action == 'pre_remove':
+            tags = tags.filter(pk__in=pk_set)
+    adjust_posts_count(tags, delta)
+
+
+@receiver(post_save, sender=models.Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        caching.invalidate_post_detail(*instance.posts.values_list('slug', flat=True))
+        caching.invalidate_feed()
+
+
+@receiver(post_delete, sender=models.Tag)
+def tag_deleted(sender, instance, **kwargs):
+    caching.invalidate_feed()
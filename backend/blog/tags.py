@@ -0,0 +1,56 @@
+import re
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import models
+
+PUNCTUATION = r"""!"#$%&'()*+,-./:;<=>?@[\]^`{|}~"""
+PUNCTUATION_RE = re.compile(f"[{re.escape(PUNCTUATION)}]")
+
+
+def normalize_tag_name(name):
+    return PUNCTUATION_RE.sub("", name.lower()).strip()
+
+
+def resolve_tag_ids(names):
+    """
+        نام‌ها را نرمال می‌کند و id برچسب‌ها را برمی‌گرداند؛ برچسب‌های جدید ساخته می‌شوند.
+        حداکثر سه کوئری، مستقل از تعداد برچسب‌ها.
+    """
+    names = {normalize_tag_name(name) for name in names} - {''}
+    ids = dict(models.Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+    new_names = names - ids.keys()
+    if new_names:
+        models.Tag.objects.bulk_create([models.Tag(name=name) for name in new_names], ignore_conflicts=True)
+        ids.update(models.Tag.objects.filter(name__in=new_names).values_list('name', 'id'))
+
+    return list(ids.values())
+
+
+def adjust_posts_count(tags, delta):
+    """
+        posts_count برچسب‌های QuerySet ی tags را delta واحد تغییر می‌دهد؛ سیگنال‌ها به جای
+        شمارش دوباره فقط همین را صدا می‌زنند. رانش احتمالی را rebuild_tag_counts درست می‌کند.
+    """
+    if not delta:
+        return 0
+    return tags.update(posts_count=Greatest(F('posts_count') + delta, 0))
+
+
+def refresh_posts_count(tag_ids=None):
+    """
+        posts_count برچسب‌های داده شده (یا همه‌ی برچسب‌ها) را از روی پست‌های منتشر شده دوباره حساب می‌کند.
+        برای rebuild_tag_counts و جاهایی که وضعیت انتشار پست معلوم نیست.
+    """
+    published = models.Post.tags.through.objects.filter(
+        tag_id=OuterRef('pk'),
+        post__status=True
+    ).order_by().values('tag_id').annotate(c=Count('*')).values('c')
+
+    queryset = models.Tag.objects.all()
+    if tag_ids is not None:
+        queryset = queryset.filter(pk__in=tag_ids)
+
+    return queryset.update(posts_count=Coalesce(Subquery(published), 0))
@@ -1,3 +1,1539 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import warnings
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from bleach.sanitizer import Cleaner
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from config import images
+from config import profiling
+from config import throttling
+from config.query_budget import QueryBudgetTestMixin, check_query_budgets, count_queries, get_budget
+from . import blobs
+from . import caching
+from . import delivery
+from . import events
+from . import like_buffer
+from . import likes
+from . import models
+from . import sanitizer
+from . import search
+from . import uploads
+from . import serializer
+from .tags import resolve_tag_ids
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class LikesCountTests(TestCase):
+    """ ستون likes_count: پر کردن اولیه در migration و همگام‌سازی با reconcile_likes_count """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.readers = [
+            CustomUser.objects.create_user(username=f'reader{i}', email=f'reader{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        cls.posts = [
+            models.Post.objects.create(title=f'post {i}', content='<p>text</p>', author=cls.author)
+            for i in range(2)
+        ]
+        # likes.add مثل ویرایش در admin ستون را به‌روز نمی‌کند
+        cls.posts[0].likes.add(*cls.readers)
+        cls.posts[1].likes.add(cls.readers[0])
+
+    def likes_counts(self):
+        return [post.likes_count for post in models.Post.objects.order_by('pk')]
+
+    def test_migration_backfill(self):
+        migration = importlib.import_module('blog.migrations.0013_post_likes_count')
+        migration.populate_likes_count(apps, None)
+        self.assertEqual(self.likes_counts(), [3, 1])
+
+    def test_reconcile(self):
+        output = io.StringIO()
+        call_command('reconcile_likes_count', dry_run=True, stdout=output)
+        self.assertIn(f'{self.posts[0].slug}: 0 -> 3', output.getvalue())
+        self.assertEqual(self.likes_counts(), [0, 0])
+
+        output = io.StringIO()
+        call_command('reconcile_likes_count', stdout=output)
+        self.assertIn('2 پست', output.getvalue())
+        self.assertEqual(self.likes_counts(), [3, 1])
+
+        call_command('reconcile_likes_count', stdout=io.StringIO())
+        self.assertEqual(self.likes_counts(), [3, 1])
+
+    def test_ordering(self):
+        call_command('reconcile_likes_count', stdout=io.StringIO())
+        self.client.force_login(self.readers[0])
+        for ordering, expected in (('likes', ['post 1', 'post 0']), ('-likes', ['post 0', 'post 1'])):
+            response = self.client.get('/api/posts/', {'ordering': ordering})
+            self.assertEqual([post['title'] for post in response.json()['results']], expected)
+
+
+class KeysetPaginationTests(TestCase):
+    """ حالت cursor ی FeedPagination: رفت و برگشت کامل صفحه‌ها با مقدارهای مساوی در کلید مرتب‌سازی """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.reader = CustomUser.objects.create_user(username='reader', email='reader@example.com', password='x')
+        for i in range(25):
+            post = models.Post.objects.create(title=f'post {i}', content='<p>text</p>', author=cls.author)
+            # فقط سه مقدار؛ ترتیب ردیف‌های مساوی با pk مشخص می‌شود
+            models.Post.objects.filter(pk=post.pk).update(likes_count=i % 3)
+        cls.post = post
+        for i in range(15):
+            models.Comment.objects.create(post=cls.post, author=cls.reader, content=f'comment {i}')
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.client.force_login(self.reader)
+
+    def walk(self, url, params, field='results', key='title'):
+        """ صفحه‌ها از cursor خالی با next تا انتها و سپس با previous تا ابتدا """
+        response = self.client.get(url, {**params, 'cursor': ''}).json()
+        self.assertIsNone(response['previous'])
+        forward = [response]
+        while forward[-1]['next']:
+            forward.append(self.client.get(forward[-1]['next']).json())
+
+        backward = [forward[-1]]
+        while backward[-1]['previous']:
+            backward.append(self.client.get(backward[-1]['previous']).json())
+
+        pages = lambda responses: [[item[key] for item in response[field]] for response in responses]
+        self.assertEqual(pages(backward), pages(forward)[::-1])
+        return [item for page in pages(forward) for item in page]
+
+    def test_posts(self):
+        for ordering, terms in (
+            ({}, ('-updated_at', '-pk')),
+            ({'ordering': '-likes'}, ('-likes_count', '-pk')),
+            ({'ordering': 'likes'}, ('likes_count', 'pk')),
+        ):
+            with self.subTest(ordering=ordering):
+                expected = list(models.Post.objects.order_by(*terms).values_list('title', flat=True))
+                self.assertEqual(self.walk('/api/posts/', ordering), expected)
+
+    def test_comments(self):
+        url = f'/api/posts/{self.post.slug}/comment/'
+        expected = list(self.post.comments.order_by('-updated_at', '-pk').values_list('content', flat=True))
+        self.assertEqual(self.walk(url, {}, key='content'), expected)
+
+    def test_page_numbers(self):
+        response = self.client.get('/api/posts/').json()
+        self.assertEqual(response['count'], 25)
+        self.assertEqual(len(response['results']), 10)
+
+    def test_invalid_cursor(self):
+        for cursor in ('abc', 'eyJ2IjoxfQ==', '!!'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/posts/', {'cursor': cursor}).status_code, 404)
+
+
+class SearchTests(TestCase):
+    """ نرمال‌سازی و واژه‌سازی متن فارسی، به‌روز ماندن نمایه و فیلترهای title/content/search """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.python = models.Post.objects.create(
+            title='آموزش Python', content='<p>برنامه‌نویسی با جنگو</p>', author=cls.author
+        )
+        cls.django = models.Post.objects.create(
+            title='جنگو', content='<p>چارچوب وب python و جنگو</p>', author=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.client.force_login(self.author)
+
+    def titles(self, params):
+        return [post['title'] for post in self.client.get('/api/posts/', params).json()['results']]
+
+    def test_tokenize(self):
+        # ي و ك عربی، اعراب، کشیده، نیم‌فاصله و ارقام فارسی
+        self.assertEqual(search.tokenize('<b>كتابِ</b> عليـــرضا  می\u200cخواهد ۱۴۰۵'), ['کتاب', 'علیرضا', 'می', 'خواهد', '1405'])
+        # حروف اضافه و واژه‌های تک‌حرفی نمایه نمی‌شوند
+        self.assertEqual(search.tokenize('و در a the'), [])
+        self.assertEqual(len(search.tokenize('x' * 100)[0]), search.MAX_TERM_LENGTH)
+
+    def test_index_refresh(self):
+        terms = lambda: set(self.python.search_terms.values_list('term', flat=True))
+        self.assertEqual(terms(), {'آموزش', 'python', 'برنامه', 'نویسی', 'جنگو'})
+
+        self.python.title = 'آموزش Rust'
+        self.python.save(update_fields=['title'])
+        self.assertIn('rust', terms())
+        self.assertNotIn('python', terms())
+
+        models.PostSearchTerm.objects.all().delete()
+        output = io.StringIO()
+        call_command('rebuild_search_index', stdout=output)
+        self.assertIn('2 پست', output.getvalue())
+        self.assertIn('rust', terms())
+
+    def test_search_ranking(self):
+        # واژه‌ی عنوان وزن بیشتری دارد
+        self.assertEqual(self.titles({'search': 'جنگو'}), ['جنگو', 'آموزش Python'])
+        self.assertEqual(self.titles({'search': 'PYTHON'}), ['آموزش Python', 'جنگو'])
+        self.assertEqual(self.titles({'search': 'python وب'}), ['جنگو'])
+        self.assertEqual(self.titles({'search': 'rust'}), [])
+        # بدون واژه‌ی قابل جستجو فیلتری اعمال نمی‌شود
+        self.assertEqual(len(self.titles({'search': 'و a'})), 2)
+
+    def test_field_filters(self):
+        # زیررشته، مثل قبل از نمایه
+        self.assertEqual(self.titles({'title': 'pyth'}), ['آموزش Python'])
+        self.assertEqual(self.titles({'content': 'چارچوب'}), ['جنگو'])
+        self.assertEqual(search.search_posts(models.Post.objects, 'python', field='title').get(), self.python)
+
+
+class PostDetailCacheTests(TestCase):
+    """ کش جزئیات پست (blog.caching) و باطل شدنش با هر نوع حذف """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.reader = CustomUser.objects.create_user(username='reader', email='reader@example.com', password='x')
+        cls.post = models.Post.objects.create(title='cached post', content='<p>text</p>', author=cls.author)
+        cls.post.tags.set([models.Tag.objects.create(name='python')])
+        cls.comment = models.Comment.objects.create(post=cls.post, author=cls.reader, content='نظر')
+        cls.url = f'/api/posts/{cls.post.slug}/'
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.client.force_login(self.reader)
+
+    def detail_version(self):
+        return caching.get_cache().get(caching.DETAIL_VERSION_KEY.format(slug=self.post.slug))
+
+    def assertPlain(self, data):
+        """ Hyperlink شی مدل را همراه دارد و نباید pickle شود """
+        if isinstance(data, dict):
+            for value in data.values():
+                self.assertPlain(value)
+        elif isinstance(data, list):
+            for value in data:
+                self.assertPlain(value)
+        elif isinstance(data, str):
+            self.assertIs(type(data), str)
+
+    def test_cached(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(self.url)
+        post_queries = [query['sql'] for query in queries if query['sql'].startswith('SELECT "blog_post"')]
+        # content همراه همان ردیف خوانده می‌شود، نه با کوئری جدا برای فیلد defer شده
+        self.assertEqual(len(post_queries), 1)
+        self.assertIn('"blog_post"."content"', post_queries[0])
+
+        data, _ = caching.get_post_detail(self.post.slug, first.wsgi_request)
+        self.assertNotIn('you_liked', data)
+        self.assertPlain(data)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+        self.assertEqual(second.json(), first.json())
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "blog_post"')])
+
+    def test_list_skips_content(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/posts/')
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue([sql for sql in selects if 'FROM "blog_post"' in sql])
+        self.assertFalse([sql for sql in selects if '"blog_post"."content"' in sql])
+
+    def test_queryset_delete(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        models.Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get('/api/posts/').json()['count'], 0)
+
+    def test_cascade_delete(self):
+        """ حذف نویسنده پست‌ها و دیدگاه‌هایش را بدون Post.delete حذف می‌کند """
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.author.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_comment_delete(self):
+        self.client.get(self.url)
+        version = self.detail_version()
+        self.assertIsNotNone(version)
+        self.post.comments.all().delete()
+        self.assertNotEqual(self.detail_version(), version)
+
+    def test_author_change(self):
+        """ نام و تصویر نویسنده در کش جزئیات است؛ ورود کاربر کش را باطل نمی‌کند """
+        self.client.get(self.url)
+        version = self.detail_version()
+
+        author = CustomUser.objects.get(pk=self.author.pk)
+        author.last_login = timezone.now()
+        author.save(update_fields=['last_login'])
+        author.bio = 'درباره‌ی من'
+        author.save()
+        self.assertEqual(self.detail_version(), version)
+
+        author.first_name = 'نام تازه'
+        author.save()
+        self.assertNotEqual(self.detail_version(), version)
+        self.assertEqual(self.client.get(self.url).json()['author']['first_name'], 'نام تازه')
+
+        version = self.detail_version()
+        author = CustomUser.objects.only('pk', 'profile_pic').get(pk=self.author.pk)
+        author.profile_pic = 'avatars/x.png'
+        author.save(update_fields=['profile_pic'])
+        self.assertNotEqual(self.detail_version(), version)
+
+
+class FeedCacheTests(TestCase):
+    """ کش صفحه‌های لیست پست‌ها: کلید وابسته به فیلترها و مسیر، و you_liked جدا برای هر کاربر """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.readers = [
+            CustomUser.objects.create_user(username=f'reader{i}', email=f'reader{i}@example.com', password='x')
+            for i in range(2)
+        ]
+        python, django = models.Tag.objects.create(name='python'), models.Tag.objects.create(name='django')
+        for i in range(12):
+            post = models.Post.objects.create(title=f'post {i}', content='<p>text</p>', author=cls.author)
+            post.tags.set([python, django] if i % 2 else [python])
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.client.force_login(self.readers[0])
+
+    def get(self, url, params=None):
+        before = caching.feed_stats()['hit']
+        response = self.client.get(url, params)
+        return response.json(), caching.feed_stats()['hit'] > before
+
+    def test_hit(self):
+        first, hit = self.get('/api/posts/')
+        self.assertFalse(hit)
+        second, hit = self.get('/api/posts/')
+        self.assertTrue(hit)
+        self.assertEqual(second, first)
+
+    def test_filter_aware_keys(self):
+        self.get('/api/posts/', {'tags': 'python,django'})
+        # ترتیب تگ‌ها و پارامترهای ناشناخته کلید را عوض نمی‌کنند
+        response, hit = self.get('/api/posts/', {'tags': 'django,python', 'utm_source': 'x'})
+        self.assertTrue(hit)
+        self.assertEqual(response['count'], 12)
+
+        response, hit = self.get('/api/posts/', {'tags': 'django'})
+        self.assertFalse(hit)
+        self.assertEqual(response['count'], 6)
+        response, hit = self.get('/api/posts/', {'tags': 'django,python', 'page': 2})
+        self.assertFalse(hit)
+        self.assertEqual(len(response['results']), 2)
+
+    def test_route_in_key(self):
+        """ لینک next مسیر همان درخواست را دارد؛ api/async/ صفحه‌ی کش شده‌ی مسیر همگام را نمی‌گیرد """
+        for url in ('/api/posts/', '/api/async/posts/', '/api/posts/'):
+            response, _ = self.get(url)
+            self.assertTrue(response['next'].startswith(f'http://testserver{url}?'))
+
+    def test_you_liked_per_user(self):
+        self.post.likes.add(self.readers[0])
+        response, _ = self.get('/api/posts/')
+        self.assertTrue(response['results'][0]['you_liked'])
+
+        self.client.force_login(self.readers[1])
+        response, hit = self.get('/api/posts/')
+        self.assertTrue(hit)
+        self.assertFalse(response['results'][0]['you_liked'])
+
+    def test_invalidation(self):
+        self.get('/api/posts/')
+        models.Post.objects.create(title='new post', content='<p>text</p>', author=self.author)
+        response, hit = self.get('/api/posts/')
+        self.assertFalse(hit)
+        self.assertEqual(response['count'], 13)
+
+
+class TagResolutionTests(TestCase):
+    """ blog.tags.resolve_tag_ids: نرمال‌سازی پیش از جستجو و ساخت دسته‌ای """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.python = models.Tag.objects.create(name='python')
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+
+    def names(self, ids):
+        return set(models.Tag.objects.filter(pk__in=ids).values_list('name', flat=True))
+
+    def resolve(self, names, queries):
+        with count_queries() as counter:
+            ids = resolve_tag_ids(names)
+        self.assertEqual(counter.count, queries)
+        return ids
+
+    def test_normalize_and_create(self):
+        ids = self.resolve(['Python!', ' python ', 'Django', 'django.', '', '!!'], queries=3)
+        self.assertEqual(self.names(ids), {'python', 'django'})
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(models.Tag.objects.count(), 2)
+
+        self.assertEqual(sorted(self.resolve(['PYTHON', 'django'], queries=1)), sorted(ids))
+
+    def test_renamed_tag(self):
+        """ نام برچسب عوض شده؛ نام قدیمی برچسب تازه‌ای می‌سازد """
+        self.resolve(['python'], queries=1)
+        models.Tag.objects.filter(pk=self.python.pk).update(name='python3')
+
+        ids = self.resolve(['python', 'rust'], queries=3)
+        self.assertEqual(self.names(ids), {'python', 'rust'})
+        self.assertNotIn(self.python.pk, ids)
+
+        self.client.force_login(self.author)
+        response = self.client.post('/api/posts/', {'title': 'tags', 'content': '<p>x</p>', 'tags_list': ['go', 'python3']}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(models.Post.objects.get(title='tags').tags.values_list('name', flat=True)), {'go', 'python3'})
+
+
+class TagCountTests(TestCase):
+    """ Tag.posts_count: فقط با تغییر status یا برچسب‌ها و با هر نوع حذف پست با F ± 1 به‌روز می‌شود """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.tags = [models.Tag.objects.create(name=name) for name in ('python', 'django', 'rust')]
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.post = models.Post.objects.create(title='post', content='<p>x</p>', author=self.author)
+        self.post.tags.set(self.tags[:2])
+
+    def counts(self):
+        return dict(models.Tag.objects.values_list('name', 'posts_count'))
+
+    def test_status_change(self):
+        self.assertEqual(self.counts(), {'python': 1, 'django': 1, 'rust': 0})
+
+        post = models.Post.objects.get(pk=self.post.pk)
+        with mock.patch('blog.models.refresh_posts_count') as refresh, mock.patch('blog.models.adjust_posts_count') as adjust:
+            post.content = '<p>ویرایش</p>'
+            post.save()
+            post.status = True
+            post.save(update_fields=['status'])
+        refresh.assert_not_called()
+        adjust.assert_not_called()
+
+        post.status = False
+        post.save()
+        self.assertEqual(self.counts(), {'python': 0, 'django': 0, 'rust': 0})
+        post.status = True
+        post.save(update_fields=['status'])
+        self.assertEqual(self.counts(), {'python': 1, 'django': 1, 'rust': 0})
+
+        # status به تعویق افتاده: وضعیت قبلی معلوم نیست و دوباره شمرده می‌شود
+        post = models.Post.objects.only('pk', 'title', 'content').get(pk=self.post.pk)
+        post.status = False
+        post.save()
+        self.assertEqual(self.counts(), {'python': 0, 'django': 0, 'rust': 0})
+
+    def test_delete(self):
+        self.post.delete()
+        self.assertEqual(self.counts(), {'python': 0, 'django': 0, 'rust': 0})
+
+        post = models.Post.objects.create(title='queryset', content='<p>x</p>', author=self.author)
+        post.tags.set(self.tags)
+        models.Post.objects.filter(pk=post.pk).delete()
+        self.assertEqual(self.counts(), {'python': 0, 'django': 0, 'rust': 0})
+
+        post = models.Post.objects.create(title='cascade', content='<p>x</p>', author=self.author)
+        post.tags.set(self.tags[1:])
+        self.author.delete()
+        self.assertEqual(self.counts(), {'python': 0, 'django': 0, 'rust': 0})
+
+    def test_delete_unpublished(self):
+        self.post.status = False
+        self.post.save(update_fields=['status'])
+        with mock.patch('blog.signals.adjust_posts_count') as adjust:
+            self.post.delete()
+        adjust.assert_not_called()
+
+    def test_incremental(self):
+        """ افزودن و حذف برچسب بدون شمارش دوباره؛ حذف برچسب بی‌ارتباط چیزی کم نمی‌کند """
+        python, django, rust = self.tags
+        with mock.patch('blog.tags.refresh_posts_count') as refresh, mock.patch('blog.models.refresh_posts_count') as model_refresh:
+            self.post.tags.add(rust)
+            self.assertEqual(self.counts(), {'python': 1, 'django': 1, 'rust': 1})
+            self.post.tags.add(rust)
+            self.post.tags.remove(python)
+            self.post.tags.remove(python)
+            self.assertEqual(self.counts(), {'python': 0, 'django': 1, 'rust': 1})
+            self.post.tags.set([python])
+            self.assertEqual(self.counts(), {'python': 1, 'django': 0, 'rust': 0})
+            self.post.tags.clear()
+            self.assertEqual(self.counts(), {'python': 0, 'django': 0, 'rust': 0})
+
+            self.post.tags.set(self.tags)
+            post = models.Post.objects.get(pk=self.post.pk)
+            post.status = False
+            post.save()
+            self.assertEqual(self.counts(), {'python': 0, 'django': 0, 'rust': 0})
+            post.tags.remove(python)
+            self.assertEqual(self.counts(), {'python': 0, 'django': 0, 'rust': 0})
+            post.status = True
+            post.save()
+            self.assertEqual(self.counts(), {'python': 0, 'django': 1, 'rust': 1})
+        refresh.assert_not_called()
+        model_refresh.assert_not_called()
+
+    def test_reverse(self):
+        python, django, rust = self.tags
+        draft = models.Post.objects.create(title='draft', content='<p>x</p>', author=self.author, status=False)
+        other = models.Post.objects.create(title='other', content='<p>x</p>', author=self.author)
+
+        rust.posts.add(self.post, draft, other)
+        self.assertEqual(self.counts()['rust'], 2)
+        rust.posts.remove(draft, self.post)
+        python.posts.remove(other)
+        self.assertEqual(self.counts(), {'python': 1, 'django': 1, 'rust': 1})
+        rust.posts.clear()
+        self.assertEqual(self.counts()['rust'], 0)
+
+    def test_rebuild_tag_counts(self):
+        models.Tag.objects.update(posts_count=7)
+        call_command('rebuild_tag_counts', stdout=io.StringIO())
+        self.assertEqual(self.counts(), {'python': 1, 'django': 1, 'rust': 0})
+
+    def test_tags_list_reverses_once(self):
+        """ posts_url: reverse یک بار برای کل صفحه، نه به ازای هر برچسب """
+        self.client.force_login(self.author)
+        with mock.patch('blog.serializer.reverse', wraps=serializer.reverse) as reverse:
+            response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(reverse.call_count, 1)
+        urls = {tag['name']: tag['posts_url'] for tag in response.json()['results']}
+        self.assertEqual(urls['python'], 'http://testserver/api/posts/?tags=python')
+        self.assertEqual(len(urls), 3)
+
+    def test_tags_list_ordering(self):
+        """ ترتیب پیش‌فرض: پرکاربردترین برچسب اول و pk برای برابرها؛ صفحه‌بندی بدون UnorderedObjectListWarning """
+        models.Post.objects.create(title='rust', content='<p>x</p>', author=self.author).tags.set(self.tags[1:])
+        for url in ('/api/tags/', '/api/async/tags/'):
+            with self.subTest(url), warnings.catch_warnings():
+                warnings.simplefilter('error', UnorderedObjectListWarning)
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([tag['name'] for tag in response.json()['results']], ['django', 'python', 'rust'])
+
+
+class DeliveryTests(SimpleTestCase):
+    """ blog.delivery: Range تکی، ETag و If-Range در PythonBackend و سرآیندهای پراکسی """
+    data = bytes(range(100))
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.file_path = f'{directory}/file.bin'
+        with open(self.file_path, 'wb') as file:
+            file.write(self.data)
+        self.backend = delivery.PythonBackend()
+
+    def serve(self, **headers):
+        request = RequestFactory().get('/media/file.bin', headers=headers)
+        response = self.backend.serve(request, 'file.bin', self.file_path)
+        self.addCleanup(response.close)
+        return response
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'])
+        self.assertEqual(self.content(response), self.data)
+
+    def test_ranges(self):
+        cases = {
+            'bytes=10-19': (10, 19),
+            'bytes=90-': (90, 99),
+            'bytes=-5': (95, 99),
+            'bytes=95-500': (95, 99),
+            'bytes=-500': (0, 99),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(header):
+                response = self.serve(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/100')
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+                self.assertEqual(self.content(response), self.data[start:end + 1])
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=100-', 'bytes=50-10', 'bytes=-0', 'bytes=-'):
+            with self.subTest(header):
+                response = self.serve(Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_multiple_ranges_send_whole_file(self):
+        response = self.serve(Range='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), self.data)
+
+    def test_conditional(self):
+        etag = self.serve()['ETag']
+        self.assertEqual(self.serve(If_None_Match=etag).status_code, 304)
+
+        response = self.serve(Range='bytes=0-9', If_Range=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.content(response), self.data[:10])
+
+        # فایل پس از ETag ی کلاینت تغییر کرده: کل فایل
+        response = self.serve(Range='bytes=0-9', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), self.data)
+
+    @override_settings(PRIVATE_MEDIA_ACCEL_PREFIX='/private_media/')
+    def test_proxy_backends(self):
+        request = RequestFactory().get('/media/')
+        response = delivery.XAccelBackend().serve(request, 'post_media/u/نام فایل.png', self.file_path)
+        self.assertEqual(response['X-Accel-Redirect'], '/private_media/post_media/u/%D9%86%D8%A7%D9%85%20%D9%81%D8%A7%DB%8C%D9%84.png')
+
+        response = delivery.XSendfileBackend().serve(request, 'file.bin', self.file_path)
+        self.assertEqual(response['X-Sendfile'], self.file_path)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ChunkedUploadTests(TestCase):
+    """ blog.uploads: ادامه از offset، رد offset نادرست و شروع دوباره پس از checksum نادرست """
+    content = b'0123456789' * 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.client = APIClient()
+        self.client.force_login(self.author)
+        response = self.client.post('/api/post_media/uploads/', {
+            'filename': 'a.bin', 'size': len(self.content), 'checksum': hashlib.sha256(self.content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.url = f"/api/post_media/uploads/{response.json()['id']}/"
+        self.session = models.UploadSession.objects.get(pk=response.json()['id'])
+
+    def put(self, offset, data):
+        return self.client.put(self.url, data, content_type='application/offset+octet-stream',
+                               HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_resume(self):
+        self.assertEqual(self.put(0, self.content[:30]).status_code, 200)
+        # اتصال وسط تکه قطع شده: فقط بایت‌های رسیده ثبت می‌شوند
+        self.session.refresh_from_db()
+        uploads.append(self.session, 30, io.BytesIO(self.content[30:45]), 40)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['offset'], 45)
+        self.assertEqual(response['Upload-Offset'], '45')
+        self.assertEqual(self.put(45, self.content[45:]).status_code, 200)
+
+        response = self.client.post(f'{self.url}complete/')
+        self.assertEqual(response.status_code, 201)
+        with models.Media.objects.get(pk=response.json()['id']).file.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertFalse(models.UploadSession.objects.filter(pk=self.session.pk).exists())
+        self.assertEqual(list(uploads.temp_dir().glob(f'{self.session.pk}*')), [])
+
+    def test_offset_mismatch(self):
+        response = self.put(10, self.content[10:20])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['errors']['offset'], '0')
+
+        # درخواست همزمانی که نشست را پیش از جلو رفتن offset خوانده بود
+        stale = models.UploadSession.objects.get(pk=self.session.pk)
+        self.assertEqual(self.put(0, self.content[:20]).status_code, 200)
+        with self.assertRaises(uploads.OffsetMismatch):
+            uploads.append(stale, 0, io.BytesIO(b'x' * 20), 20)
+        self.assertEqual(stale.offset, 20)
+        self.assertEqual(uploads.temp_path(self.session).read_bytes(), self.content[:20])
+        self.assertEqual(list(uploads.temp_dir().glob('*.chunk')), [])
+
+    def test_checksum_mismatch(self):
+        self.assertEqual(self.put(0, b'x' * len(self.content)).status_code, 200)
+        response = self.client.post(f'{self.url}complete/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors']['offset'], '0')
+
+        # نشست می‌ماند و از ابتدا فرستاده می‌شود
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.offset, 0)
+        self.assertEqual(uploads.temp_path(self.session).read_bytes(), b'')
+        self.assertEqual(self.put(0, self.content).status_code, 200)
+        self.assertEqual(self.client.post(f'{self.url}complete/').status_code, 201)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaBlobTests(TestCase):
+    """ blog.blobs: یک فایل برای محتوای تکراری، refcount و gc با مهلت پس از آخرین ارجاع """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+
+    def create_media(self, content, name='a.txt'):
+        return models.Media.objects.create(author=self.author, file=SimpleUploadedFile(name, content))
+
+    def age(self, blob, hours=2):
+        models.MediaBlob.objects.filter(pk=blob.pk).update(last_acquired_at=timezone.now() - timedelta(hours=hours))
+
+    def test_dedupe(self):
+        first = self.create_media(b'same')
+        second = self.create_media(b'same', name='b.txt')
+        other = self.create_media(b'other')
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.blob_id, other.blob_id)
+        self.assertEqual(models.MediaBlob.objects.get(pk=first.blob_id).refcount, 2)
+        self.assertEqual(models.MediaBlob.objects.count(), 2)
+
+        second.delete()
+        self.assertEqual(models.MediaBlob.objects.get(pk=first.blob_id).refcount, 1)
+        first.delete()
+        blob = models.MediaBlob.objects.get(pk=first.blob_id)
+        self.assertEqual(blob.refcount, 0)
+        # فایل تا gc می‌ماند
+        self.assertTrue(blob.file.storage.exists(blob.file.name))
+
+    def test_shared_blob_variants(self):
+        """ ساخت دوباره‌ی نسخه‌های یک blob فایل‌هایی را که Media ی دیگر به آن‌ها اشاره می‌کند حذف نمی‌کند """
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(buffer, 'PNG')
+        first = self.create_media(buffer.getvalue(), name='a.png')
+        second = self.create_media(buffer.getvalue(), name='b.png')
+        self.assertEqual(first.file.name, second.file.name)
+
+        storage = first.file.storage
+        for media in (first, second):
+            media.variants = images.generate_variants(media.file.name, [320], storage)
+            media.save(update_fields=['variants'])
+
+        first.refresh_from_db()
+        self.assertEqual(first.variants, second.variants)
+        for variant in first.variants:
+            self.assertTrue(storage.exists(variant['name']))
+        directory = first.file.name.rsplit('/', 1)[0]
+        self.assertEqual(len(storage.listdir(directory)[1]), 1 + len(first.variants))
+
+
+    def test_variants_command_once_per_blob(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(buffer, 'PNG')
+        shared = [self.create_media(buffer.getvalue(), name=f'{i}.png') for i in range(3)]
+        other = self.create_media(b'not an image')
+
+        for regenerate in (False, True):
+            with mock.patch('config.images.generate_variants', wraps=images.generate_variants) as generate:
+                call_command('generate_image_variants', workers=1, batch_size=2, all=regenerate, stdout=io.StringIO())
+            self.assertEqual(sorted(call.args[0] for call in generate.call_args_list),
+                             sorted({shared[0].file.name, other.file.name}))
+
+            variants = [models.Media.objects.get(pk=media.pk).variants for media in shared]
+            self.assertEqual(len(variants[0]), len(images.FORMATS))
+            self.assertTrue(all(item == variants[0] for item in variants))
+            self.assertEqual(models.Media.objects.get(pk=other.pk).variants, [])
+
+
+    def test_collect_garbage(self):
+        kept = self.create_media(b'kept').blob
+        orphan = self.create_media(b'orphan')
+        orphan_blob = orphan.blob
+        orphan.delete()
+        # ارجاع تازه‌ای که Media اش هنوز commit نشده
+        pending = self.create_media(b'pending')
+        pending_blob = pending.blob
+        models.Media.objects.filter(pk=pending.pk).delete()
+        models.MediaBlob.objects.filter(pk=kept.pk).update(refcount=5)
+        for blob in (kept, orphan_blob, pending_blob):
+            self.age(blob)
+        self.assertEqual(blobs.acquire(pending_blob.sha256).pk, pending_blob.pk)
+
+        self.assertEqual(blobs.collect_garbage(dry_run=True), (1, len(b'orphan')))
+        self.assertTrue(models.MediaBlob.objects.filter(pk=orphan_blob.pk).exists())
+
+        call_command('gc_media_blobs', stdout=io.StringIO())
+        self.assertFalse(models.MediaBlob.objects.filter(pk=orphan_blob.pk).exists())
+        self.assertFalse(orphan_blob.file.storage.exists(orphan_blob.file.name))
+        self.assertEqual(models.MediaBlob.objects.get(pk=kept.pk).refcount, 1)
+        # refcount ی blob تازه ارجاع داده شده دست نمی‌خورد
+        self.assertEqual(models.MediaBlob.objects.get(pk=pending_blob.pk).refcount, 2)
+
+        self.age(pending_blob)
+        self.assertEqual(blobs.collect_garbage(), (1, len(b'pending')))
+
+
+class SanitizerTests(SimpleTestCase):
+    """ blog.sanitizer.sanitize: پاک‌سازی دوباره فقط برای متنی که با هش ذخیره شده فرق دارد """
+
+    def test_hash_skip(self):
+        dirty = '<p onclick="x()">سلام <script>alert(1)</script></p>'
+        cleaned, digest = sanitizer.sanitize(dirty)
+        self.assertEqual(cleaned, '<p>سلام alert(1)</p>')
+        self.assertEqual(digest, sanitizer.content_hash(cleaned))
+
+        with mock.patch.object(Cleaner, 'clean', autospec=True, side_effect=Cleaner.clean) as clean:
+            self.assertEqual(sanitizer.sanitize(cleaned, digest), (cleaned, digest))
+            clean.assert_not_called()
+
+            self.assertEqual(sanitizer.sanitize(cleaned + '<iframe></iframe>', digest), (cleaned, digest))
+            self.assertEqual(clean.call_count, 1)
+
+            # هش قدیمی متن تغییر نکرده: خروجی همان ورودی و هش خودش
+            self.assertEqual(sanitizer.sanitize('<p>x</p>', 'stale'), ('<p>x</p>', sanitizer.content_hash('<p>x</p>')))
+            self.assertEqual(clean.call_count, 2)
+
+    def test_cleaner_per_thread(self):
+        cleaner = sanitizer.get_cleaner()
+        self.assertIs(sanitizer.get_cleaner(), cleaner)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(sanitizer.get_cleaner()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], cleaner)
+
+
+class SummarizeTests(SimpleTestCase):
+    """ blog.sanitizer.summarize: خلاصه‌ی بریده شده در مرز کلمه، تعداد کلمات و زمان مطالعه """
+
+    def test_plain_text(self):
+        self.assertEqual(sanitizer.summarize(''), ('', 0, 0))
+        self.assertEqual(
+            sanitizer.summarize('<h1>عنوان</h1><p>سلام&nbsp;دنیا &amp; <b>پایتون</b></p>'),
+            ('عنوان سلام دنیا & پایتون', 5, 1),
+        )
+        self.assertEqual(sanitizer.summarize('<p>کلمه </p>' * 401)[1:], (401, 3))
+
+    def test_excerpt_word_boundary(self):
+        words = [f'w{i:03}' for i in range(100)]
+        excerpt, word_count, _ = sanitizer.summarize(' '.join(words))
+        self.assertEqual(word_count, 100)
+        # هر کلمه 4 حرف و یک فاصله: 60 کلمه دقیقا 299 حرف
+        self.assertEqual(excerpt, ' '.join(words[:60]) + '…')
+
+        text = ' '.join(['x' * 99] * 3)
+        self.assertEqual(sanitizer.summarize(text)[0], text)
+        self.assertEqual(sanitizer.summarize(text + ' y')[0], text + '…')
+
+    def test_long_first_word(self):
+        url = 'https://example.com/' + 'a' * 400
+        excerpt, word_count, _ = sanitizer.summarize(f'<p>{url} بعدی</p>')
+        self.assertEqual(excerpt, url[:sanitizer.EXCERPT_LENGTH] + '…')
+        self.assertEqual(word_count, 2)
+
+
+class ProfilingTests(TestCase):
+    """ config.profiling: قواعد نمونه‌برداری، کلید action هر نمونه و صدک‌های profile_stats """
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.middleware = profiling.SampledProfilingMiddleware(lambda request: None)
+
+    def config(self, **overrides):
+        return {**profiling.DEFAULTS, 'DIR': self.directory, **overrides}
+
+    def test_sample_rate(self):
+        request = RequestFactory().get('/api/posts/')
+        with mock.patch('config.profiling.random.random', return_value=0.3):
+            self.assertTrue(self.middleware.should_sample(request, self.config(SAMPLE_RATE=0.5)))
+            self.assertFalse(self.middleware.should_sample(request, self.config(SAMPLE_RATE=0.2)))
+            self.assertFalse(self.middleware.should_sample(request, self.config()))
+
+    def test_header_and_paths(self):
+        config = self.config(TOKEN='secret', PATHS=['^/api/posts/'])
+        factory = RequestFactory()
+        with mock.patch('config.profiling.random.random', return_value=0.99):
+            self.assertTrue(self.middleware.should_sample(factory.get('/api/tags/', headers={'X-Profile': 'secret'}), config))
+            self.assertFalse(self.middleware.should_sample(factory.get('/api/tags/', headers={'X-Profile': 'wrong'}), config))
+            self.assertTrue(self.middleware.should_sample(factory.get('/api/posts/x/'), config))
+            self.assertFalse(self.middleware.should_sample(factory.get('/api/tags/'), config))
+
+    def test_requires_dir(self):
+        request = RequestFactory().get('/api/posts/')
+        self.assertFalse(self.middleware.should_sample(request, self.config(DIR=None, PATHS=['.'], SAMPLE_RATE=1)))
+
+    def test_records_action(self):
+        author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        models.Post.objects.create(title='پست', content='<p>متن</p>', author=author)
+        with override_settings(PROFILING={'DIR': self.directory, 'PATHS': ['^/api/posts/$']}):
+            self.assertEqual(self.client.get('/api/posts/').status_code, 200)
+            self.assertEqual(self.client.get('/api/tags/').status_code, 200)
+
+        samples = list(profiling.read_samples(self.directory))
+        self.assertEqual([sample['action'] for sample in samples], ['PostsViewSet.list'])
+        sample = samples[0]
+        self.assertEqual((sample['method'], sample['status']), ('GET', 200))
+        self.assertGreater(sample['sql_count'], 0)
+        self.assertGreater(sample['serializer_ms'], 0)
+        self.assertGreaterEqual(sample['total_ms'], sample['sql_ms'])
+
+    def test_percentiles(self):
+        self.assertEqual(profiling.percentile([], 50), 0)
+        values = list(range(1, 101))
+        self.assertEqual([profiling.percentile(values, p) for p in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual([profiling.percentile([3, 1, 2], p) for p in (50, 95)], [2, 3])
+
+    def test_profile_stats(self):
+        recorder = profiling.Recorder(self.directory)
+        for i in range(1, 21):
+            recorder.record({'action': 'PostsViewSet.list', 'total_ms': i, 'sql_count': 2, 'sql_ms': i / 2, 'serializer_ms': 1})
+        recorder.record({'action': 'TagsViewSet.list', 'total_ms': 1, 'sql_count': 1, 'sql_ms': 0.5, 'serializer_ms': 0})
+
+        out = io.StringIO()
+        call_command('profile_stats', dir=self.directory, action='PostsViewSet', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'PostsViewSet.list (20 نمونه)')
+        self.assertIn('    total_ms: p50 10, p95 19, p99 20', lines)
+        self.assertIn('    sql_count: p50 2, p95 2, p99 2', lines)
+        self.assertNotIn('TagsViewSet.list (1 نمونه)', lines)
+
+
+class ProdSettingsTests(SimpleTestCase):
+    """ config.settings.prod: بدون SECRET_KEY یا با ابزار profiling بالا نمی‌آید """
+
+    def import_prod(self, **environ):
+        # base هم دوباره اجرا می‌شود تا prod دیکشنری‌های تنظیمات فعال (DATABASES و ...) را تغییر ندهد
+        with mock.patch.dict('os.environ', environ), mock.patch.dict('sys.modules'):
+            sys.modules.pop('config.settings.base', None)
+            sys.modules.pop('config.settings.prod', None)
+            return importlib.import_module('config.settings.prod')
+
+    def test_secret_key(self):
+        with mock.patch.dict('os.environ'):
+            os.environ.pop('SECRET_KEY', None)
+            with self.assertRaises(ImproperlyConfigured):
+                self.import_prod()
+        self.assertEqual(self.import_prod(SECRET_KEY='x').SECRET_KEY, 'x')
+
+    def test_refuse_profiling(self):
+        prod = self.import_prod(SECRET_KEY='x')
+        prod.refuse_profiling(prod.INSTALLED_APPS, prod.MIDDLEWARE)
+
+        cases = [
+            ([*prod.INSTALLED_APPS, 'silk'], prod.MIDDLEWARE),
+            (prod.INSTALLED_APPS, ['silk.middleware.SilkyMiddleware', *prod.MIDDLEWARE]),
+            (['debug_toolbar'], []),
+            ([], ['pyinstrument.middleware.ProfilerMiddleware']),
+        ]
+        for installed_apps, middleware in cases:
+            with self.subTest(installed_apps=installed_apps, middleware=middleware):
+                with self.assertRaisesMessage(ImproperlyConfigured, 'ابزار profiling در prod مجاز نیست'):
+                    prod.refuse_profiling(installed_apps, middleware)
+        # SampledProfilingMiddleware خود پروژه مجاز است
+        self.assertIn('config.profiling.SampledProfilingMiddleware', prod.MIDDLEWARE)
+
+
+class BenchmarkTests(TestCase):
+    """ seed_benchmark_data و run_benchmark روی داده‌ی کوچک؛ سناریوی لایک داده را تغییر نمی‌دهد """
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        call_command(
+            'seed_benchmark_data', users=4, posts=6, tags=3, tags_per_post=2,
+            likes_per_post=2, comments_per_post=1, stdout=io.StringIO(),
+        )
+
+    def likes(self):
+        return (
+            set(models.Post.likes.through.objects.values_list('post_id', 'customuser_id')),
+            dict(models.Post.objects.values_list('pk', 'likes_count')),
+        )
+
+    def test_run_benchmark(self):
+        self.assertEqual(models.Post.objects.count(), 6)
+        self.assertEqual(sum(models.Tag.objects.values_list('posts_count', flat=True)), 12)
+        before = self.likes()
+
+        output = f'{tempfile.mkdtemp()}/result.json'
+        self.addCleanup(shutil.rmtree, output.rsplit('/', 1)[0], ignore_errors=True)
+        call_command('run_benchmark', 'posts-list', 'posts-retrieve', 'posts-toggle-like', 'async-tags-list',
+                     requests=3, warmup=1, output=output, stdout=io.StringIO())
+
+        with open(output, encoding='utf-8') as file:
+            results = json.load(file)
+        self.assertEqual(set(results['scenarios']), {'posts-list', 'posts-retrieve', 'posts-toggle-like', 'async-tags-list'})
+        for name, result in results['scenarios'].items():
+            with self.subTest(name):
+                self.assertEqual(result['errors'], 0)
+                self.assertEqual(result['requests'], 3)
+                self.assertGreater(result['queries']['p50'], 0)
+        self.assertEqual(results['meta']['dataset']['posts'], 6)
+        self.assertEqual(self.likes(), before)
+
+    def test_write_scenarios_need_bench_user(self):
+        CustomUser.objects.create_user(username='real', email='real@example.com', password='x')
+        with self.assertRaisesMessage(CommandError, 'posts-toggle-like'):
+            call_command('run_benchmark', 'posts-toggle-like', user='real', requests=1, warmup=0, stdout=io.StringIO())
+        call_command('run_benchmark', 'posts-list', user='real', requests=1, warmup=0, stdout=io.StringIO())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """
+        هر endpoint در blog.urls با چند پست، تگ و کامنت از نویسنده‌های مختلف صدا
+        زده می‌شود تا کوئری تکراری به ازای هر ردیف (N+1) از بودجه بیرون بزند.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.readers = [
+            CustomUser.objects.create_user(username=f'reader{i}', email=f'reader{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        cls.posts = []
+        for i in range(5):
+            post = models.Post.objects.create(title=f'پست {i}', content=f'<p>متن {i}</p>', author=cls.author)
+            post.tags.set([models.Tag.objects.get_or_create(name=name)[0] for name in ('python', f'tag{i}')])
+            for reader in cls.readers:
+                models.Comment.objects.create(post=post, author=reader, content='نظر')
+                post.likes.add(reader)
+            post.likes_count = len(cls.readers)
+            post.save(update_fields=['likes_count'])
+            cls.posts.append(post)
+        cls.post = cls.posts[0]
+        cls.comment = cls.post.comments.first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.client = APIClient()
+
+    def login(self, user):
+        self.client.force_login(user)
+
+    def create_media(self):
+        self.login(self.author)
+        return self.assertWithinQueryBudget('post', '/api/post_media/', {
+            'file': SimpleUploadedFile('a.txt', b'content'),
+        }, format='multipart')
+
+    def test_every_action_has_budget(self):
+        self.assertEqual(check_query_budgets(), [])
+
+    def test_posts_list(self):
+        self.assertWithinQueryBudget('get', '/api/posts/')
+        # از کش
+        self.assertWithinQueryBudget('get', '/api/posts/')
+        self.login(self.readers[0])
+        self.assertWithinQueryBudget('get', '/api/posts/?tags=python&ordering=-likes')
+
+    def test_posts_retrieve(self):
+        self.login(self.readers[0])
+        response = self.assertWithinQueryBudget('get', f'/api/posts/{self.post.slug}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget('get', f'/api/posts/{self.post.slug}/')
+
+    def test_posts_create_update_destroy(self):
+        self.login(self.author)
+        response = self.assertWithinQueryBudget('post', '/api/posts/', {
+            'title': 'جدید', 'content': '<p>متن</p>', 'tags_list': ['python', 'django', 'new'],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        slug = response.json()['slug']
+
+        self.assertWithinQueryBudget('put', f'/api/posts/{slug}/', {
+            'title': 'جدید', 'content': '<p>متن دیگر</p>', 'tags_list': ['python'],
+        }, format='json')
+        response = self.assertWithinQueryBudget('patch', f'/api/posts/{slug}/', {'title': 'عنوان'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        slug = response.json()['slug']
+        response = self.assertWithinQueryBudget('delete', f'/api/posts/{slug}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_posts_me(self):
+        self.login(self.author)
+        self.assertWithinQueryBudget('get', '/api/posts/me/')
+
+    def test_posts_me_likes(self):
+        self.login(self.readers[0])
+        self.assertWithinQueryBudget('get', '/api/posts/me/likes/')
+
+    def test_posts_me_comments(self):
+        self.login(self.readers[0])
+        self.assertWithinQueryBudget('get', '/api/posts/me/comments/')
+
+    def test_posts_toggle_like(self):
+        self.login(self.readers[0])
+        for name, liked in (
+            ('toggle_like', False), ('toggle_like', True),
+            ('like', True), ('like', True),
+            ('unlike', False), ('unlike', False),
+        ):
+            throttling.get_backend().reset()
+            response = self.assertWithinQueryBudget('post', f'/api/posts/{self.post.slug}/{name}/')
+            self.assertEqual(response.json()['message']['liked'], liked)
+
+    def test_comments(self):
+        # بودجه با کوئری‌های session و کاربر حساب شده است
+        self.login(self.readers[0])
+        url = f'/api/posts/{self.post.slug}/comment/'
+        self.assertWithinQueryBudget('get', url)
+        self.assertWithinQueryBudget('get', f'{url}{self.comment.pk}/')
+
+        response = self.assertWithinQueryBudget('post', url, {'content': 'نظر تازه'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        comment = self.post.comments.latest('pk')
+        self.assertWithinQueryBudget('put', f'{url}{comment.pk}/', {'content': 'ویرایش'}, format='json')
+        self.assertWithinQueryBudget('patch', f'{url}{comment.pk}/', {'content': 'ویرایش'}, format='json')
+        self.assertWithinQueryBudget('delete', f'{url}{comment.pk}/')
+
+    def test_tags_list(self):
+        self.login(self.readers[0])
+        self.assertWithinQueryBudget('get', '/api/tags/?ordering=-posts_count')
+
+    def test_async_reads(self):
+        self.login(self.readers[0])
+        self.assertWithinQueryBudget('get', '/api/async/posts/?tags=python&ordering=-likes')
+        self.assertWithinQueryBudget('get', f'/api/async/posts/{self.post.slug}/')
+        self.assertWithinQueryBudget('get', f'/api/async/posts/{self.post.slug}/comment/')
+        self.assertWithinQueryBudget('get', '/api/async/tags/?ordering=-posts_count')
+
+    def test_media(self):
+        response = self.create_media()
+        self.assertEqual(response.status_code, 201)
+        media_id = response.json()['id']
+        for _ in range(3):
+            self.create_media()
+
+        self.assertWithinQueryBudget('get', '/api/post_media/')
+        self.assertWithinQueryBudget('get', f'/api/post_media/{media_id}/')
+        self.assertWithinQueryBudget('patch', f'/api/post_media/{media_id}/', {
+            'file': SimpleUploadedFile('b.txt', b'other'),
+        }, format='multipart')
+        self.assertWithinQueryBudget('put', f'/api/post_media/{media_id}/', {
+            'file': SimpleUploadedFile('c.txt', b'third'),
+        }, format='multipart')
+
+        name = models.Media.objects.get(pk=media_id).file.name
+        response = self.assertWithinQueryBudget('get', f'/api/media/{name}')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertWithinQueryBudget('delete', f'/api/post_media/{media_id}/')
+
+    def test_media_upload(self):
+        self.login(self.author)
+        content = b'chunked content'
+        response = self.assertWithinQueryBudget('post', '/api/post_media/uploads/', {
+            'filename': 'a.txt', 'size': len(content), 'checksum': hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        url = f"/api/post_media/uploads/{response.json()['id']}/"
+
+        self.assertWithinQueryBudget('put', url, content, content_type='application/offset+octet-stream',
+                                     HTTP_UPLOAD_OFFSET='0')
+        self.assertWithinQueryBudget('get', url)
+        response = self.assertWithinQueryBudget('post', f'{url}complete/')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post('/api/post_media/uploads/', {
+            'filename': 'b.txt', 'size': len(content), 'checksum': hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        response = self.assertWithinQueryBudget('delete', f"/api/post_media/uploads/{response.json()['id']}/")
+        self.assertEqual(response.status_code, 204)
+
+
+class AsyncReadTests(TestCase):
+    """
+        مسیرهای api/async/ باید همان خروجی مسیرهای همگام را بدهند. AsyncClient مسیر
+        غیر ASCII را درست نمی‌سازد، پس عنوان پست‌ها لاتین است.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.reader = CustomUser.objects.create_user(username='reader', email='reader@example.com', password='x')
+        for i in range(12):
+            post = models.Post.objects.create(title=f'post {i}', content=f'<p>text {i}</p>', author=cls.author)
+            post.tags.set([models.Tag.objects.get_or_create(name=name)[0] for name in ('python', f'tag{i % 3}')])
+            models.Comment.objects.create(post=post, author=cls.reader, content='نظر')
+        cls.post = post
+        post.likes.add(cls.reader)
+        post.likes_count = 1
+        post.save(update_fields=['likes_count'])
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+
+    def sync_links(self, response):
+        # لینک‌های صفحه‌بندی به همان مسیر async اشاره می‌کنند
+        return json.loads(response.content.decode().replace('/api/async/', '/api/'))
+
+    def test_same_output_as_sync(self):
+        self.client.force_login(self.reader)
+        for path in (
+            '/posts/',
+            '/posts/?page=2',
+            '/posts/?cursor=',
+            '/posts/?tags=tag1&ordering=-likes',
+            f'/posts/{self.post.slug}/',
+            f'/posts/{self.post.slug}/comment/',
+            '/tags/?ordering=-posts_count',
+            '/posts/missing/',
+            '/posts/missing/comment/',
+        ):
+            with self.subTest(path=path):
+                cache.clear()
+                expected = self.client.get(f'/api{path}')
+                cache.clear()
+                response = self.client.get(f'/api/async{path}')
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(self.sync_links(response), expected.json())
+                # از کش
+                self.assertEqual(self.sync_links(self.client.get(f'/api/async{path}')), expected.json())
+
+    def test_read_only(self):
+        self.client.force_login(self.author)
+        response = self.client.post('/api/async/posts/', {'title': 'x', 'content': 'x'})
+        self.assertEqual(response.status_code, 405)
+
+    async def test_asgi(self):
+        await self.async_client.aforce_login(self.reader)
+        for path in (
+            '/api/async/posts/',
+            f'/api/async/posts/{self.post.slug}/',
+            f'/api/async/posts/{self.post.slug}/comment/?cursor=',
+            '/api/async/tags/',
+        ):
+            with self.subTest(path=path):
+                response = await self.async_client.get(path)
+                self.assertEqual(response.status_code, 200)
+                # middlewareها در حالت async هم کوئری‌های thread ی ORM را می‌شمارند
+                counter = response.asgi_request.query_counter
+                _, budget = get_budget(response.asgi_request, response)
+                self.assertTrue(0 < counter.count <= budget, (counter.count, budget))
+
+        response = await self.async_client.get(f'/api/async/posts/{self.post.slug}/')
+        self.assertIs(response.json()['you_liked'], True)
+
+
+class PostEventsTests(TestCase):
+    """ SSE پست‌ها با AsyncClient (ASGI)؛ نوشتن‌ها از ویوهای همگام منتشر می‌شوند """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.reader = CustomUser.objects.create_user(username='reader', email='reader@example.com', password='x')
+        cls.post = models.Post.objects.create(title='live post', content='<p>text</p>', author=cls.author)
+        cls.url = f'/api/posts/{cls.post.slug}/events/'
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+
+    def comment_and_like(self):
+        self.client.force_login(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/posts/{self.post.slug}/comment/', {'content': 'زنده'})
+            self.client.post(f'/api/posts/{self.post.slug}/toggle_like/')
+
+    async def read(self, chunks):
+        return (await asyncio.wait_for(anext(chunks), timeout=1)).decode()
+
+    async def test_stream(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        _, budget = get_budget(response.asgi_request, response)
+        self.assertLessEqual(response.asgi_request.query_counter.count, budget)
+        chunks = aiter(response.streaming_content)
+
+        self.assertTrue((await self.read(chunks)).startswith('retry:'))
+        self.assertEqual(await self.read(chunks), events.format_event('likes', {'likes': 0}))
+
+        await sync_to_async(self.comment_and_like)()
+        comment = await self.read(chunks)
+        self.assertTrue(comment.startswith('event: comment\n'))
+        self.assertEqual(json.loads(comment.split('data: ', 1)[1])['content'], 'زنده')
+        self.assertEqual(await self.read(chunks), events.format_event('likes', {'likes': 1}))
+
+        response.close()
+        self.assertEqual(events.get_broker().subscriber_count(self.post.pk), 0)
+
+    @override_settings(POST_EVENTS={'KEEPALIVE': 0.01})
+    async def test_keepalive(self):
+        response = await self.async_client.get(self.url)
+        chunks = aiter(response.streaming_content)
+        await self.read(chunks)
+        await self.read(chunks)
+        self.assertEqual(await self.read(chunks), ': keepalive\n\n')
+        response.close()
+
+    @override_settings(POST_EVENTS={'QUEUE_SIZE': 3})
+    async def test_backpressure(self):
+        broker = events.get_broker()
+        subscription = broker.subscribe(1)
+
+        # لایک‌ها ادغام می‌شوند و فقط یک جا در صف می‌گیرند
+        for likes in range(10):
+            broker.publish(1, events.format_event('likes', {'likes': likes}), key='likes')
+        broker.publish(1, 'comment')
+        await asyncio.sleep(0)
+        self.assertEqual(subscription.queue.qsize(), 2)
+        self.assertEqual(await subscription.get(), events.format_event('likes', {'likes': 9}))
+        self.assertEqual(await subscription.get(), 'comment')
+
+        # مشترک کند: صف خالی و فقط reset می‌ماند
+        for _ in range(5):
+            broker.publish(1, 'comment')
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(subscription.queue.qsize(), 1)
+        self.assertEqual(await subscription.get(), events.format_event(events.RESET, {}))
+        broker.unsubscribe(1, subscription)
+
+    @override_settings(POST_EVENTS={'MAX_SUBSCRIBERS': 1})
+    async def test_max_subscribers(self):
+        first = await self.async_client.get(self.url)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        first.close()
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    async def test_missing_post(self):
+        response = await self.async_client.get('/api/posts/missing/events/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_wsgi(self):
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+
+class LikeBufferTests(TestCase):
+    """ ثبت لایک در log (LIKE_BUFFER) و نوشتن دسته‌ای با flush """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        cls.readers = [
+            CustomUser.objects.create_user(username=f'reader{i}', email=f'reader{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        cls.post = models.Post.objects.create(title='viral post', content='<p>text</p>', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_backend().reset()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(LIKE_BUFFER={'DIR': self.directory, 'BATCH_SIZE': 2})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def like(self, reader, action='toggle_like'):
+        self.client.force_login(reader)
+        response = self.client.post(f'/api/posts/{self.post.slug}/{action}/')
+        throttling.get_backend().reset()
+        return response.json()['message']
+
+    def assertLikes(self, expected):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, expected)
+        self.assertEqual(self.post.likes.count(), expected)
+
+    def test_submit_and_flush(self):
+        self.assertEqual(self.like(self.readers[0]), {'liked': True, 'like_count': 1})
+        # هنوز چیزی در دیتابیس نوشته نشده؛ toggle بعدی خواسته‌ی قبلی را می‌بیند
+        self.assertLikes(0)
+        self.assertEqual(self.like(self.readers[0]), {'liked': False, 'like_count': 0})
+        self.assertEqual(self.like(self.readers[0], 'like'), {'liked': True, 'like_count': 1})
+        self.assertEqual(self.like(self.readers[0], 'like'), {'liked': True, 'like_count': 1})
+        for reader in self.readers[1:]:
+            self.like(reader)
+
+        stats = like_buffer.flush()
+        self.assertEqual((stats['intents'], stats['pairs'], stats['posts']), (5, 3, 1))
+        self.assertLikes(3)
+        self.assertEqual(like_buffer.get_log().segments(), [])
+
+        self.assertEqual(self.like(self.readers[0], 'unlike'), {'liked': False, 'like_count': 2})
+        self.assertEqual(like_buffer.flush()['pairs'], 1)
+        self.assertLikes(2)
+        self.assertEqual(like_buffer.flush()['intents'], 0)
+
+    def test_crash_recovery(self):
+        log = like_buffer.get_log()
+        for reader in self.readers:
+            log.append(self.post.pk, reader.pk, True)
+        log.append(self.post.pk, self.readers[0].pk, False)
+        # خط نیمه‌کاره‌ی پردازه‌ای که هنگام نوشتن متوقف شده
+        with open(log.path, 'a', encoding='utf-8') as file:
+            file.write('{"post": ')
+
+        with mock.patch.object(like_buffer, 'apply', side_effect=RuntimeError('crash')):
+            with self.assertRaises(RuntimeError):
+                like_buffer.flush()
+        self.assertLikes(0)
+        self.assertEqual(len(log.segments()), 1)
+
+        # segment مانده همراه با خواسته‌های تازه‌تر اعمال می‌شود
+        log.append(self.post.pk, self.readers[1].pk, False)
+        stats = like_buffer.flush()
+        self.assertEqual((stats['segments'], stats['intents'], stats['pairs']), (2, 5, 3))
+        self.assertEqual(set(self.post.likes.values_list('pk', flat=True)), {self.readers[2].pk})
+        self.assertLikes(1)
+
+    def test_replay(self):
+        """ اعمال دوباره‌ی دسته‌ای که پیش از حذف segment کرش کرده، بی‌اثر است """
+        intents = {(self.post.pk, reader.pk): True for reader in self.readers}
+        like_buffer.apply(intents)
+        like_buffer.apply(intents)
+        self.assertLikes(3)
+
+    def test_command(self):
+        self.like(self.readers[0])
+        output = io.StringIO()
+        call_command('flush_like_buffer', stdout=output)
+        self.assertIn('1 خواسته', output.getvalue())
+        self.assertLikes(1)
+
+        with override_settings(LIKE_BUFFER={}), self.assertRaises(CommandError):
+            call_command('flush_like_buffer')
+
+    def test_requires_shared_cache(self):
+        """ خواسته‌های flush نشده در کش‌اند؛ با کش درون‌پردازه‌ای فعال نمی‌شود """
+        errors = like_buffer.check_like_buffer()
+        self.assertEqual([error.id for error in errors], ['like_buffer.E001'])
+        with self.assertRaises(CommandError):
+            call_command('flush_like_buffer', skip_checks=False, stdout=io.StringIO(), stderr=io.StringIO())
+
+        redis_cache = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/0'}}
+        with override_settings(CACHES=redis_cache):
+            self.assertEqual(like_buffer.check_like_buffer(), [])
+        with override_settings(LIKE_BUFFER={}):
+            self.assertEqual(like_buffer.check_like_buffer(), [])
+
+
+class LikeConcurrencyTests(TransactionTestCase):
+    """
+        blog.likes با threadهای هم‌زمان، هر کدام با اتصال خودش، روی فایل SQLite در
+        حالت WAL (DATABASES TEST NAME)
+    """
+    THREADS = 8
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+        self.users = [
+            CustomUser.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x')
+            for i in range(self.THREADS)
+        ]
+        self.post = models.Post.objects.create(title='post', content='<p>text</p>', author=self.author)
+
+    def run_threads(self, target, calls):
+        barrier = threading.Barrier(len(calls))
+        results, errors = [], []
+
+        def run(*args):
+            try:
+                barrier.wait()
+                results.append(target(*args))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=args) for args in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def assertLikes(self, expected):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, expected)
+        self.assertEqual(self.post.likes.count(), expected)
+
+    def test_wal(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_toggle_same_user(self):
+        results = self.run_threads(likes.toggle, [(self.post.pk, self.users[0].pk)] * self.THREADS)
+        # هر toggle وضعیت قبلی را برعکس می‌کند، پس نیمی لایک و نیمی برداشتن لایک است
+        self.assertEqual(sorted(liked for liked, _, _ in results), [False] * 4 + [True] * 4)
+        self.assertTrue(all(changed for _, _, changed in results))
+        self.assertEqual(sorted(count for _, count, _ in results), [0] * 4 + [1] * 4)
+        self.assertLikes(0)
+
+    def test_like_same_user(self):
+        results = self.run_threads(likes.like, [(self.post.pk, self.users[0].pk)] * self.THREADS)
+        self.assertTrue(all(liked for liked, _, _ in results))
+        self.assertEqual(sum(changed for _, _, changed in results), 1)
+        self.assertLikes(1)
+
+        results = self.run_threads(likes.unlike, [(self.post.pk, self.users[0].pk)] * self.THREADS)
+        self.assertFalse(any(liked for liked, _, _ in results))
+        self.assertEqual(sum(changed for _, _, changed in results), 1)
+        self.assertLikes(0)
+
+    def test_many_users(self):
+        results = self.run_threads(likes.toggle, [(self.post.pk, user.pk) for user in self.users])
+        # شمارش در همان تراکنش برگردانده می‌شود؛ هر مقدار ۱ تا ۸ دقیقا یک بار
+        self.assertEqual(sorted(count for _, count, _ in results), list(range(1, self.THREADS + 1)))
+        self.assertLikes(self.THREADS)
+
+        self.run_threads(likes.unlike, [(self.post.pk, user.pk) for user in self.users[::2]])
+        self.assertLikes(self.THREADS // 2)
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from . import models
+
+TEMP_DIR = 'upload_sessions'
+BLOCK_SIZE = 64 * 1024
+CHUNK_MAX_SIZE = 8 * 1024 * 1024
+MAX_SIZE = 1024 * 1024 * 1024
+SESSION_MAX_AGE = timedelta(hours=24)
+
+
+class OffsetMismatch(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'offset با بایت‌های دریافت شده برابر نیست.'
+    default_code = 'offset_mismatch'
+
+
+class SessionFile(File):
+    """ FileSystemStorage فایل دارای temporary_file_path را به جای کپی، جابه‌جا (rename) می‌کند """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def temp_dir():
+    return Path(settings.MEDIA_ROOT) / TEMP_DIR
+
+
+def temp_path(session):
+    return temp_dir() / f'{session.pk}.part'
+
+
+def max_size():
+    return getattr(settings, 'MEDIA_UPLOAD_MAX_SIZE', MAX_SIZE)
+
+
+def chunk_max_size():
+    return getattr(settings, 'MEDIA_UPLOAD_CHUNK_MAX_SIZE', CHUNK_MAX_SIZE)
+
+
+def start(author, filename, size, checksum):
+    session = models.UploadSession.objects.create(
+        author=author,
+        filename=filename,
+        size=size,
+        checksum=checksum.lower(),
+    )
+    path = temp_path(session)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return session
+
+
+def chunk_path(session):
+    return temp_dir() / f'{session.pk}.{uuid4().hex}.chunk'
+
+
+def append(session, offset, stream, length):
+    """
+        حداکثر length بایت از stream را در offset می‌نویسد و offset جدید را برمی‌گرداند.
+        حافظه‌ی مصرفی به اندازه‌ی BLOCK_SIZE است. اگر اتصال وسط تکه قطع شود، همان
+        بایت‌های رسیده ثبت می‌شوند و کلاینت از offset برگردانده شده ادامه می‌دهد.
+    """
+    if offset != session.offset:
+        raise OffsetMismatch({'offset': session.offset})
+    if length > chunk_max_size():
+        raise ValidationError({'chunk': f'حجم هر تکه حداکثر {chunk_max_size()} بایت است.'})
+    if offset + length > session.size:
+        raise ValidationError({'chunk': 'تکه از حجم اعلام شده‌ی فایل بیشتر است.'})
+
+    # تکه اول جدا دریافت می‌شود تا قفل نشست در مدت خواندن از کلاینت کند گرفته نماند
+    path = chunk_path(session)
+    written = 0
+    try:
+        with open(path, 'wb') as chunk:
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                chunk.write(block)
+                written += len(block)
+
+        # نوشتن تکه‌های یک نشست پشت سر هم است: اولین دستور تراکنش UPDATE ی شرطی
+        # offset است که ردیف نشست (و در SQLite قفل نوشتن) را تا commit نگه می‌دارد؛
+        # درخواست همزمان با همان offset پس از آن ردیفی پیدا نمی‌کند و فایل دست نمی‌خورد.
+        # اگر نوشتن فایل شکست بخورد، offset با rollback برمی‌گردد
+        with transaction.atomic():
+            updated = models.UploadSession.objects.filter(pk=session.pk, offset=offset).update(
+                offset=offset + written,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                offset_now = models.UploadSession.objects.filter(pk=session.pk).values_list('offset', flat=True).first()
+                if offset_now is None:
+                    raise NotFound
+                session.offset = offset_now
+                raise OffsetMismatch({'offset': offset_now})
+
+            with open(temp_path(session), 'r+b') as file, open(path, 'rb') as chunk:
+                file.seek(offset)
+                # بایت‌های یک تلاش ناتمام قبلی بعد از offset دور ریخته می‌شوند
+                file.truncate()
+                shutil.copyfileobj(chunk, file, BLOCK_SIZE)
+    finally:
+        path.unlink(missing_ok=True)
+
+    session.offset = offset + written
+    return session.offset
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while block := file.read(BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete(session):
+    """
+        فایل کامل را با checksum بررسی و به یک Media تبدیل می‌کند. اگر checksum
+        برابر نباشد، فایل موقت خالی و offset صفر می‌شود تا کلاینت از ابتدا بفرستد.
+    """
+    if session.offset != session.size:
+        raise ValidationError({'offset': f'{session.offset} از {session.size} بایت دریافت شده است.'})
+
+    path = temp_path(session)
+    if file_checksum(path) != session.checksum:
+        reset(session)
+        raise ValidationError({'checksum': 'checksum فایل دریافت شده برابر نیست.', 'offset': session.offset})
+
+    with transaction.atomic():
+        # حذف ردیف نشست، آن را برای این درخواست برمی‌دارد؛ complete همزمان چیزی پیدا نمی‌کند
+        deleted, _ = models.UploadSession.objects.filter(pk=session.pk).delete()
+        if not deleted:
+            raise NotFound
+        with open(path, 'rb') as file:
+            session_file = SessionFile(file, name=session.filename)
+            # هش همین حالا بررسی شد؛ blobs.store دوباره آن را حساب نمی‌کند
+            session_file.sha256 = session.checksum
+            media = models.Media.objects.create(author=session.author, file=session_file)
+
+    path.unlink(missing_ok=True)
+    return media
+
+
+def reset(session):
+    """ دریافت از ابتدا؛ نشست و شناسه‌اش برای کلاینت باقی می‌مانند """
+    with transaction.atomic():
+        # مانند append، UPDATE ی شرطی قفل ردیف را پیش از دست زدن به فایل می‌گیرد
+        updated = models.UploadSession.objects.filter(pk=session.pk, offset=session.offset).update(
+            offset=0,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            # تکه‌ی همزمانی نوشته شده یا نشست حذف شده است
+            session.offset = models.UploadSession.objects.filter(
+                pk=session.pk
+            ).values_list('offset', flat=True).first() or 0
+            return
+        with open(temp_path(session), 'r+b') as file:
+            file.truncate(0)
+    session.offset = 0
+
+
+def discard(session):
+    path = temp_path(session)
+    session.delete()
+    path.unlink(missing_ok=True)
+
+
+def cleanup(max_age=SESSION_MAX_AGE):
+    """
+        نشست‌هایی که max_age تکه‌ای نگرفته‌اند و فایل‌های موقت بدون نشست را حذف می‌کند.
+    """
+    expired = models.UploadSession.objects.filter(updated_at__lt=timezone.now() - max_age)
+    removed = 0
+    for session in expired.iterator():
+        discard(session)
+        removed += 1
+
+    directory = temp_dir()
+    if directory.is_dir():
+        active = {str(pk) for pk in models.UploadSession.objects.values_list('pk', flat=True)}
+        cutoff = (timezone.now() - max_age).timestamp()
+        for path in directory.glob('*.part'):
+            # فایل تازه‌ای که نشستش هنوز commit نشده حذف نمی‌شود
+            if path.stem not in active and os.stat(path).st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        # تکه‌ی دریافتی پردازه‌ای که پیش از نوشتن در فایل نشست متوقف شده
+        for path in directory.glob('*.chunk'):
+            if os.stat(path).st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+    return removed
@@ -1,5 +1,5 @@
-from django.urls import path
-from rest_framework_nested.routers import NestedDefaultRouter, DefaultRouter
+from django.urls import include, path
+from rest_framework_nested.routers import NestedDefaultRouter, DefaultRouter, NestedSimpleRouter, SimpleRouter
 from . import views
 
 router = DefaultRouter()
@@ -11,7 +11,18 @@ router.register('tags', views.TagsViewSet, basename='tags')
 nested_router = NestedDefaultRouter(router, 'posts', lookup='post')
 nested_router.register('comment', views.CommentViewSet, basename='comment')
 
+# نسخه‌ی غیرهمگام endpointهای پرخواندنی برای ASGI؛ مسیرهای همگام بالا دست نخورده‌اند
+async_router = SimpleRouter()
+async_router.register('posts', views.AsyncPostsViewSet, basename='async-posts')
+async_router.register('tags', views.AsyncTagsViewSet, basename='async-tags')
+
+async_nested_router = NestedSimpleRouter(async_router, 'posts', lookup='post')
+async_nested_router.register('comment', views.AsyncCommentViewSet, basename='async-comment')
+
 urlpatterns = [
     *router.urls,
     *nested_router.urls,
-]
\ No newline at end of file
+    path('media/<path:path>', views.media, name='media'),
+    path('posts/<str:slug>/events/', views.post_events, name='post-events'),
+    path('async/', include([*async_router.urls, *async_nested_router.urls])),
+]
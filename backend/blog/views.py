@@ -1,27 +1,47 @@
-from django.http import HttpResponse
-from rest_framework import viewsets, mixins
+from pathlib import Path
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework import viewsets, mixins, status
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, BasePermission, SAFE_METHODS
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.filters import OrderingFilter as DefaultOrderingFilter
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.throttling import ScopedRateThrottle
 
-from django.db.models import Q, Count, Prefetch, Exists, OuterRef
+from asgiref.sync import sync_to_async
+from django.db.models import Q, Prefetch, Exists, OuterRef
+from django.shortcuts import aget_object_or_404
 from django.utils.functional import cached_property
 
 from django_filters.rest_framework import DjangoFilterBackend, BooleanFilter
 from django_filters.rest_framework import FilterSet, CharFilter, OrderingFilter
 
+from . import blobs
+from . import caching
+from . import delivery
+from . import events
+from . import like_buffer
+from . import likes
 from . import models
+from . import search
 from . import serializer
+from . import uploads
+from .pagination import AsyncPageNumberPagination, FeedPagination
+from config import images
+from config.async_views import AsyncGenericViewSet, AsyncListModelMixin
+from config.query_budget import QueryBudgetMixin, query_budget
+from config.throttling import ThrottleScopeMixin
 from config.utils import format_response
 
 
 class PostFilterSet(FilterSet):
     title = CharFilter(field_name='title', lookup_expr='icontains')
     content = CharFilter(field_name='content', lookup_expr='icontains')
+    search = CharFilter(method='filter_search', help_text='جستجو در عنوان و محتوا، مرتب شده بر اساس میزان تطابق')
     author = CharFilter(field_name='author__username', lookup_expr='iexact')
     tags = CharFilter(method='filter_tags', help_text='فیلتر چند تگ با جدا کننده به صورت bad,good')
 
@@ -29,7 +49,7 @@ class PostFilterSet(FilterSet):
         fields=(
             ('created_at', 'created_at'),
             ('updated_at', 'updated_at'),
-            ('likes', 'likes'),
+            ('likes_count', 'likes'),
         )
     )
 
@@ -38,9 +58,31 @@ class PostFilterSet(FilterSet):
         queryset = queryset.filter(tags__name__in=values).distinct()
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        return search.search_posts(queryset, value)
+
     class Meta:
         model = models.Post
-        fields = ('title', 'content', 'author', 'tags', 'ordering', 'status')
+        fields = ('title', 'content', 'search', 'author', 'tags', 'ordering', 'status')
+
+
+def liked_slugs(user, data):
+    """ slug پست‌هایی از صفحه‌ی کش شده‌ی فید که user لایک کرده """
+    return models.Post.likes.through.objects.filter(
+        customuser_id=user.id,
+        post__slug__in=[post['slug'] for post in data['results']]
+    ).values_list('post__slug', flat=True)
+
+
+def liked_post(user, slug):
+    return models.Post.likes.through.objects.filter(post__slug=slug, customuser_id=user.id)
+
+
+def with_liked(data, liked):
+    return {
+        **data,
+        'results': [{**post, 'you_liked': post['slug'] in liked} for post in data['results']]
+    }
 
 
 class AuthorOrReadOnlyPermission(BasePermission):
@@ -53,43 +95,51 @@ class AuthorOrReadOnlyPermission(BasePermission):
     def has_object_permission(self, request, view, obj):
         return bool(
             request.method in SAFE_METHODS or
-            obj.author == request.user
+            # author_id، بدون کوئری برای خواندن نویسنده
+            obj.author_id == request.user.id
         )
 
 
-class PostsViewSet(viewsets.ModelViewSet):
+class PostsViewSet(ThrottleScopeMixin, QueryBudgetMixin, viewsets.ModelViewSet):
     permission_classes = [AuthorOrReadOnlyPermission]
     lookup_field = 'slug'
     filter_backends = [DjangoFilterBackend]
     filterset_class = PostFilterSet
-    pagination_class = PageNumberPagination
-    throttle_classes = [ScopedRateThrottle]
-
-    @property
-    def throttle_scope(self):
-        if self.action == 'create':
-            return 'posts-create'
-        elif self.action == 'list':
-            return 'posts-list'
-        elif self.action == 'retrieve':
-            return 'posts-retrieve'
-        elif self.action == 'update':
-            return 'posts-update'
-        elif self.action == 'me':
-            return 'posts-me'
-        elif self.action == 'me_likes':
-            return 'posts-me-likes'
-        elif self.action == 'me_comments':
-            return 'posts-me-comments'
-        elif self.action == 'toggle_like':
-            return 'posts-toggle-like'
+    pagination_class = FeedPagination
+    throttle_scopes = {
+        'create': 'posts-create',
+        'list': 'posts-list',
+        'retrieve': 'posts-retrieve',
+        'update': 'posts-update',
+        'partial_update': 'posts-update',
+        'destroy': 'posts-update',
+        'me': 'posts-me',
+        'me_likes': 'posts-me-likes',
+        'me_comments': 'posts-me-comments',
+        'toggle_like': 'posts-toggle-like',
+        'like': 'posts-toggle-like',
+        'unlike': 'posts-toggle-like',
+    }
+    query_budgets = {
+        'list': 5,
+        'retrieve': 4,
+        'create': 16,
+        'update': 15,
+        'partial_update': 15,
+        'destroy': 10,
+        'me': 5,
+        'me_likes': 5,
+        'me_comments': 4,
+        'toggle_like': 8,
+        'like': 7,
+        'unlike': 7,
+    }
 
     def get_queryset(self):
         queryset = models.Post.objects
 
         if self.action == 'list':
             queryset = queryset.annotate(
-                likes_count=Count('likes'),
                 liked_by_me=Exists(
                     models.Post.likes.through.objects.filter(
                         post_id=OuterRef('pk'),
@@ -105,14 +155,16 @@ class PostsViewSet(viewsets.ModelViewSet):
                 'author__first_name',
                 'author__last_name',
                 'author__profile_pic',
+                'author__profile_pic_variants',
+                'author__profile_pic_version',
                 'title', 'slug',
                 'created_at', 'updated_at',
-                'status'
+                'status', 'likes_count',
+                'excerpt', 'word_count', 'reading_time'
             )
 
         if self.action == 'retrieve':
             queryset = queryset.annotate(
-                likes_count=Count('likes'),
                 liked_by_me=Exists(
                     models.Post.likes.through.objects.filter(
                         post_id=OuterRef('pk'),
@@ -128,22 +180,22 @@ class PostsViewSet(viewsets.ModelViewSet):
                 'author__first_name',
                 'author__last_name',
                 'author__profile_pic',
+                'author__profile_pic_variants',
+                'author__profile_pic_version',
                 'title', 'slug',
                 'created_at', 'updated_at',
-                'status'
+                'status', 'likes_count',
+                'excerpt', 'word_count', 'reading_time', 'content'
             )
 
-        if self.action in ['create', 'update']:
+        if self.action in ['create', 'update', 'partial_update']:
             queryset = queryset.filter(status=True).only(
                 'title', 'slug',
-                'created_at', 'updated_at', 'content', 'status'
+                'created_at', 'updated_at', 'content', 'content_hash', 'status'
             )
 
         if self.action == 'me':
-            queryset = queryset.annotate(
-                likes_count=Count('likes')
-            ) \
-                .select_related('author') \
+            queryset = queryset.select_related('author') \
                 .prefetch_related(
                 Prefetch('tags', to_attr='prefetched_tags')
             ).filter(Q(author=self.request.user)).only(
@@ -151,16 +203,16 @@ class PostsViewSet(viewsets.ModelViewSet):
                 'author__first_name',
                 'author__last_name',
                 'author__profile_pic',
+                'author__profile_pic_variants',
+                'author__profile_pic_version',
                 'title', 'slug',
                 'created_at', 'updated_at',
-                'status'
+                'status', 'likes_count',
+                'excerpt', 'word_count', 'reading_time'
             )
 
         if self.action == 'me_likes':
-            queryset = queryset.annotate(
-                likes_count=Count('likes')
-            ) \
-                .select_related('author') \
+            queryset = queryset.select_related('author') \
                 .prefetch_related(
                 Prefetch('tags', to_attr='prefetched_tags')
             ).filter(Q(likes=self.request.user)).only(
@@ -168,9 +220,12 @@ class PostsViewSet(viewsets.ModelViewSet):
                 'author__first_name',
                 'author__last_name',
                 'author__profile_pic',
+                'author__profile_pic_variants',
+                'author__profile_pic_version',
                 'title', 'slug',
                 'created_at', 'updated_at',
-                'status'
+                'status', 'likes_count',
+                'excerpt', 'word_count', 'reading_time'
             )
 
 
@@ -184,7 +239,7 @@ class PostsViewSet(viewsets.ModelViewSet):
         if self.action in ['retrieve']:
             return serializer.PostRetrieveSerializer
 
-        if self.action in ['create', 'update']:
+        if self.action in ['create', 'update', 'partial_update']:
             return serializer.PostCreateUpdateSerializer
 
         if self.action in ['me', 'me_likes']:
@@ -198,6 +253,37 @@ class PostsViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        data, key = caching.get_feed_page(request, self.filterset_class)
+
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            caching.set_feed_page(key, with_liked(response.data, liked=()))
+            return response
+
+        if request.user.is_authenticated:
+            liked = set(liked_slugs(request.user, data))
+            data = with_liked(data, liked)
+
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        slug = kwargs[self.lookup_field]
+        data, version = caching.get_post_detail(slug, request)
+
+        if data is None:
+            instance = self.get_object()
+            data = dict(self.get_serializer(instance).data)
+            you_liked = data.pop('you_liked')
+
+            # پیش‌نویس‌ها فقط برای نویسنده قابل مشاهده هستند و کش نمی‌شوند
+            if instance.status:
+                caching.set_post_detail(slug, version, request, data)
+        else:
+            you_liked = request.user.is_authenticated and liked_post(request.user, slug).exists()
+
+        return Response({**data, 'you_liked': you_liked})
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
         """
@@ -244,53 +330,84 @@ class PostsViewSet(viewsets.ModelViewSet):
 
         return self.get_paginated_response(data)
 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
-    def toggle_like(self, request, slug=None):
-        user = request.user
-        post = get_object_or_404(
-            models.Post,
-            slug=slug
-        )
+    def change_like(self, slug, operation):
+        post = get_object_or_404(models.Post.objects.only('pk', 'slug', 'author_id'), slug=slug)
 
-        if post.author_id == user.id:
+        if post.author_id == self.request.user.id:
             return Response(format_response(
                 success=False,
                 message='روی پست خود نمی‌توانید درخواست انجام دهید'
             ))
 
-        liked = post.likes.filter(id=user.id).exists()
-
-        if liked:
-            post.likes.remove(user)
+        if like_buffer.is_enabled():
+            # ثبت در log؛ کش‌ها پس از نوشتن در دیتابیس با flush_like_buffer باطل می‌شوند
+            liked, like_count, changed = like_buffer.submit(post.pk, self.request.user.id, operation)
         else:
-            post.likes.add(user)
+            liked, like_count, changed = getattr(likes, operation)(post.pk, self.request.user.id)
+            if changed:
+                caching.invalidate_post_detail(post.slug)
+                caching.invalidate_feed()
 
-        like_count = post.likes.count()
+        if changed:
+            events.publish_likes(post.pk, like_count)
 
         return Response(format_response(
             success=True,
             message={
-                'liked': not liked,
+                'liked': liked,
                 'like_count': like_count,
             }
         ))
 
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def toggle_like(self, request, slug=None):
+        return self.change_like(slug, 'toggle')
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def like(self, request, slug=None):
+        """
+            لایک پست؛ تکرار آن تغییری نمی‌دهد
+        """
+        return self.change_like(slug, 'like')
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def unlike(self, request, slug=None):
+        """
+            برداشتن لایک پست؛ تکرار آن تغییری نمی‌دهد
+        """
+        return self.change_like(slug, 'unlike')
+
 
-class MediaViewSet(viewsets.ModelViewSet):
+class MediaViewSet(ThrottleScopeMixin, QueryBudgetMixin, viewsets.ModelViewSet):
     serializer_class = serializer.MediaSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
-
-    @property
-    def throttle_scope(self):
-        if self.action == 'create':
-            return 'media-create'
-        elif self.action == 'list':
-            return 'media-list'
-        elif self.action == 'retrieve':
-            return 'media-retrieve'
-        elif self.action == 'update':
-            return 'media-update'
+    throttle_scopes = {
+        'create': 'media-create',
+        'list': 'media-list',
+        'retrieve': 'media-retrieve',
+        'update': 'media-update',
+        'partial_update': 'media-update',
+        'destroy': 'media-update',
+        'upload_start': 'media-upload',
+        'upload': 'media-upload',
+        'upload_complete': 'media-upload',
+    }
+    query_budgets = {
+        'list': 3,
+        'retrieve': 3,
+        'create': 9,
+        'update': 11,
+        'partial_update': 11,
+        'destroy': 7,
+        'upload_start': 3,
+        'upload': {'GET': 3, '*': 6},
+        'upload_complete': 14,
+    }
+
+    def initialize_request(self, request, *args, **kwargs):
+        # sha256 فایل هنگام دریافت حساب می‌شود (blobs.store)
+        request.upload_handlers = blobs.upload_handlers(request)
+        return super().initialize_request(request, *args, **kwargs)
 
     def get_queryset(self):
         queryset = models.Media.objects.filter(author=self.request.user)
@@ -299,34 +416,86 @@ class MediaViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def get_upload_session(self, upload_id):
+        return get_object_or_404(models.UploadSession, pk=upload_id, author=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='uploads')
+    def upload_start(self, request):
+        """
+            شروع آپلود تکه‌تکه با filename، size و checksum (SHA-256)
+        """
+        upload_serializer = serializer.UploadSessionSerializer(data=request.data, context=self.get_serializer_context())
+        upload_serializer.is_valid(raise_exception=True)
+        upload_serializer.save(author=request.user)
+        return Response(upload_serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get', 'put', 'delete'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]{36})')
+    def upload(self, request, upload_id=None):
+        """
+            PUT: بدنه‌ی خام یک تکه با هدر Upload-Offset؛ GET: offset فعلی برای ادامه؛ DELETE: لغو
+        """
+        session = self.get_upload_session(upload_id)
+
+        if request.method == 'DELETE':
+            uploads.discard(session)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'PUT':
+            try:
+                offset = int(request.headers['Upload-Offset'])
+                length = int(request.headers.get('Content-Length') or 0)
+            except (KeyError, ValueError):
+                raise ValidationError({'Upload-Offset': 'هدر Upload-Offset لازم است.'})
+            # بدنه مستقیم از stream خوانده می‌شود و در حافظه parse نمی‌شود
+            uploads.append(session, offset, request.stream, length)
+
+        data = serializer.UploadSessionSerializer(session, context=self.get_serializer_context()).data
+        return Response(data, headers={'Upload-Offset': str(session.offset)})
 
-class TagsViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    @action(detail=False, methods=['post'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]{36})/complete')
+    def upload_complete(self, request, upload_id=None):
+        session = self.get_upload_session(upload_id)
+        media_obj = uploads.complete(session)
+        data = self.get_serializer(media_obj).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class TagsViewSet(QueryBudgetMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = serializer.TagsSerializer
     pagination_class = PageNumberPagination
     filter_backends = [DefaultOrderingFilter]
     ordering_fields = ['posts_count']
+    query_budgets = {
+        'list': 4,
+    }
 
     def get_queryset(self):
-        queryset = models.Tag.objects.annotate(
-            posts_count=Count('posts', filter=Q(posts__status=True)),
-        )
+        queryset = models.Tag.objects.only('name', 'posts_count').order_by('-posts_count', 'pk')
         return queryset
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ThrottleScopeMixin, QueryBudgetMixin, viewsets.ModelViewSet):
     serializer_class = serializer.CommentSerializer
     permission_classes = [AuthorOrReadOnlyPermission]
     filter_backends = [DefaultOrderingFilter]
     ordering_fields = ('created_at', 'updated_at')
-    pagination_class = PageNumberPagination
-    throttle_classes = [ScopedRateThrottle]
-
-    @property
-    def throttle_scope(self):
-        if self.action == 'create':
-            return 'comment-create'
-        elif self.action == 'update':
-            return 'comment-update'
+    pagination_class = FeedPagination
+    throttle_scopes = {
+        'list': 'comment-list',
+        'retrieve': 'comment-list',
+        'create': 'comment-create',
+        'update': 'comment-update',
+        'partial_update': 'comment-update',
+        'destroy': 'comment-update',
+    }
+    query_budgets = {
+        'list': 5,
+        'retrieve': 4,
+        'create': 4,
+        'update': 6,
+        'partial_update': 6,
+        'destroy': 6,
+    }
 
     @cached_property
     def post_obj(self):
@@ -341,13 +510,161 @@ class CommentViewSet(viewsets.ModelViewSet):
         return queryset
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, post=self.post_obj)
+        comment = serializer.save(author=self.request.user, post=self.post_obj)
+        events.publish_comment(comment, serializer.data)
+
+
+class AsyncPostsViewSet(ThrottleScopeMixin, QueryBudgetMixin, AsyncGenericViewSet):
+    """
+        list و retrieve ی PostsViewSet برای ASGI (مسیرهای api/async/)؛ کوئری‌ست،
+        serializer، کش و خروجی همان ویوی همگام است.
+    """
+    permission_classes = [AuthorOrReadOnlyPermission]
+    lookup_field = 'slug'
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = PostFilterSet
+    pagination_class = FeedPagination
+    throttle_scopes = {
+        'list': 'posts-list',
+        'retrieve': 'posts-retrieve',
+    }
+    query_budgets = {
+        'list': 5,
+        'retrieve': 4,
+    }
+
+    get_queryset = PostsViewSet.get_queryset
+    get_serializer_class = PostsViewSet.get_serializer_class
+
+    async def list(self, request, *args, **kwargs):
+        data, key = await sync_to_async(caching.get_feed_page)(request, self.filterset_class)
+
+        if data is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            page = await self.apaginate_queryset(queryset)
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+            await sync_to_async(caching.set_feed_page)(key, with_liked(response.data, liked=()))
+            return response
+
+        if request.user.is_authenticated:
+            liked = {slug async for slug in liked_slugs(request.user, data)}
+            data = with_liked(data, liked)
+
+        return Response(data)
+
+    async def retrieve(self, request, *args, **kwargs):
+        slug = kwargs[self.lookup_field]
+        data, version = await sync_to_async(caching.get_post_detail)(slug, request)
+
+        if data is None:
+            instance = await self.aget_object()
+            data = dict(self.get_serializer(instance).data)
+            you_liked = data.pop('you_liked')
+
+            if instance.status:
+                await sync_to_async(caching.set_post_detail)(slug, version, request, data)
+        else:
+            you_liked = request.user.is_authenticated and await liked_post(request.user, slug).aexists()
+
+        return Response({**data, 'you_liked': you_liked})
+
+
+class AsyncTagsViewSet(QueryBudgetMixin, AsyncListModelMixin, AsyncGenericViewSet):
+    serializer_class = serializer.TagsSerializer
+    pagination_class = AsyncPageNumberPagination
+    filter_backends = [DefaultOrderingFilter]
+    ordering_fields = ['posts_count']
+    query_budgets = {
+        'list': 4,
+    }
+
+    get_queryset = TagsViewSet.get_queryset
 
 
-@api_view(['GET'])
+class AsyncCommentViewSet(ThrottleScopeMixin, QueryBudgetMixin, AsyncListModelMixin, AsyncGenericViewSet):
+    serializer_class = serializer.CommentSerializer
+    permission_classes = [AuthorOrReadOnlyPermission]
+    filter_backends = [DefaultOrderingFilter]
+    ordering_fields = ('created_at', 'updated_at')
+    pagination_class = FeedPagination
+    throttle_scopes = {
+        'list': 'comment-list',
+    }
+    query_budgets = {
+        'list': 5,
+    }
+
+    get_queryset = CommentViewSet.get_queryset
+
+    async def list(self, request, *args, **kwargs):
+        # post_obj در CommentViewSet یک cached_property همگام است
+        self.post_obj = await aget_object_or_404(models.Post.objects.only('pk'), slug=kwargs['post_slug'])
+        return await super().list(request, *args, **kwargs)
+
+
+@query_budget(3)
+@api_view(['GET', 'HEAD'])
+@permission_classes([IsAuthenticated])
 def media(request, path):
-    print(path)
-    response = HttpResponse()
-    response['Content-Type'] = ''
-    response['X-Accel-Redirect'] = f'/private_media/{path}'
+    """
+        ارسال فایل رسانه فقط برای نویسنده‌ی آن (یا کاربر staff)
+    """
+    media_root = Path(settings.MEDIA_ROOT).resolve()
+    file_path = (media_root / path).resolve()
+    if not file_path.is_relative_to(media_root) or not file_path.is_file():
+        raise Http404
+
+    # نسخه‌های کوچک‌شده هم دسترسی فایل اصلی را دارند؛ فایل یک blob ممکن است
+    # به چند Media از چند کاربر تعلق داشته باشد
+    owners = models.Media.objects.filter(file=images.original_name(path))
+    if not request.user.is_staff:
+        owners = owners.filter(author=request.user)
+    if not owners.exists():
+        raise Http404
+
+    return delivery.get_backend().serve(request, path, file_path)
+
+
+@query_budget(2)
+async def post_events(request, slug):
+    """
+        SSE برای یک پست منتشر شده: رویداد comment (دیدگاه تازه با خروجی CommentSerializer)
+        و likes (تعداد لایک، ابتدا مقدار فعلی). فقط زیر ASGI (config.asgi)؛ WSGI بدنه‌ی
+        بی‌پایان را تا انتها بافر می‌کند.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(format_response(
+            success=False,
+            message='این endpoint فقط روی سرور ASGI در دسترس است.'
+        ), status=501)
+
+    post_id = await models.Post.objects.filter(slug=slug, status=True).values_list('pk', flat=True).afirst()
+    if post_id is None:
+        return JsonResponse(format_response(success=False, message='پست یافت نشد.'), status=404)
+
+    broker = events.get_broker()
+    subscription = broker.subscribe(post_id)
+    if subscription is None:
+        response = JsonResponse(format_response(
+            success=False,
+            message='تعداد اتصال‌های این پست به حداکثر رسیده است.'
+        ), status=503)
+        response['Retry-After'] = str(events.get_config()['RETRY'] // 1000)
+        return response
+
+    try:
+        # تعداد لایک بعد از اشتراک خوانده می‌شود تا تغییری در این فاصله گم نشود
+        likes = await models.Post.objects.filter(pk=post_id).values_list('likes_count', flat=True).afirst()
+    except BaseException:
+        # قطع اتصال پیش از ساخته شدن پاسخ
+        broker.unsubscribe(post_id, subscription)
+        raise
+
+    response = StreamingHttpResponse(
+        events.EventStream(broker, post_id, subscription, [events.format_event('likes', {'likes': likes or 0})]),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # nginx پاسخ را بافر نکند
+    response['X-Accel-Buffering'] = 'no'
     return response
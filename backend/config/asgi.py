@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+The async read endpoints (api/async/) and the SSE stream
+(api/posts/<slug>/events/) need an ASGI server, e.g.
+``uvicorn config.asgi:application``. Events are fanned out in-process, so
+writes must reach the same process as the stream to be pushed.
 """
 
 import os
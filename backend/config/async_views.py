@@ -0,0 +1,82 @@
+import inspect
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from rest_framework import viewsets
+from rest_framework.response import Response
+
+
+class AsyncGenericViewSet(viewsets.GenericViewSet):
+    """
+        GenericViewSet با dispatch غیرهمگام؛ زیر ASGI درخواست در event loop می‌ماند
+        و فقط کارهای همگام (ORM غیرهمگام، کش، initial) کوتاه به thread می‌روند.
+        actionها coroutine هستند و داده را با aget/acount/aiterator می‌خوانند؛ serializer
+        روی ردیف‌های از پیش خوانده شده اجرا می‌شود و اگر کوئری بزند، Django
+        SynchronousOnlyOperation می‌دهد. زیر WSGI هم با async_to_sync کار می‌کند.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        # view ی ViewSetMixin تابعی همگام است که coroutine ی dispatch را برمی‌گرداند
+        return markcoroutinefunction(super().as_view(actions, **initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        # SessionAuthentication کاربر را از request._request.user می‌خواند؛ بدون این
+        # کار، SimpleLazyObject ی AuthenticationMiddleware همگام به دیتابیس می‌رود
+        request.user = await request.auser()
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # احراز هویت، دسترسی و محدودیت نرخ (backend ممکن است redis همگام باشد)
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        # مثل rest_framework.generics.get_object_or_404
+        try:
+            obj = await aget_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+
+class AsyncListModelMixin:
+    async def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(serializer.data)
+
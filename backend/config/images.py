@@ -0,0 +1,170 @@
+import os
+import re
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+WIDTHS = {
+    'profile_pic': (64, 128, 256),
+    'media': (320, 640, 1280),
+}
+FORMATS = ('webp', 'jpeg')
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+QUALITY = 80
+
+VARIANT_RE = re.compile(r'\.w\d+\.(?:webp|jpg)$')
+
+
+def get_widths(kind):
+    return getattr(settings, 'IMAGE_VARIANT_WIDTHS', WIDTHS)[kind]
+
+
+def variant_name(name, width, fmt):
+    """ نسخه کنار فایل اصلی ذخیره می‌شود: photo.png -> photo.png.w320.webp """
+    return f'{name}.w{width}.{EXTENSIONS[fmt]}'
+
+
+def original_name(name):
+    return VARIANT_RE.sub('', name)
+
+
+def is_stale(file, variants):
+    """
+        نسخه‌ها باید دوباره ساخته شوند: فایل حذف یا تازه آپلود شده (هنوز commit نشده)،
+        یا نسخه‌ها مربوط به نام فایل دیگری هستند (FieldFile.save).
+    """
+    if not file:
+        return variants is not None
+    if not file._committed:
+        return True
+    return bool(variants) and not variants[0]['name'].startswith(f'{file.name}.w')
+
+
+def _setup():
+    # در start method از نوع spawn، پردازه‌ی فرزند django را از ابتدا بارگذاری می‌کند
+    from django.apps import apps
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+def generate_variants(name, widths, storage=None):
+    """
+        نسخه‌های کوچک‌تر از عرض تصویر را در قالب‌های FORMATS می‌سازد و فهرست
+        {name, width, height, format} آن‌ها را برمی‌گرداند. تصویر بزرگ‌تر نمی‌شود؛
+        اگر فایل تصویر نباشد فهرست خالی است. در process pool اجرا می‌شود و به
+        دیتابیس دسترسی ندارد.
+    """
+    _setup()
+    storage = storage or default_storage
+    formats = getattr(settings, 'IMAGE_VARIANT_FORMATS', FORMATS)
+    quality = getattr(settings, 'IMAGE_VARIANT_QUALITY', QUALITY)
+
+    try:
+        with storage.open(name, 'rb') as file:
+            image = Image.open(file)
+            widths = sorted(width for width in widths if width < image.width)
+            if not widths:
+                return []
+            # JPEG با draft در مقیاس کوچک‌تر decode می‌شود
+            image.draft('RGB', (widths[-1], widths[-1] * image.height // image.width))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        return []
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    variants = []
+    for width in widths:
+        height = max(round(image.height * width / image.width), 1)
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            output = resized if fmt != 'jpeg' or resized.mode == 'RGB' else resized.convert('RGB')
+            buffer = BytesIO()
+            output.save(buffer, format=fmt.upper(), quality=quality, optimize=True)
+
+            target = save_replacing(storage, variant_name(name, width, fmt), buffer.getvalue())
+            variants.append({'name': target, 'width': width, 'height': height, 'format': fmt})
+    return variants
+
+
+def write_atomic(full_path, chunks, permissions_mode=None):
+    """
+        فایل در یک نام موقت در همان پوشه نوشته، fsync و با os.replace به full_path
+        منتقل می‌شود. خواننده‌های همزمان یا فایل قبلی کامل را می‌بینند یا فایل
+        جدید کامل را؛ هیچ‌وقت فایل ناقص یا نبودن فایل.
+    """
+    directory = os.path.dirname(full_path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+        if permissions_mode is not None:
+            os.chmod(temp_path, permissions_mode)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    fsync_directory(directory)
+
+
+def fsync_directory(directory):
+    # ماندگاری خود rename؛ در ویندوز پوشه را نمی‌شود باز کرد
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_replacing(storage, name, data):
+    """
+        نام نسخه ثابت است و چند Media (یک blob) به آن اشاره می‌کنند؛ ساخت دوباره
+        فایل را سر جایش جایگزین می‌کند، نه با نام دیگر و حذف فایل قبلی.
+    """
+    try:
+        full_path = storage.path(name)
+    except NotImplementedError:
+        # storage غیر محلی: نوشتن یک شیء با همان نام آن را یک‌جا جایگزین می‌کند
+        if storage.exists(name):
+            storage.delete(name)
+        return storage.save(name, ContentFile(data))
+    write_atomic(full_path, [data], storage.file_permissions_mode)
+    return name
+
+
+def variant_urls(request, variants, storage=None, version=None):
+    """
+        خروجی serializer: آدرس هر نسخه با عرض و ارتفاعش، از کوچک به بزرگ.
+        version (اگر باشد) برای cache-busting به آدرس اضافه می‌شود.
+    """
+    storage = storage or default_storage
+    result = []
+    for variant in variants or ():
+        url = storage.url(variant['name'])
+        if version is not None:
+            url = f'{url}?v={version}'
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        result.append({
+            'url': url,
+            'width': variant['width'],
+            'height': variant['height'],
+            'format': variant['format'],
+        })
+    return result
@@ -0,0 +1,285 @@
+import json
+import math
+import os
+import random
+import re
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
+
+DEFAULTS = {
+    # کسری از درخواست‌ها که به تصادف نمونه‌برداری می‌شوند
+    'SAMPLE_RATE': 0.0,
+    # درخواست‌هایی که مسیرشان با یکی از این الگوها جور باشد همیشه نمونه‌برداری می‌شوند
+    'PATHS': (),
+    # درخواست دارای این هدر با مقدار TOKEN همیشه نمونه‌برداری می‌شود
+    'HEADER': 'X-Profile',
+    'TOKEN': None,
+    # هر پردازه در فایل JSONL خودش در این پوشه می‌نویسد (profile_stats آن‌ها را می‌خواند)؛
+    # بدون DIR هیچ درخواستی نمونه‌برداری نمی‌شود
+    'DIR': None,
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 3,
+}
+METRICS = ('total_ms', 'sql_count', 'sql_ms', 'serializer_ms')
+PERCENTILES = (50, 95, 99)
+
+_current = ContextVar('profile', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+class Profile:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+
+@contextmanager
+def wrap_connections(wrapper):
+    """ execute_wrapper روی همه‌ی اتصال‌های thread فعلی """
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+@asynccontextmanager
+async def awrap_connections(wrapper):
+    """
+        اتصال‌ها به thread وابسته‌اند و ORM غیرهمگام کوئری‌ها را با sync_to_async در
+        thread درخواست اجرا می‌کند؛ wrapper هم همان‌جا نصب و برداشته می‌شود.
+    """
+    stack = ExitStack()
+    await sync_to_async(stack.enter_context)(wrap_connections(wrapper))
+    try:
+        yield
+    finally:
+        await sync_to_async(stack.close)()
+
+
+class Recorder:
+    """
+        نمونه‌ها را به صورت JSONL در directory می‌نویسد. هر پردازه فایل خودش را دارد
+        تا چرخش فایل‌ها بین workerها تداخل نکند؛ وقتی فایل به MAX_BYTES برسد، به .1
+        و ... منتقل و قدیمی‌ترین فایل حذف می‌شود.
+    """
+
+    def __init__(self, directory, max_bytes=None, backup_count=0):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = Lock()
+
+    @property
+    def path(self):
+        return self.directory / f'profile-{os.getpid()}.jsonl'
+
+    def record(self, sample):
+        with self._lock:
+            self._write(json.dumps(sample, ensure_ascii=False) + '\n')
+
+    def _write(self, line):
+        path = self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.max_bytes and path.exists() and path.stat().st_size + len(line) > self.max_bytes:
+            self._rotate(path)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(line)
+
+    def _rotate(self, path):
+        for index in range(self.backup_count, 0, -1):
+            source = path.with_name(f'{path.name}.{index - 1}') if index > 1 else path
+            if source.exists():
+                os.replace(source, path.with_name(f'{path.name}.{index}'))
+        path.unlink(missing_ok=True)
+
+
+_recorder = None
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        config = get_config()
+        _recorder = Recorder(
+            config['DIR'],
+            max_bytes=config['MAX_BYTES'],
+            backup_count=config['BACKUP_COUNT'],
+        )
+    return _recorder
+
+
+@receiver(setting_changed)
+def reset_recorder(setting, **kwargs):
+    global _recorder
+    if setting == 'PROFILING':
+        _recorder = None
+
+
+def read_samples(directory):
+    """ همه‌ی نمونه‌های فایل‌های JSONL پوشه، از جمله فایل‌های چرخیده """
+    for path in sorted(Path(directory).glob('profile-*.jsonl*')):
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # خط نیمه‌کاره‌ی پردازه‌ای که هنگام نوشتن متوقف شده
+                    continue
+
+
+def percentile(values, p):
+    """ nearest-rank """
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def summarize(samples):
+    """ {action: {'count': n, metric: {50: ..., 95: ..., 99: ...}}} """
+    grouped = {}
+    for sample in samples:
+        grouped.setdefault(sample['action'], []).append(sample)
+
+    summary = {}
+    for action, rows in grouped.items():
+        summary[action] = {'count': len(rows)}
+        for metric in METRICS:
+            values = [row[metric] for row in rows]
+            summary[action][metric] = {p: percentile(values, p) for p in PERCENTILES}
+    return summary
+
+
+def instrument_serializers():
+    """
+        زمان BaseSerializer.data (to_representation) را برای درخواست نمونه‌برداری
+        شده جمع می‌زند. serializer های تو در تو یک بار حساب می‌شوند. بیرون از
+        درخواست نمونه‌برداری شده فقط یک ContextVar خوانده می‌شود.
+    """
+    data = BaseSerializer.data
+    if getattr(data.fget, 'profiled', False):
+        return
+
+    def profiled_data(self):
+        profile = _current.get()
+        if profile is None:
+            return data.fget(self)
+
+        profile.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return data.fget(self)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_time += time.perf_counter() - start
+
+    profiled_data.profiled = True
+    BaseSerializer.data = property(profiled_data)
+
+
+def view_action(request, response):
+    """ مثلا PostsViewSet.list؛ برای viewهای غیر DRF نام URL """
+    view = getattr(response, 'renderer_context', {}).get('view')
+    if view is not None:
+        action = getattr(view, 'action', None) or request.method.lower()
+        return f'{type(view).__name__}.{action}'
+    match = request.resolver_match
+    return match.view_name if match else request.path
+
+
+class SampledProfilingMiddleware:
+    """
+        جایگزین سبک silk برای محیط اصلی: فقط درخواست‌های نمونه‌برداری شده (SAMPLE_RATE،
+        PATHS یا هدر HEADER با مقدار TOKEN) اندازه‌گیری می‌شوند. برای هر درخواست
+        تعداد و زمان کوئری‌ها، زمان serializer و زمان کل به همراه action ویو در
+        Recorder ثبت می‌شود. گزارش صدک‌ها: manage.py profile_stats
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        instrument_serializers()
+
+    def should_sample(self, request, config):
+        if not config['DIR']:
+            return False
+        token = config['TOKEN']
+        if token and request.headers.get(config['HEADER']) == token:
+            return True
+        if any(re.search(pattern, request.path) for pattern in config['PATHS']):
+            return True
+        return random.random() < config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.should_sample(request, get_config()):
+            return self.get_response(request)
+
+        profile = Profile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with wrap_connections(profile.execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, profile, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not self.should_sample(request, get_config()):
+            return await self.get_response(request)
+
+        profile = Profile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            async with awrap_connections(profile.execute_wrapper):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, profile, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, profile, total):
+        get_recorder().record({
+            'time': timezone.now().isoformat(),
+            'action': view_action(request, response),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            'sql_count': profile.sql_count,
+            'sql_ms': round(profile.sql_time * 1000, 3),
+            'serializer_ms': round(profile.serializer_time * 1000, 3),
+        })
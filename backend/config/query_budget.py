@@ -0,0 +1,260 @@
+import logging
+import traceback
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from .profiling import awrap_connections, view_action, wrap_connections
+from .throttling import HTTP_METHODS, viewset_actions
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'query-budget:'
+DEFAULTS = {
+    # log: ثبت تخطی با stack trace کوئری‌ها (توسعه)؛ count: فقط شمارش (محیط اصلی)؛ None: خاموش
+    'MODE': 'count',
+    # کوئری‌ای که با همین SQL بیشتر از این تعداد تکرار شود، احتمالا N+1 است
+    'REPEAT_THRESHOLD': 3,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_BUDGET', {})}
+
+
+class QueryCounter:
+    """ execute_wrapper؛ با capture_stacks محل اجرای هر کوئری هم نگه داشته می‌شود """
+
+    def __init__(self, capture_stacks=False):
+        self.capture_stacks = capture_stacks
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith('EXPLAIN'):
+            # silk برای هر کوئری یک EXPLAIN هم اجرا می‌کند؛ جزو کار ویو نیست
+            return execute(sql, params, many, context)
+        self.count += 1
+        if self.capture_stacks:
+            self.queries.append((sql, traceback.extract_stack()[:-1]))
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        """ [(sql, تعداد, stack اولین اجرا)] برای SQLهایی که حداقل threshold بار اجرا شده‌اند """
+        grouped = {}
+        for sql, stack in self.queries:
+            count, first_stack = grouped.get(sql, (0, stack))
+            grouped[sql] = (count + 1, first_stack)
+        return [(sql, count, stack) for sql, (count, stack) in grouped.items() if count >= threshold]
+
+
+@contextmanager
+def count_queries(capture_stacks=False):
+    counter = QueryCounter(capture_stacks)
+    with wrap_connections(counter):
+        yield counter
+
+
+@asynccontextmanager
+async def acount_queries(capture_stacks=False):
+    counter = QueryCounter(capture_stacks)
+    async with awrap_connections(counter):
+        yield counter
+
+
+class QueryBudgetMixin:
+    """
+        query_budgets نگاشت action به حداکثر تعداد کوئری هر درخواست است (شامل کوئری‌های
+        session و کاربر)؛ مثل throttle_scopes مقدار می‌تواند نگاشت متد HTTP باشد.
+        QueryBudgetMiddleware تخطی‌ها را ثبت می‌کند و تست‌ها با QueryBudgetTestMixin
+        آن را بررسی می‌کنند.
+    """
+    query_budgets = {}
+
+    registry = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        QueryBudgetMixin.registry.append(cls)
+
+    @property
+    def query_budget(self):
+        budget = self.query_budgets.get(self.action)
+        if isinstance(budget, dict):
+            budget = budget.get(self.request.method, budget.get('*'))
+        return budget
+
+
+def query_budget(limit):
+    """ بودجه‌ی کوئری برای ویوهای تابعی """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_budget(request, response):
+    """ (action, بودجه) ویوی پاسخ دهنده؛ بودجه‌ی تعریف نشده None است """
+    view = (getattr(response, 'renderer_context', None) or {}).get('view')
+    if isinstance(view, QueryBudgetMixin):
+        return view_action(request, response), view.query_budget
+    match = request.resolver_match
+    budget = getattr(match.func, 'query_budget', None) if match else None
+    return view_action(request, response), budget
+
+
+def format_violation(action, counter, budget, threshold):
+    lines = [f'{action}: {counter.count} کوئری، بودجه {budget}']
+    for sql, count, stack in counter.repeated(threshold):
+        lines.append(f'{count} بار: {sql}')
+        frames = [frame for frame in stack if 'site-packages' not in frame.filename]
+        lines.append(''.join(traceback.format_list(frames)).rstrip())
+    return '\n'.join(lines)
+
+
+def record_violation(action):
+    key = KEY_PREFIX + action
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # کلید در این فاصله از کش بیرون رفت
+        cache.set(key, 1, timeout=None)
+
+
+def violations():
+    """ {action: تعداد درخواست‌های بیش از بودجه} """
+    keys = {KEY_PREFIX + action: action for action in budgeted_actions()}
+    return {keys[key]: count for key, count in cache.get_many(keys).items()}
+
+
+def reset_violations():
+    cache.delete_many([KEY_PREFIX + action for action in budgeted_actions()])
+
+
+def budgeted_actions():
+    get_resolver().url_patterns
+    actions = [
+        f'{viewset.__name__}.{action}'
+        for viewset in QueryBudgetMixin.registry
+        for action in sorted(viewset_actions(viewset))
+    ]
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and hasattr(pattern.callback, 'query_budget') and pattern.name:
+                yield pattern.name
+
+    return actions + list(walk(get_resolver().url_patterns))
+
+
+class QueryBudgetMiddleware:
+    """
+        کوئری‌های هر درخواست را با execute_wrapper می‌شمارد و با بودجه‌ی action ویو
+        مقایسه می‌کند. در حالت log تخطی با SQLهای تکراری و stack trace آن‌ها در
+        logger config.query_budget ثبت می‌شود؛ در حالت count فقط تعداد تخطی‌های هر
+        action در کش زیاد می‌شود (گزارش: manage.py query_budget_stats).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = get_config()
+        mode = config['MODE']
+        if not mode:
+            return self.get_response(request)
+
+        with count_queries(capture_stacks=mode == 'log') as counter:
+            request.query_counter = counter
+            response = self.get_response(request)
+        self.check(request, response, counter, config)
+        return response
+
+    async def __acall__(self, request):
+        config = get_config()
+        mode = config['MODE']
+        if not mode:
+            return await self.get_response(request)
+
+        async with acount_queries(capture_stacks=mode == 'log') as counter:
+            request.query_counter = counter
+            response = await self.get_response(request)
+        self.check(request, response, counter, config)
+        return response
+
+    def check(self, request, response, counter, config):
+        action, budget = get_budget(request, response)
+        if budget is not None and counter.count > budget:
+            if config['MODE'] == 'log':
+                logger.warning(format_violation(action, counter, budget, config['REPEAT_THRESHOLD']))
+            else:
+                record_violation(action)
+
+
+def check_query_budgets(app_configs=None, **kwargs):
+    get_resolver().url_patterns
+
+    errors = []
+    for viewset in QueryBudgetMixin.registry:
+        name = f'{viewset.__module__}.{viewset.__qualname__}'
+        actions = viewset_actions(viewset)
+
+        for action, budget in viewset.query_budgets.items():
+            if action not in actions:
+                errors.append(checks.Error(
+                    f"action '{action}' در query_budgets وجود ندارد.",
+                    obj=name,
+                    id='query_budget.E001',
+                ))
+            budgets = budget if isinstance(budget, dict) else {'*': budget}
+            for method in budgets:
+                if method not in HTTP_METHODS:
+                    errors.append(checks.Error(
+                        f"متد '{method}' برای action '{action}' معتبر نیست.",
+                        obj=name,
+                        id='query_budget.E002',
+                    ))
+
+        for action in sorted(actions - viewset.query_budgets.keys()):
+            errors.append(checks.Warning(
+                f"action '{action}' در query_budgets نیامده و بودجه‌ی کوئری ندارد.",
+                obj=name,
+                id='query_budget.W001',
+            ))
+    return errors
+
+
+class QueryBudgetTestMixin:
+    """
+        برای TestCase: درخواست را با self.client می‌فرستد و بررسی می‌کند که ویو
+        بودجه‌ی کوئری دارد و از آن بیشتر کوئری نزده است. شمارش همان شمارش
+        QueryBudgetMiddleware است، پس کوئری‌های middlewareهای بیرونی (مثل silk)
+        حساب نمی‌شوند. در صورت تخطی، SQLهای تکراری و محل اجرایشان در پیام خطا می‌آید.
+    """
+
+    def assertWithinQueryBudget(self, method, path, *args, **kwargs):
+        with self.settings(QUERY_BUDGET={**get_config(), 'MODE': 'log'}):
+            response = getattr(self.client, method)(path, *args, **kwargs)
+
+        counter = response.wsgi_request.query_counter
+        action, budget = get_budget(response.wsgi_request, response)
+        self.assertIsNotNone(budget, f'{action} بودجه‌ی کوئری ندارد.')
+        self.assertLessEqual(
+            counter.count, budget,
+            format_violation(action, counter, budget, threshold=2),
+        )
+        return response
@@ -0,0 +1,19 @@
+"""
+    DJANGO_ENV یکی از dev (پیش‌فرض) یا prod است:
+
+        DJANGO_ENV=prod gunicorn config.wsgi
+
+    مستقیم هم می‌شود DJANGO_SETTINGS_MODULE=config.settings.prod گذاشت.
+"""
+from os import environ
+
+from django.core.exceptions import ImproperlyConfigured
+
+DJANGO_ENV = environ.get('DJANGO_ENV', 'dev')
+
+if DJANGO_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif DJANGO_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f"DJANGO_ENV باید dev یا prod باشد، نه '{DJANGO_ENV}'.")
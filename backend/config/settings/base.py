@@ -14,16 +14,16 @@ from pathlib import Path
 from os import environ
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
-# Quick-start development settings - unsuitable for production
+# تنظیمات مشترک؛ config.settings بر اساس DJANGO_ENV یکی از dev یا prod را بارگذاری می‌کند
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = 'django-insecure-5e-zks=lv^j=^0%#b@=a109ix(jn968g+w*i&#l0-66o3it(le'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = False
 
 ALLOWED_HOSTS = ['*']
 
@@ -38,7 +38,6 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
     'django_jalali',
-    'silk',
     'rest_framework',
     'django_filters',
     'corsheaders',
@@ -94,7 +93,8 @@ INSTALLED_APPS = [
 #     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 # ]
 MIDDLEWARE = [
-    'silk.middleware.SilkyMiddleware',
+    'config.profiling.SampledProfilingMiddleware',
+    'config.query_budget.QueryBudgetMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # <-- MUST be BEFORE CommonMiddleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -132,6 +132,18 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL: خواندن‌ها پشت نوشتن نمی‌مانند. تراکنش‌های هم‌زمان نویس (blog.likes،
+            # blog.uploads) با یک دستور نوشتن شروع می‌شوند تا تا timeout پشت هم صبر
+            # کنند و وسط کار با «database is locked» شکست نخورند
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'timeout': 20,
+        },
+        # دیتابیس حافظه‌ای تست (shared cache) قفل جدول دارد و صبر نمی‌کند؛
+        # تست‌های هم‌زمانی با فایل همان رفتار WAL محیط اصلی را می‌بینند
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -164,9 +176,93 @@ USE_I18N = True
 
 USE_TZ = True
 
+# با REDIS_URL، کش و throttle بین همه‌ی workerها مشترک می‌شوند
+REDIS_URL = environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    THROTTLE_BACKEND = {
+        'BACKEND': 'config.throttling.RedisBackend',
+        'OPTIONS': {'url': REDIS_URL},
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    THROTTLE_BACKEND = {
+        'BACKEND': 'config.throttling.LocalBackend',
+    }
+
+# نمونه‌برداری از درخواست‌ها برای profiling (config.profiling، گزارش: profile_stats)؛
+# نمونه‌ها فقط در فایل‌های DIR ثبت می‌شوند و بدون آن نمونه‌برداری خاموش است
+PROFILING = {
+    'SAMPLE_RATE': float(environ.get('PROFILING_SAMPLE_RATE', 0)),
+    'PATHS': [],
+    'HEADER': 'X-Profile',
+    'TOKEN': environ.get('PROFILING_TOKEN'),
+    'DIR': environ.get('PROFILING_DIR'),
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 3,
+}
+
+# بودجه‌ی کوئری هر action (config.query_budget)؛ تخطی‌ها در محیط اصلی فقط شمرده می‌شوند
+QUERY_BUDGET = {
+    'MODE': 'count',
+    'REPEAT_THRESHOLD': 3,
+}
+
+POST_DETAIL_CACHE_TIMEOUT = 60 * 10
+POST_FEED_CACHE_TIMEOUT = 60
+
+# SSE دیدگاه‌ها و لایک‌ها (blog.events)؛ فقط زیر ASGI و درون‌پردازه‌ای
+POST_EVENTS = {
+    'QUEUE_SIZE': 100,
+    'MAX_SUBSCRIBERS': 1000,
+    'KEEPALIVE': 15,
+    'RETRY': 3000,
+}
+
+# ثبت لایک‌ها در log و نوشتن دسته‌ای با flush_like_buffer (blog.like_buffer)؛
+# بدون DIR هر لایک مستقیم در دیتابیس نوشته می‌شود. DIR به کش مشترک (REDIS_URL)
+# نیاز دارد (like_buffer.E001). رویدادهای SSE ی لایک‌های flush شده فقط به
+# اتصال‌های پردازه‌ی flush کننده می‌رسند، نه سرور (POST_EVENTS درون‌پردازه‌ای است)
+LIKE_BUFFER = {
+    'DIR': environ.get('LIKE_BUFFER_DIR'),
+    'BATCH_SIZE': 1000,
+    'INTERVAL': 1.0,
+    'INTENT_TIMEOUT': 60 * 5,
+    'FSYNC': False,
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR.joinpath('media')
 
+# blog.delivery.XAccelBackend (nginx) / XSendfileBackend (Apache) / PythonBackend (بدون پراکسی)
+PRIVATE_MEDIA_BACKEND = 'blog.delivery.PythonBackend'
+PRIVATE_MEDIA_ACCEL_PREFIX = '/private_media/'
+
+# تصاویر پروفایل از accounts.views.avatar با Cache-Control: immutable ارسال می‌شوند
+AVATAR_URL = '/api/avatars/'
+
+# نسخه‌های کوچک‌شده‌ی تصاویر (generate_image_variants)
+IMAGE_VARIANT_WIDTHS = {
+    'profile_pic': (64, 128, 256),
+    'media': (320, 640, 1280),
+}
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+IMAGE_VARIANT_QUALITY = 80
+
+# آپلود تکه‌تکه‌ی رسانه (blog.uploads)
+MEDIA_UPLOAD_MAX_SIZE = 1024 * 1024 * 1024
+MEDIA_UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024
+
 STATIC_URL = "/static/"
 
 # Default primary key field type
@@ -251,7 +347,9 @@ REST_FRAMEWORK = {
         'media-list': '100/h',
         'media-retrieve': '100/h',
         'media-update': '100/h',
+        'media-upload': '2000/h',
 
+        'comment-list': '100/h',
         'comment-create': '50/h',
         'comment-update': '50/h',
 
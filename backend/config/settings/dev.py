@@ -0,0 +1,12 @@
+from .base import *  # noqa: F401,F403
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = True
+
+# silk هر درخواست و کوئری‌هایش را در دیتابیس ثبت می‌کند؛ فقط برای توسعه
+INSTALLED_APPS = [*INSTALLED_APPS, 'silk']
+
+MIDDLEWARE = ['silk.middleware.SilkyMiddleware', *MIDDLEWARE]
+
+# تخطی از بودجه‌ی کوئری با SQLهای تکراری و stack trace آن‌ها در لاگ می‌آید
+QUERY_BUDGET = {**QUERY_BUDGET, 'MODE': 'log'}
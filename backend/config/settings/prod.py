@@ -0,0 +1,51 @@
+from os import environ
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = False
+
+SECRET_KEY = environ.get('SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured("در prod متغیر SECRET_KEY باید تنظیم شود.")
+
+ALLOWED_HOSTS = [host for host in environ.get('ALLOWED_HOSTS', '').split(',') if host]
+
+# اتصال دیتابیس بین درخواست‌ها باز می‌ماند و پیش از استفاده‌ی دوباره بررسی می‌شود
+DATABASES['default']['CONN_MAX_AGE'] = int(environ.get('CONN_MAX_AGE', 60))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# قالب‌ها یک بار خوانده و compile می‌شوند (loaders با APP_DIRS جمع نمی‌شود)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# بدنه‌ی درخواست‌های API (JSON و فرم) کوچک است؛ فایل‌ها جدا با FILE_UPLOAD_* و
+# آپلود تکه‌تکه (MEDIA_UPLOAD_CHUNK_MAX_SIZE) محدود می‌شوند
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(environ.get('DATA_UPLOAD_MAX_MEMORY_SIZE', 1024 * 1024))
+
+# فایل‌های خصوصی را nginx می‌فرستد، نه worker پایتون
+PRIVATE_MEDIA_BACKEND = 'blog.delivery.XAccelBackend'
+
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# ابزارهای profiling همه‌ی درخواست‌ها را کند می‌کنند و داده‌ی حساس ثبت می‌کنند
+PROFILING_MODULES = ('silk', 'debug_toolbar', 'pyinstrument')
+
+
+def refuse_profiling(installed_apps, middleware):
+    found = [
+        name for name in [*installed_apps, *middleware]
+        if name.split('.')[0] in PROFILING_MODULES
+    ]
+    if found:
+        raise ImproperlyConfigured(f"ابزار profiling در prod مجاز نیست: {', '.join(found)}")
+
+
+refuse_profiling(INSTALLED_APPS, MIDDLEWARE)
@@ -0,0 +1,278 @@
+import time
+from collections import Counter
+from threading import Lock
+
+from django.conf import settings
+from django.core import checks
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import ScopedRateThrottle
+
+KEY_PREFIX = 'throttle:'
+STATS_KEY = 'throttle-stats'
+LOCAL_MAX_KEYS = 10000
+STANDARD_ACTIONS = ('list', 'create', 'retrieve', 'update', 'partial_update', 'destroy')
+HTTP_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', '*')
+
+
+class BaseBackend:
+    """
+        شمارنده‌ی GCRA: برای هر کلید فقط «زمان رسیدن نظری» (TAT) نگه داشته می‌شود.
+        با limit درخواست در period ثانیه، فاصله‌ی هر درخواست period/limit است و
+        تا limit درخواست پشت سر هم (burst) پذیرفته می‌شود.
+        hit خروجی (allowed, retry_after) دارد؛ retry_after به ثانیه است. اگر scope
+        داده شود، شمارنده‌ی allowed/denied آن هم زیاد می‌شود (stats).
+    """
+
+    def hit(self, key, limit, period, scope=None):
+        raise NotImplementedError
+
+    def stats(self):
+        """ {scope: {'allowed': n, 'denied': m}} """
+        raise NotImplementedError
+
+    def reset_stats(self):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+
+def parse_stats(counts):
+    stats = {}
+    for field, value in counts.items():
+        scope, _, outcome = field.rpartition(':')
+        stats.setdefault(scope, {'allowed': 0, 'denied': 0})[outcome] = int(value)
+    return stats
+
+
+def gcra(tat, now, limit, period):
+    """ (allowed, retry_after, new_tat) """
+    interval = period / limit
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - period
+    if now < allow_at:
+        return False, allow_at - now, tat
+    return True, 0, new_tat
+
+
+class LocalBackend(BaseBackend):
+    """
+        درون‌پردازه‌ای، برای تست‌ها و توسعه. بین workerها مشترک نیست؛ stats هم فقط
+        درخواست‌های همین پردازه را می‌شمارد و throttle_stats در پردازه‌ی خودش چیزی نمی‌بیند.
+    """
+
+    def __init__(self, max_keys=LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats = {}
+        self._stats = Counter()
+        self._lock = Lock()
+
+    def hit(self, key, limit, period, scope=None):
+        now = time.monotonic()
+        with self._lock:
+            allowed, retry_after, self._tats[key] = gcra(self._tats.get(key), now, limit, period)
+            if len(self._tats) > self.max_keys:
+                self._purge(now)
+            if scope:
+                self._stats[f"{scope}:{'allowed' if allowed else 'denied'}"] += 1
+        return allowed, retry_after
+
+    def stats(self):
+        with self._lock:
+            return parse_stats(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _purge(self, now):
+        # کلیدی که TAT آن گذشته، با نبودنش فرقی ندارد
+        for key in [key for key, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+
+    def reset(self):
+        with self._lock:
+            self._tats.clear()
+
+
+class RedisBackend(BaseBackend):
+    """
+        مشترک بین همه‌ی workerها. GCRA در یک اسکریپت Lua به صورت اتمیک اجرا می‌شود
+        و ساعت خود Redis را به کار می‌برد، پس اختلاف ساعت سرورها اثری ندارد.
+        client (مثلا fakeredis برای تست) می‌تواند مستقیم داده شود.
+    """
+
+    SCRIPT = """
+        local now = redis.call('TIME')
+        now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+        local limit = tonumber(ARGV[1])
+        local period = tonumber(ARGV[2])
+        local interval = period / limit
+
+        local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+        if tat < now then
+            tat = now
+        end
+        local new_tat = tat + interval
+        local allow_at = new_tat - period
+        if now < allow_at then
+            if ARGV[3] ~= '' then
+                redis.call('HINCRBY', KEYS[2], ARGV[3] .. ':denied', 1)
+            end
+            return {0, tostring(allow_at - now)}
+        end
+        redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+        if ARGV[3] ~= '' then
+            redis.call('HINCRBY', KEYS[2], ARGV[3] .. ':allowed', 1)
+        end
+        return {1, '0'}
+    """
+
+    def __init__(self, url=None, client=None, key_prefix=KEY_PREFIX):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or getattr(settings, 'REDIS_URL', None) or 'redis://localhost:6379/0')
+        self.client = client
+        self.key_prefix = key_prefix
+        self.script = client.register_script(self.SCRIPT)
+
+    def hit(self, key, limit, period, scope=None):
+        allowed, retry_after = self.script(
+            keys=[self.key_prefix + key, self.key_prefix + STATS_KEY],
+            args=[limit, period, scope or ''],
+        )
+        return bool(allowed), float(retry_after)
+
+    def stats(self):
+        counts = self.client.hgetall(self.key_prefix + STATS_KEY)
+        return parse_stats({field.decode(): value for field, value in counts.items()})
+
+    def reset_stats(self):
+        self.client.delete(self.key_prefix + STATS_KEY)
+
+    def reset(self):
+        keys = list(self.client.scan_iter(match=self.key_prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        config = getattr(settings, 'THROTTLE_BACKEND', {})
+        backend_class = import_string(config.get('BACKEND', 'config.throttling.LocalBackend'))
+        _backend = backend_class(**config.get('OPTIONS', {}))
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting == 'THROTTLE_BACKEND':
+        _backend = None
+
+
+class SharedScopedRateThrottle(ScopedRateThrottle):
+    """
+        همان رفتار ScopedRateThrottle (scope از view و نرخ از DEFAULT_THROTTLE_RATES)،
+        ولی با شمارنده‌ی O(1) در THROTTLE_BACKEND به جای فهرست زمان درخواست‌ها در cache.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self.retry_after = get_backend().hit(self.key, self.num_requests, self.duration, scope=self.scope)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class ThrottleScopeMixin:
+    """
+        throttle_scopes نگاشت action به scope است؛ مقدار می‌تواند نگاشت متد HTTP
+        به scope باشد ('*' برای بقیه‌ی متدها). None یعنی عمدا بدون محدودیت.
+        نگاشت هنگام شروع با check_throttle_scopes بررسی می‌شود.
+    """
+    throttle_classes = [SharedScopedRateThrottle]
+    throttle_scopes = {}
+
+    registry = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        ThrottleScopeMixin.registry.append(cls)
+
+    @property
+    def throttle_scope(self):
+        scope = self.throttle_scopes.get(self.action)
+        if isinstance(scope, dict):
+            scope = scope.get(self.request.method, scope.get('*'))
+        return scope
+
+
+def viewset_actions(viewset):
+    actions = {name for name in STANDARD_ACTIONS if hasattr(viewset, name)}
+    actions.update(action.__name__ for action in viewset.get_extra_actions())
+    return actions
+
+
+def check_throttle_scopes(app_configs=None, **kwargs):
+    # viewsetها با بارگذاری URLconf import و ثبت می‌شوند
+    get_resolver().url_patterns
+    rates = api_settings.DEFAULT_THROTTLE_RATES
+
+    errors = []
+    for viewset in ThrottleScopeMixin.registry:
+        name = f'{viewset.__module__}.{viewset.__qualname__}'
+        actions = viewset_actions(viewset)
+
+        for action, scope in viewset.throttle_scopes.items():
+            if action not in actions:
+                errors.append(checks.Error(
+                    f"action '{action}' در throttle_scopes وجود ندارد.",
+                    obj=name,
+                    id='throttling.E001',
+                ))
+            methods = scope if isinstance(scope, dict) else {'*': scope}
+            for method, method_scope in methods.items():
+                if method not in HTTP_METHODS:
+                    errors.append(checks.Error(
+                        f"متد '{method}' برای action '{action}' معتبر نیست.",
+                        obj=name,
+                        id='throttling.E002',
+                    ))
+                if method_scope is not None and method_scope not in rates:
+                    errors.append(checks.Error(
+                        f"scope '{method_scope}' (action '{action}') در DEFAULT_THROTTLE_RATES تعریف نشده است.",
+                        obj=name,
+                        id='throttling.E003',
+                    ))
+
+        for action in sorted(actions - viewset.throttle_scopes.keys()):
+            errors.append(checks.Warning(
+                f"action '{action}' در throttle_scopes نیامده و محدودیتی ندارد.",
+                hint="اگر عمدی است، scope آن را None بگذارید.",
+                obj=name,
+                id='throttling.W001',
+            ))
+    return errors
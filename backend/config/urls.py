@@ -30,11 +30,14 @@ urlpatterns = [
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += [
-        path('silk/', include('silk.urls', namespace='silk')),
-    ]
     urlpatterns += [
         path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
         path('api/docs/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
         path('api/docs/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     ]
+
+# silk فقط در config.settings.dev نصب است
+if 'silk' in settings.INSTALLED_APPS:
+    urlpatterns += [
+        path('silk/', include('silk.urls', namespace='silk')),
+    ]